@@ -82,7 +82,7 @@ async def google_callback(request: Request):
 
         # Check email authorization
         user_email = user_info.get("email")
-        if not AuthService.check_email_authorization(user_email):
+        if not await AuthService.check_email_authorization(user_email):
             raise HTTPException(status_code=403, detail=f"Access denied for email: {user_email}")
 
         # Store user session with timestamp
@@ -1,11 +1,14 @@
 from typing import List
 from fastapi import APIRouter, Request, HTTPException, status, UploadFile, File, Depends
 from fastapi.templating import Jinja2Templates
+from fastapi.concurrency import run_in_threadpool
 import pandas as pd
 import json
 import os
 from ..schemas.email import EmailIn, EmailOut
 from ..dataset.email_dataset import EmailDataset
+from ..services.pending_emails import pending_emails
+from ..services.attachment_store import attachment_store
 from ..core.auth import get_current_user
 
 # Get templates directory
@@ -15,6 +18,16 @@ templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
 router = APIRouter()
 
+def _email_frame(emails: List[EmailIn]) -> pd.DataFrame:
+    """Emails as a DataFrame whose attachments are store handles; the base64 contents are released from the models"""
+    rows = []
+    for email in emails:
+        row = email.model_dump(by_alias=True, exclude={'attachments'})
+        row['attachments'] = attachment_store.spool(email.attachments)
+        email.attachments = None
+        rows.append(row)
+    return pd.DataFrame(rows)
+
 @router.get("/category")
 async def category_page(request: Request, user=Depends(get_current_user)):
     """Email categorization page - GET"""
@@ -65,11 +78,12 @@ async def process_category_emails(
                     "request": request,
                     "error_message": f"Invalid email data at index {i}: {str(e)}"
                 })
+        del content, email_data  # the raw upload is not needed once parsed
         
         try:
-            email_df = pd.DataFrame([e.model_dump(by_alias=True) for e in emails])
+            email_df = _email_frame(emails)
             ds = EmailDataset(df=email_df)
-            processed_df = ds.do_connect()
+            processed_df = ds.do_connect(track=True)
 
         except Exception as debug_error:
             raise debug_error
@@ -129,7 +143,8 @@ async def process_category_emails(
         })
 
 @router.post("/category_api", response_model=List[EmailOut])
-async def category_api(email_data: List[EmailIn]):
+async def category_api(email_data: List[EmailIn], trace: bool = False):
+    """trace=true records the Connector strategies of this run (see GET /metrics/connector)"""
     try:
         if not email_data:
             raise HTTPException(
@@ -137,9 +152,9 @@ async def category_api(email_data: List[EmailIn]):
                 detail="Email data cannot be empty"
             )
             
-        email_df = pd.DataFrame([email.model_dump(by_alias=True) for email in email_data])
+        email_df = _email_frame(email_data)
         ds = EmailDataset(df=email_df)
-        processed_df = ds.do_connect()
+        processed_df = ds.do_connect(trace=trace, track=pending_emails.track_api)
         
         # Use the same DataFrame processing as web interface
         cleaned_df = processed_df.copy()
@@ -167,4 +182,16 @@ async def category_api(email_data: List[EmailIn]):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Email processing failed: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/category_api/rematch")
+async def rematch_unmatched_emails(user=Depends(get_current_user)):
+    """Link previously unmatched emails to the errands created since the last run (call periodically)"""
+    try:
+        linked = await run_in_threadpool(pending_emails.rematch)
+        return {"linked": linked, "pending": len(pending_emails)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Rematch failed: {str(e)}"
+        )
@@ -45,7 +45,7 @@ async def process_forward_email(
             'userId': forwarding_request.userId
         }])
         ds = ForwardDataset(df=forwarding_df, services=DefaultServices())
-        result_df = ds.do_forward()
+        result_df = await ds.do_forward()
 
         if result_df.empty:
             forward = ForwardingOut(id=forwarding_request.id)
@@ -109,7 +109,7 @@ async def forwarding_api(
 
         forwarding_df = pd.DataFrame([fw.model_dump(by_alias=True) for fw in forwarding_data])
         ds = ForwardDataset(df=forwarding_df, services=DefaultServices())
-        result_df = ds.do_forward()
+        result_df = await ds.do_forward()
 
         if result_df.empty:
             forward = ForwardingOut(id=forwarding_data[0].id)
@@ -41,7 +41,7 @@ async def process_log_form(
     try:
         log_df = pd.DataFrame([{'errand_number': errand_number}])
         ds = LogDataset(df=log_df)
-        result_df = ds.do_chronological_log()
+        result_df = await ds.do_chronological_log()
 
         if result_df.empty:
             return templates.TemplateResponse("log.html", {
@@ -127,7 +127,7 @@ async def generate_log_api(log_data: List[LogIn]):
 
         log_df = pd.DataFrame(log_records)
         ds = LogDataset(df=log_df)
-        result_df = ds.do_chronological_log()
+        result_df = await ds.do_chronological_log()
 
         if result_df.empty:
             raise HTTPException(
@@ -171,7 +171,7 @@ async def generate_log_api(log_data: List[LogIn]):
 #         # Use pure DataFrame approach - API handles Pydantic conversions
 #         log_df = pd.DataFrame([{'errand_number': errand_number}])
 #         ds = LogDataset(df=log_df)
-#         result_df = ds.do_chronological_log()
+#         result_df = await ds.do_chronological_log()
 
 #         if result_df.empty:
 #             raise HTTPException(
@@ -216,7 +216,7 @@ async def generate_log_api(log_data: List[LogIn]):
 
 #         log_df = pd.DataFrame(log_records)
 #         ds = LogDataset(df=log_df)
-#         stats_df = ds.get_statistics()
+#         stats_df = await ds.get_statistics()
 
 #         if stats_df.empty:
 #             return {'has_error': True, 'error_message': 'No statistics available'}
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends
+from ..core.auth import get_current_user
+from ..core.query_metrics import query_metrics
+from ..core.connect_trace import connect_tracer
+from ..services.rule_plan import rule_plan_stats
+from ..services.regex_guard import regex_guard
+from ..services.pattern_registry import pattern_registry
+
+router = APIRouter()
+
+@router.get("/metrics/queries")
+async def query_metrics_report(user=Depends(get_current_user)):
+    """Per-query latency, rows, bytes and errors by calling service, plus the recent request breakdowns"""
+    return query_metrics.snapshot()
+
+@router.post("/metrics/queries/reset")
+async def reset_query_metrics(user=Depends(get_current_user)):
+    """Clear the collected query metrics"""
+    query_metrics.reset()
+    return {"status": "reset"}
+
+@router.get("/metrics/connector")
+async def connector_trace_report(user=Depends(get_current_user)):
+    """Per-strategy latency / candidate histograms of the recent traced Connector runs (newest first)"""
+    return connect_tracer.snapshot()
+
+@router.post("/metrics/connector/reset")
+async def reset_connector_traces(user=Depends(get_current_user)):
+    """Clear the kept Connector trace reports"""
+    connect_tracer.reset()
+    return {"status": "reset"}
+
+@router.get("/metrics/category_rules")
+async def category_rule_report(user=Depends(get_current_user)):
+    """Per-rule rows scanned, hits and time of Classifier.categorize_emails since start (most expensive first)"""
+    return rule_plan_stats.snapshot()
+
+@router.post("/metrics/category_rules/reset")
+async def reset_category_rule_stats(user=Depends(get_current_user)):
+    """Clear the collected categorization rule totals"""
+    rule_plan_stats.reset()
+    return {"status": "reset"}
+
+@router.get("/metrics/regex_timeouts")
+async def regex_timeout_report(user=Depends(get_current_user)):
+    """Para-table patterns that hit the regex timeout since start, with how often"""
+    return regex_guard.snapshot()
+
+@router.post("/metrics/regex_timeouts/reset")
+async def reset_regex_timeouts(user=Depends(get_current_user)):
+    """Clear the regex timeout counters"""
+    regex_guard.reset()
+    return {"status": "reset"}
+
+@router.get("/metrics/patterns")
+async def pattern_registry_report(user=Depends(get_current_user)):
+    """Compiled para-table patterns per table: hits, misses, compile time, errors and table version"""
+    return pattern_registry.snapshot()
@@ -60,7 +60,7 @@ async def process_summary_request(
             'reference': summary_request.reference
         }])
         ds = SummaryDataset(df=summary_df)
-        result_df = ds.do_summary(use_case='webService')
+        result_df = await ds.do_summary(use_case='webService')
 
         if result_df.empty:
             result = SummaryOutWeb(error_message="No summary generated")
@@ -69,7 +69,7 @@ async def process_summary_request(
             clean_data = {k: v for k, v in result_data.items() if pd.notna(v)}
             result = SummaryOutWeb(**clean_data)
 
-        stats_df = ds.get_statistics()
+        stats_df = await ds.get_statistics()
         stats = stats_df.iloc[0].to_dict() if not stats_df.empty else {'has_data': False}
         stats = {k: v for k, v in stats.items() if k not in ['emailId', 'errandNumber', 'reference'] and pd.notna(v)}
 
@@ -124,7 +124,7 @@ async def summary_api(summary_data: List[SummaryIn]) -> SummaryOutAPI:
 
         summary_df = pd.DataFrame([summary.model_dump(by_alias=True) for summary in summary_data])
         ds = SummaryDataset(df=summary_df)
-        result_df = ds.do_summary(use_case='api')
+        result_df = await ds.do_summary(use_case='api')
 
         if result_df.empty:
             raise HTTPException(
@@ -223,7 +223,7 @@ async def summary_statistics(
             'reference': sr.reference
         } for sr in summary_requests])
         ds = SummaryDataset(df=summary_df)
-        stats_df = ds.get_statistics()
+        stats_df = await ds.get_statistics()
 
         if stats_df.empty:
             return [{'has_data': False}] * len(summary_requests)
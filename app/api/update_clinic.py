@@ -26,7 +26,7 @@ async def update_clinic(
         clinic_old = base_service.clinic.copy()
         query = base_service.update_clinic_email_query
         query = str(query)
-        clinic_update = fetchFromDB(query)
+        clinic_update = fetchFromDB(query, name='updateClinicEmail')
         
         old_group = clinic_old.sort_values(by=['clinicId', 'clinicEmail', 'clinicName']).groupby(['clinicId', 'clinicName'])
         keyword = pd.DataFrame()
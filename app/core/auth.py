@@ -5,7 +5,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from authlib.integrations.starlette_client import OAuth
 import jwt
 import os
-from ..services.utils import fetchFromDB
+from ..services.utils import fetch_df_async
 
 # Configuration
 JWT_SECRET = os.getenv("JWT_SECRET") or "fallback-secret-key"
@@ -69,7 +69,7 @@ class AuthService:
             )
 
     @staticmethod
-    def check_email_authorization(email: str, custom_query: Optional[str] = None) -> bool:
+    async def check_email_authorization(email: str, custom_query: Optional[str] = None) -> bool:
         """
         Check if email is in whitelist
         
@@ -88,7 +88,7 @@ class AuthService:
                 query = custom_query
             else:
                 query = "SELECT email FROM admin_user au"            
-            whitelist_df = fetchFromDB(query)
+            whitelist_df = await fetch_df_async(query, name='adminWhitelist')
             if whitelist_df.empty:
                 return False
             authorized_emails = whitelist_df['email'].str.lower().tolist()
@@ -0,0 +1,138 @@
+import os
+import json
+import threading
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple
+
+# Upper bounds of the histogram buckets (the last bucket is everything above)
+LATENCY_BUCKETS_MS = [0.1, 1, 10, 100, 1000]
+CANDIDATE_BUCKETS = [0, 1, 5, 20, 100, 1000]
+
+# Trace of the do_connect run being served (set by ConnectTracer.start)
+_active_trace: ContextVar[Optional['ConnectTrace']] = ContextVar('connect_trace', default=None)
+
+def _bucket(value: float, bounds: List[float], unit: str = '') -> str:
+    for bound in bounds:
+        if value <= bound:
+            return f'<={bound}{unit}'
+    return f'>{bounds[-1]}{unit}'
+
+def _histogram(values: List[float], bounds: List[float], unit: str = '') -> Dict[str, int]:
+    hist = {_bucket(bound, bounds, unit): 0 for bound in bounds}
+    hist[f'>{bounds[-1]}{unit}'] = 0
+    for value in values:
+        hist[_bucket(value, bounds, unit)] += 1
+    return hist
+
+class ConnectTrace:
+    """
+    Strategies the Connector tried for each email of one run: per attempt the window tier, the index
+    candidates the strategy looked at, whether it matched and its elapsed time. Batch mode joins all
+    emails at once for reference/number, so those steps are recorded once per tier in batch_steps.
+    """
+    def __init__(self, label: str):
+        self.label = label
+        self.tier = 0
+        self.emails: Dict[Any, Dict[str, Any]] = {}
+        self.batch_steps: List[Dict[str, Any]] = []
+
+    def _email(self, email_id: Any) -> Dict[str, Any]:
+        record = self.emails.get(email_id)
+        if record is None:
+            record = self.emails[email_id] = {'email': email_id, 'steps': [], 'matchedBy': None, 'tier': None}
+        return record
+
+    def step(self, email_id: Any, strategy: str, candidates: int, hit: Optional[str], seconds: float):
+        """One strategy attempt for one email (hit: the connectedCol it produced, None when it found nothing)"""
+        self._email(email_id)['steps'].append({'tier': self.tier, 'strategy': strategy, 'candidates': candidates,
+                                               'hit': hit, 'ms': round(seconds * 1000, 3)})
+
+    def batch_step(self, strategy: str, emails: int, candidates: int, hits: int, seconds: float):
+        self.batch_steps.append({'tier': self.tier, 'strategy': strategy, 'emails': emails, 'candidates': candidates,
+                                 'hits': hits, 'ms': round(seconds * 1000, 3)})
+
+    def matched(self, email_id: Any, connected_col: str):
+        record = self._email(email_id)
+        record['matchedBy'], record['tier'] = connected_col, self.tier
+
+    def report(self) -> Dict[str, Any]:
+        """Per-strategy attempts, hits, total/avg/max latency and latency / candidate histograms, plus the raw trace"""
+        by_strategy: Dict[str, Dict[str, List[Any]]] = {}
+        for record in self.emails.values():
+            for step in record['steps']:
+                agg = by_strategy.setdefault(step['strategy'], {'ms': [], 'candidates': [], 'hits': []})
+                agg['ms'].append(step['ms'])
+                agg['candidates'].append(step['candidates'])
+                agg['hits'].append(step['hit'] is not None)
+        strategies = []
+        for strategy, agg in by_strategy.items():
+            total = sum(agg['ms'])
+            strategies.append({
+                'strategy': strategy, 'attempts': len(agg['ms']), 'hits': sum(agg['hits']),
+                'totalMs': round(total, 2), 'avgMs': round(total / len(agg['ms']), 3), 'maxMs': round(max(agg['ms']), 3),
+                'latencyMs': _histogram(agg['ms'], LATENCY_BUCKETS_MS, 'ms'),
+                'candidates': _histogram(agg['candidates'], CANDIDATE_BUCKETS),
+            })
+        strategies.sort(key=lambda agg: agg['totalMs'], reverse=True)
+
+        outcomes: Dict[str, int] = {}
+        for record in self.emails.values():
+            key = record['matchedBy'] or 'unmatched'
+            outcomes[key] = outcomes.get(key, 0) + 1
+        return {
+            'request': self.label,
+            'emails': len(self.emails),
+            'strategies': strategies,
+            'batchSteps': self.batch_steps,
+            'outcomes': outcomes,
+            'trace': list(self.emails.values()),
+        }
+
+class ConnectTracer:
+    """
+    Opt-in tracing of Connector runs: EmailDataset.do_connect(trace=True), or every run when CONNECTOR_TRACE is set.
+    Finished reports are kept for GET /metrics/connector and appended as JSON lines to CONNECTOR_TRACE_FILE if set.
+    """
+    def __init__(self):
+        self.enabled = os.getenv('CONNECTOR_TRACE', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+        self.trace_file = os.getenv('CONNECTOR_TRACE_FILE') or None
+        self._recent: deque = deque(maxlen=int(os.getenv('CONNECTOR_TRACE_RECENT', '20')))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def current() -> Optional[ConnectTrace]:
+        return _active_trace.get()
+
+    def start(self, label: str) -> Tuple[ConnectTrace, Any]:
+        trace = ConnectTrace(label)
+        return trace, _active_trace.set(trace)
+
+    def finish(self, handle: Tuple[ConnectTrace, Any]) -> Dict[str, Any]:
+        """Close the trace opened by start and return its report"""
+        trace, token = handle
+        _active_trace.reset(token)
+        report = trace.report()
+        report['finishedAt'] = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._recent.append(report)
+            if self.trace_file:
+                try:
+                    with open(self.trace_file, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(report, default=str) + '\n')
+                except OSError as e:
+                    print(f"❌ Error writing connector trace to {self.trace_file}: {str(e)}")
+        return report
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Recent reports, newest first, without the per-email trace"""
+        with self._lock:
+            recent = list(self._recent)[::-1]
+        return [{k: v for k, v in report.items() if k != 'trace'} for report in recent]
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+
+connect_tracer = ConnectTracer()
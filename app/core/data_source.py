@@ -0,0 +1,362 @@
+import io
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+import pandas as pd
+from abc import ABC, abstractmethod
+from datetime import datetime, date, timezone
+from decimal import Decimal
+from typing import Optional, Dict, Any, Mapping, Tuple
+from .database import (get_engine, get_async_engine, get_replica_engine, get_async_replica_engine,
+                       replica_available, mark_replica_failed)
+
+# Column kinds accepted by fetch_columnar and the dtype each one is built with
+COLUMN_DTYPES = {
+    'int': 'Int64',          # nullable integer ids
+    'float': 'float64',      # amounts (numeric arrives as Decimal/text)
+    'category': 'category',  # low-cardinality names (clinic, insurance company, options)
+    'bool': 'boolean',
+    'str': object,
+    'datetime': object,      # parsed to UTC after loading
+}
+
+def apply_column_types(df: pd.DataFrame, columns: Mapping[str, str]) -> pd.DataFrame:
+    for col, kind in columns.items():
+        if col not in df.columns:
+            continue
+        if kind == 'datetime':
+            df[col] = pd.to_datetime(df[col], errors='coerce', utc=True, format='ISO8601')
+        elif kind != 'str':
+            df[col] = df[col].astype(COLUMN_DTYPES[kind])
+    return df
+
+def _inline_params(sql: str, params: Optional[Mapping[str, Any]]) -> Optional[str]:
+    """
+    sql with its bind parameters written as literals, for COPY (which takes no parameters); only
+    timestamps and numbers are inlined, validated by parsing them, otherwise None
+    """
+    for key, value in (params or {}).items():
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (datetime, date, pd.Timestamp)):
+            stamp = pd.Timestamp(value)
+            if pd.isna(stamp):
+                return None
+            literal = f"'{stamp.isoformat()}'"
+        elif isinstance(value, (int, float, Decimal)) and pd.notna(value):
+            literal = repr(float(value)) if isinstance(value, (float, Decimal)) else str(int(value))
+        else:
+            return None
+        sql = re.sub(rf'(?<![:\w]):{re.escape(key)}\b', lambda _: literal, sql)
+    return sql
+
+def _copy_to_frame(engine, sql: str, columns: Mapping[str, str]) -> pd.DataFrame:
+    """COPY the result as CSV into one buffer and let the C parser build the typed columns"""
+    copy_sql = f"COPY ({sql.strip().rstrip(';')}) TO STDOUT WITH (FORMAT csv, HEADER true, NULL '\\N')"
+    buffer = io.BytesIO()
+    raw_conn = engine.raw_connection()
+    try:
+        cursor = raw_conn.cursor()
+        if engine.dialect.driver == 'psycopg2':
+            cursor.copy_expert(copy_sql, buffer)
+        else:
+            cursor.execute(copy_sql, stream=buffer)
+        cursor.close()
+    finally:
+        raw_conn.close()
+    size = buffer.tell()
+    buffer.seek(0)
+
+    dtypes = {col: COLUMN_DTYPES[kind] for col, kind in columns.items() if kind != 'datetime'}
+    data = pd.read_csv(buffer, dtype=dtypes, na_values=['\\N'], keep_default_na=False,  # type: ignore
+                       true_values=['t'], false_values=['f'])
+    data = apply_column_types(data, {col: kind for col, kind in columns.items() if kind == 'datetime'})
+    data.attrs['bytes'] = size
+    return data
+
+def _stream_to_frame(engine, statement, params, columns: Mapping[str, str]) -> pd.DataFrame:
+    """Stream the result in chunks, converting each chunk to typed columns before the next one is read"""
+    chunk_rows = int(os.getenv('DB_FETCH_CHUNK_ROWS', '10000'))
+    per_chunk = {col: kind for col, kind in columns.items() if kind != 'category'}
+    chunks = []
+    with engine.connect() as db_conn:
+        result = db_conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(statement, params or {})
+        keys = list(result.keys())
+        for rows in result.partitions():
+            chunk = pd.DataFrame.from_records(rows, columns=keys)
+            chunks.append(apply_column_types(chunk, per_chunk))
+    if not chunks:
+        return apply_column_types(pd.DataFrame(columns=keys), columns)
+    data = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    # Categories are set once on the full column so every chunk shares the same codes
+    return apply_column_types(data, {col: kind for col, kind in columns.items() if kind == 'category'})
+
+class DataSource(ABC):
+    """
+    Where services read their data from: named SQL queries and Google Sheets worksheets.
+    query is a prepared text clause, name its query registry name (or the caller's own label).
+    """
+    @abstractmethod
+    def fetch(self, query, params: Optional[Dict[str, Any]] = None, name: Optional[str] = None) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    async def fetch_async(self, query, params: Optional[Dict[str, Any]] = None, name: Optional[str] = None) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def fetch_columnar(self, query, params: Optional[Dict[str, Any]] = None, columns: Optional[Mapping[str, str]] = None,
+                       name: Optional[str] = None) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def load_sheet(self, url: str, worksheet: str) -> pd.DataFrame:
+        ...
+
+# Read-only queries served by the read replica when one is configured ('*' matches a prefix)
+DEFAULT_REPLICA_QUERIES = 'errandConnect*,errandPay,payout,log*,summary*'
+# Never routed to the replica, whatever DB_REPLICA_QUERIES says
+PRIMARY_ONLY_QUERIES = {'updateClinicEmail'}
+
+def _replica_patterns() -> Tuple[set, Tuple[str, ...]]:
+    names = [n.strip() for n in os.getenv('DB_REPLICA_QUERIES', DEFAULT_REPLICA_QUERIES).split(',') if n.strip()]
+    return {n for n in names if not n.endswith('*')}, tuple(n[:-1] for n in names if n.endswith('*'))
+
+class PostgresDataSource(DataSource):
+    """
+    Live data: Postgres through the shared pools and Google Sheets through gspread.
+    Queries named in DB_REPLICA_QUERIES read from the replica and retry on the primary if it fails.
+    """
+    def __init__(self):
+        self.replica_names, self.replica_prefixes = _replica_patterns()
+
+    def use_replica(self, name: Optional[str]) -> bool:
+        if not name or name in PRIMARY_ONLY_QUERIES or not replica_available():
+            return False
+        return name in self.replica_names or name.startswith(self.replica_prefixes)
+
+    def _routed(self, read, name):
+        """Run read(engine) on the replica when the query is routed there, falling back to the primary"""
+        if self.use_replica(name):
+            try:
+                return read(get_replica_engine())
+            except Exception as e:
+                mark_replica_failed()
+                print(f"❌ Error reading {name} from the replica, falling back to primary: {str(e)}")
+        return read(get_engine())
+
+    def fetch(self, query, params=None, name=None) -> pd.DataFrame:
+        def read(engine):
+            with engine.connect() as db_conn:
+                result = db_conn.execute(query, params or {})
+                data = result.fetchall()
+                return pd.DataFrame(data, columns=result.keys()) # type: ignore
+        return self._routed(read, name)
+
+    async def fetch_async(self, query, params=None, name=None) -> pd.DataFrame:
+        async def read(engine):
+            async with engine.connect() as db_conn:
+                result = await db_conn.execute(query, params or {})
+                data = result.fetchall()
+                return pd.DataFrame(data, columns=result.keys()) # type: ignore
+        if self.use_replica(name):
+            try:
+                return await read(await get_async_replica_engine())
+            except Exception as e:
+                mark_replica_failed()
+                print(f"❌ Error reading {name} from the replica, falling back to primary: {str(e)}")
+        return await read(await get_async_engine())
+
+    def fetch_columnar(self, query, params=None, columns=None, name=None) -> pd.DataFrame:
+        """
+        Statements are exported with COPY ... TO STDOUT, with timestamp / number parameters inlined;
+        the others are streamed from a server-side cursor in chunks of DB_FETCH_CHUNK_ROWS.
+        """
+        columns = columns or {}
+        def read(engine):
+            sql = _inline_params(query.text, params)
+            if sql is not None and engine.dialect.driver in ('psycopg2', 'pg8000'):
+                return _copy_to_frame(engine, sql, columns)
+            return _stream_to_frame(engine, query, params, columns)
+        return self._routed(read, name)
+
+    def load_sheet(self, url, worksheet) -> pd.DataFrame:
+        import gspread
+        from ..services.utils import get_service_account_path
+        gc = gspread.service_account(filename=get_service_account_path())
+        raw_data = gc.open_by_url(url).worksheet(worksheet).get_all_values()
+        return pd.DataFrame(raw_data[1:], columns=raw_data[0])
+
+# Parameters that move with the clock (watermarks, window starts); replay tolerates other values for them only
+TIME_DEPENDENT_PARAMS = ('since', 'oldest')
+
+class RecordedDataSource(DataSource):
+    """
+    Offline data replayed from a SQLite fixture file with the same column schema as the live results.
+    Every result is one table, indexed by (query name, parameters) in the recordings table.
+    A lookup needs the exact parameters; only the time-dependent ones (TIME_DEPENDENT_PARAMS: watermarks,
+    window starts) may differ, in which case the latest recording with the same other parameters replays.
+    With inner set, results are read from inner and recorded first (record mode).
+    """
+    def __init__(self, path: str, inner: Optional[DataSource] = None):
+        self.path = path
+        self.inner = inner
+        self._write_lock = threading.Lock()
+        if inner is not None:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        elif not os.path.exists(path):
+            raise FileNotFoundError(f"Recorded fixture file not found: {path}")
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS recordings (
+                                name TEXT, params TEXT, tbl TEXT, dtypes TEXT, recorded_at TEXT,
+                                PRIMARY KEY (name, params))""")
+
+    @staticmethod
+    def _key(query, params, name) -> Tuple[str, str]:
+        if not name:
+            sql = query if isinstance(query, str) else getattr(query, 'text', str(query))
+            name = 'sql:' + hashlib.sha1(sql.encode('utf-8')).hexdigest()[:12]
+        return name, json.dumps(params or {}, sort_keys=True, default=str)
+
+    @staticmethod
+    def _fixed_params(params_key: str) -> Optional[Dict[str, Any]]:
+        """The parameters without the time-dependent ones; None when there are none to leave out"""
+        params = json.loads(params_key)
+        if not any(key in params for key in TIME_DEPENDENT_PARAMS):
+            return None
+        return {key: value for key, value in params.items() if key not in TIME_DEPENDENT_PARAMS}
+
+    @staticmethod
+    def _to_storable(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, str]]:
+        """Plain SQLite values plus the pandas dtype of every column"""
+        out = df.copy()
+        dtypes = {}
+        for col in out.columns:
+            s = out[col]
+            dtypes[col] = str(s.dtype)
+            if isinstance(s.dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_any_dtype(s):
+                out[col] = s.map(lambda v: v.isoformat() if pd.notna(v) else None)
+            elif isinstance(s.dtype, pd.CategoricalDtype) or str(s.dtype) in ('Int64', 'boolean'):
+                out[col] = s.astype(object).where(s.notna(), None)
+            elif s.dtype == object:
+                sample = s.dropna()
+                first = sample.iloc[0] if not sample.empty else None
+                if isinstance(first, (datetime, date)):
+                    dtypes[col] = 'datetime64[ns, UTC]'
+                    out[col] = s.map(lambda v: v.isoformat() if pd.notna(v) else None)
+                elif isinstance(first, Decimal):
+                    dtypes[col] = 'float64'
+                    out[col] = s.map(lambda v: float(v) if pd.notna(v) else None)
+                elif isinstance(first, (list, dict)):
+                    dtypes[col] = 'json'
+                    out[col] = s.map(lambda v: json.dumps(v, default=str) if v is not None else None)
+        return out, dtypes
+
+    @staticmethod
+    def _from_storable(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+        for col, dtype in dtypes.items():
+            if col not in df.columns:
+                continue
+            if dtype.startswith('datetime64'):
+                values = pd.to_datetime(df[col], errors='coerce', utc=True, format='ISO8601')
+                tz = dtype[dtype.find(',') + 1:-1].strip() if ',' in dtype else None
+                if tz is None:
+                    values = values.dt.tz_localize(None)
+                elif tz != 'UTC':
+                    try:
+                        values = values.dt.tz_convert(tz)
+                    except Exception:
+                        pass  # fixed offsets are replayed in UTC
+                df[col] = values
+            elif dtype == 'json':
+                df[col] = df[col].map(lambda v: json.loads(v) if isinstance(v, str) else v)
+            elif dtype != 'object':
+                df[col] = df[col].astype(dtype)
+        return df
+
+    def record(self, query, params, name, df: pd.DataFrame):
+        """Store one result, replacing an earlier recording with the same key"""
+        name, params_key = self._key(query, params, name)
+        table = 'r_' + hashlib.sha1(f"{name}|{params_key}".encode('utf-8')).hexdigest()[:16]
+        stored, dtypes = self._to_storable(df)
+        with self._write_lock, sqlite3.connect(self.path) as conn:
+            stored.to_sql(table, conn, if_exists='replace', index=False)
+            conn.execute("INSERT OR REPLACE INTO recordings VALUES (?, ?, ?, ?, ?)",
+                         (name, params_key, table, json.dumps(dtypes), datetime.now(timezone.utc).isoformat()))
+
+    def replay(self, query, params, name) -> pd.DataFrame:
+        name, params_key = self._key(query, params, name)
+        with sqlite3.connect(self.path) as conn:
+            row = conn.execute("SELECT tbl, dtypes FROM recordings WHERE name = ? AND params = ?",
+                               (name, params_key)).fetchone()
+            if row is None:
+                fixed = self._fixed_params(params_key)
+                recorded = conn.execute("SELECT params, tbl, dtypes FROM recordings WHERE name = ? ORDER BY recorded_at DESC",
+                                        (name,)).fetchall()
+                row = next((r[1:] for r in recorded if fixed is not None and self._fixed_params(r[0]) == fixed), None)
+            if row is None:
+                raise LookupError(f"Not recorded: {name} with params {params_key} in {self.path}")
+            data = pd.read_sql(f'SELECT * FROM "{row[0]}"', conn)
+        return self._from_storable(data, json.loads(row[1]))
+
+    def fetch(self, query, params=None, name=None) -> pd.DataFrame:
+        if self.inner is not None:
+            data = self.inner.fetch(query, params, name)
+            self.record(query, params, name, data)
+            return data
+        return self.replay(query, params, name)
+
+    async def fetch_async(self, query, params=None, name=None) -> pd.DataFrame:
+        if self.inner is not None:
+            data = await self.inner.fetch_async(query, params, name)
+            self.record(query, params, name, data)
+            return data
+        return self.replay(query, params, name)
+
+    def fetch_columnar(self, query, params=None, columns=None, name=None) -> pd.DataFrame:
+        if self.inner is not None:
+            data = self.inner.fetch_columnar(query, params, columns, name)
+            self.record(query, params, name, data)
+            return data
+        return apply_column_types(self.replay(query, params, name), columns or {})
+
+    def load_sheet(self, url, worksheet) -> pd.DataFrame:
+        name, params = f'sheet:{worksheet}', {'url': url}
+        if self.inner is not None:
+            data = self.inner.load_sheet(url, worksheet)
+            self.record(None, params, name, data)
+            return data
+        return self.replay(None, params, name)
+
+_data_source: Optional[DataSource] = None
+_data_source_lock = threading.Lock()
+
+def create_data_source() -> DataSource:
+    """
+    DATA_SOURCE selects the backend: 'postgres' (default), 'record' (postgres, saving every result
+    to DATA_SOURCE_FIXTURES) or 'replay' (offline, from DATA_SOURCE_FIXTURES).
+    """
+    mode = os.getenv('DATA_SOURCE', 'postgres').strip().lower()
+    fixtures = os.getenv('DATA_SOURCE_FIXTURES', 'data/fixtures/recorded.sqlite')
+    if mode == 'replay':
+        return RecordedDataSource(fixtures)
+    if mode == 'record':
+        return RecordedDataSource(fixtures, inner=PostgresDataSource())
+    return PostgresDataSource()
+
+def get_data_source() -> DataSource:
+    global _data_source
+    if _data_source is None:
+        with _data_source_lock:
+            if _data_source is None:
+                _data_source = create_data_source()
+    return _data_source
+
+def set_data_source(data_source: Optional[DataSource]) -> None:
+    """Swap the process-wide data source (None: rebuild from the environment on next use)"""
+    global _data_source
+    with _data_source_lock:
+        _data_source = data_source
@@ -0,0 +1,241 @@
+import os
+import base64
+import asyncio
+import time
+import threading
+from typing import Optional
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from google.cloud.sql.connector import Connector, IPTypes, create_async_connector
+
+# Process-wide pool, created once in the FastAPI lifespan and shared by every fetchFromDB call
+_engine: Optional[Engine] = None
+_connector: Optional[Connector] = None
+_engine_lock = threading.Lock()
+
+# Async counterpart (asyncpg) used by the request handlers so queries do not block the event loop
+_async_engine: Optional[AsyncEngine] = None
+_async_connector: Optional[Connector] = None
+_async_engine_lock: Optional[asyncio.Lock] = None
+
+# Optional read replica for the heavy read-only queries (see DB_REPLICA_DSN / REPLICA_INSTANCE_CONNECTION_NAME)
+_replica_engine: Optional[Engine] = None
+_async_replica_engine: Optional[AsyncEngine] = None
+_replica_failed_at: Optional[float] = None
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def get_pool_settings() -> dict:
+    """Pool sizing read from DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING and DB_POOL_RECYCLE"""
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '5')),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    }
+
+def get_db_password() -> str:
+    """Local passwords are stored base64 encoded, cloud passwords in plain text"""
+    db_password = os.getenv('DB_PASSWORD')
+    if not db_password:
+        raise ValueError("DB_PASSWORD environment variable is not set")
+    if os.getenv("ENV_MODE") == "local":
+        return base64.b64decode(db_password).decode('utf-8')
+    return db_password
+
+def _create_local_engine(pool_settings: dict) -> Engine:
+    db_name = os.getenv('DB_NAME')
+    db_user = os.getenv('DB_USER')
+    db_host = os.getenv('DB_HOST')
+    db_port = os.getenv('DB_PORT')
+    db_password = get_db_password()
+    connection_string = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+    return create_engine(connection_string, **pool_settings)
+
+def _create_cloud_engine(pool_settings: dict, instance_connection_name: Optional[str] = None) -> Engine:
+    global _connector
+    INSTANCE_CONNECTION_NAME = instance_connection_name or os.getenv('INSTANCE_CONNECTION_NAME', 'drp-system:europe-west4:drp')
+    db_name = os.getenv('DB_NAME')
+    db_user = os.getenv('DB_USER')
+    db_password = get_db_password()
+
+    if _connector is None:
+        _connector = Connector()
+    connector = _connector
+
+    def getconn():
+        conn = connector.connect(
+            INSTANCE_CONNECTION_NAME,  # '/cloudsql/<project_id>:<region>:<instance_name>'
+            "pg8000",
+            user=db_user,
+            password=db_password,
+            db=db_name,
+            ip_type=IPTypes.PUBLIC  # IPTypes.PRIVATE for private IP
+        )
+        return conn
+
+    return create_engine("postgresql+pg8000://", creator=getconn, **pool_settings)
+
+def init_engine() -> Engine:
+    """Create the shared engine for the current ENV_MODE if it does not exist yet"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            pool_settings = get_pool_settings()
+            if os.getenv("ENV_MODE") in ['test', 'production']:
+                _engine = _create_cloud_engine(pool_settings)
+            else:
+                _engine = _create_local_engine(pool_settings)
+        return _engine
+
+def get_engine() -> Engine:
+    """Return the shared engine, creating it lazily outside the app lifespan (scripts, notebooks)"""
+    if _engine is None:
+        return init_engine()
+    return _engine
+
+def replica_configured() -> bool:
+    if os.getenv("ENV_MODE") in ['test', 'production']:
+        return bool(os.getenv('REPLICA_INSTANCE_CONNECTION_NAME'))
+    return bool(os.getenv('DB_REPLICA_DSN'))
+
+def init_replica_engine() -> Optional[Engine]:
+    """Create the read-replica engine when one is configured; None otherwise"""
+    global _replica_engine
+    if not replica_configured():
+        return None
+    with _engine_lock:
+        if _replica_engine is None:
+            pool_settings = get_pool_settings()
+            if os.getenv("ENV_MODE") in ['test', 'production']:
+                _replica_engine = _create_cloud_engine(pool_settings, os.getenv('REPLICA_INSTANCE_CONNECTION_NAME'))
+            else:
+                _replica_engine = create_engine(os.getenv('DB_REPLICA_DSN'), **pool_settings)  # type: ignore[arg-type]
+        return _replica_engine
+
+def replica_available() -> bool:
+    """A configured replica that has not failed within the last DB_REPLICA_RETRY_SECONDS"""
+    if not replica_configured():
+        return False
+    if _replica_failed_at is None:
+        return True
+    return time.monotonic() - _replica_failed_at >= int(os.getenv('DB_REPLICA_RETRY_SECONDS', '30'))
+
+def mark_replica_failed() -> None:
+    """Send replica reads to the primary until the retry interval has passed"""
+    global _replica_failed_at
+    _replica_failed_at = time.monotonic()
+
+def get_replica_engine() -> Optional[Engine]:
+    if _replica_engine is None:
+        return init_replica_engine()
+    return _replica_engine
+
+def dispose_engine() -> None:
+    """Close pooled connections and the Cloud SQL connector on shutdown"""
+    global _engine, _replica_engine, _connector
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+        if _replica_engine is not None:
+            _replica_engine.dispose()
+            _replica_engine = None
+        if _connector is not None:
+            _connector.close()
+            _connector = None
+
+def _create_local_async_engine(pool_settings: dict) -> AsyncEngine:
+    db_name = os.getenv('DB_NAME')
+    db_user = os.getenv('DB_USER')
+    db_host = os.getenv('DB_HOST')
+    db_port = os.getenv('DB_PORT')
+    db_password = get_db_password()
+    connection_string = f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+    return create_async_engine(connection_string, **pool_settings)
+
+async def _create_cloud_async_engine(pool_settings: dict, instance_connection_name: Optional[str] = None) -> AsyncEngine:
+    global _async_connector
+    INSTANCE_CONNECTION_NAME = instance_connection_name or os.getenv('INSTANCE_CONNECTION_NAME', 'drp-system:europe-west4:drp')
+    db_name = os.getenv('DB_NAME')
+    db_user = os.getenv('DB_USER')
+    db_password = get_db_password()
+
+    if _async_connector is None:
+        _async_connector = await create_async_connector()
+    connector = _async_connector
+
+    async def getconn():
+        conn = await connector.connect_async(
+            INSTANCE_CONNECTION_NAME,
+            "asyncpg",
+            user=db_user,
+            password=db_password,
+            db=db_name,
+            ip_type=IPTypes.PUBLIC
+        )
+        return conn
+
+    return create_async_engine("postgresql+asyncpg://", async_creator=getconn, **pool_settings)
+
+async def init_async_engine() -> AsyncEngine:
+    """Create the shared async engine on the running event loop if it does not exist yet"""
+    global _async_engine, _async_engine_lock
+    if _async_engine_lock is None:
+        _async_engine_lock = asyncio.Lock()
+    async with _async_engine_lock:
+        if _async_engine is None:
+            pool_settings = get_pool_settings()
+            if os.getenv("ENV_MODE") in ['test', 'production']:
+                _async_engine = await _create_cloud_async_engine(pool_settings)
+            else:
+                _async_engine = _create_local_async_engine(pool_settings)
+        return _async_engine
+
+async def get_async_engine() -> AsyncEngine:
+    """Return the shared async engine, creating it lazily outside the app lifespan"""
+    if _async_engine is None:
+        return await init_async_engine()
+    return _async_engine
+
+async def get_async_replica_engine() -> Optional[AsyncEngine]:
+    """Async engine on the read replica when one is configured; None otherwise"""
+    global _async_replica_engine, _async_engine_lock
+    if not replica_configured():
+        return None
+    if _async_replica_engine is not None:
+        return _async_replica_engine
+    if _async_engine_lock is None:
+        _async_engine_lock = asyncio.Lock()
+    async with _async_engine_lock:
+        if _async_replica_engine is None:
+            pool_settings = get_pool_settings()
+            if os.getenv("ENV_MODE") in ['test', 'production']:
+                _async_replica_engine = await _create_cloud_async_engine(
+                    pool_settings, os.getenv('REPLICA_INSTANCE_CONNECTION_NAME'))
+            else:
+                dsn = os.getenv('DB_REPLICA_DSN', '')
+                _async_replica_engine = create_async_engine(
+                    'postgresql+asyncpg://' + dsn.split('://', 1)[-1], **pool_settings)
+        return _async_replica_engine
+
+async def dispose_async_engine() -> None:
+    """Close pooled async connections and the async Cloud SQL connector on shutdown"""
+    global _async_engine, _async_replica_engine, _async_connector, _async_engine_lock
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+    if _async_replica_engine is not None:
+        await _async_replica_engine.dispose()
+        _async_replica_engine = None
+    if _async_connector is not None:
+        await _async_connector.close_async()
+        _async_connector = None
+    _async_engine_lock = None
@@ -0,0 +1,129 @@
+import os
+import sys
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Tuple
+
+# Modules that only move data; the first frame outside them is reported as the calling service
+_DATA_ACCESS_MODULES = ('app.services.utils', 'app.services.query_registry', 'app.services.errand_lookup',
+                        'app.core.query_metrics', 'contextlib')
+
+# Query records of the HTTP request being served (set by the middleware in main.py)
+_request_queries: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar('request_queries', default=None)
+
+def _calling_service(depth: int = 1) -> str:
+    """Class name (or module) of the first caller outside the data-access layer"""
+    frame = sys._getframe(depth)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(_DATA_ACCESS_MODULES):
+            owner = frame.f_locals.get('self')
+            if owner is not None:
+                return type(owner).__name__
+            owner = frame.f_locals.get('cls')
+            if isinstance(owner, type):
+                return owner.__name__
+            return module.rsplit('.', 1)[-1]
+        frame = frame.f_back
+    return 'unknown'
+
+class QueryMetrics:
+    """
+    Process-wide latency / rows / bytes / error counters for every database read, keyed by
+    (query name, calling service), plus the per-query breakdown of the most recent HTTP requests.
+    """
+    def __init__(self):
+        self.recent_limit = int(os.getenv('QUERY_METRICS_RECENT_REQUESTS', '50'))
+        self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._recent: deque = deque(maxlen=self.recent_limit)
+        self._lock = threading.Lock()
+
+    def record(self, query: str, service: str, seconds: float, rows: int = 0, nbytes: int = 0, error: bool = False):
+        ms = seconds * 1000
+        with self._lock:
+            stat = self._stats.get((query, service))
+            if stat is None:
+                stat = self._stats[(query, service)] = {
+                    'query': query, 'service': service, 'calls': 0, 'errors': 0,
+                    'totalMs': 0.0, 'maxMs': 0.0, 'rows': 0, 'bytes': 0}
+            stat['calls'] += 1
+            stat['errors'] += int(error)
+            stat['totalMs'] += ms
+            stat['maxMs'] = max(stat['maxMs'], ms)
+            stat['rows'] += rows
+            stat['bytes'] += nbytes
+
+        records = _request_queries.get()
+        if records is not None:
+            records.append({'query': query, 'service': service, 'ms': round(ms, 2),
+                            'rows': rows, 'bytes': nbytes, 'error': error})
+
+    @contextmanager
+    def track(self, query: Optional[str]):
+        """
+        Time one database read. The body sets holder['df'] to the fetched DataFrame
+        (and optionally holder['bytes'] when the transferred size is known).
+        """
+        holder: Dict[str, Any] = {}
+        service = _calling_service()
+        started = time.perf_counter()
+        try:
+            yield holder
+        except Exception:
+            self.record(query or 'adhoc', service, time.perf_counter() - started, error=True)
+            raise
+        df = holder.get('df')
+        rows = len(df) if df is not None else 0
+        nbytes = holder.get('bytes')
+        if nbytes is None:
+            nbytes = int(df.memory_usage(index=False).sum()) if df is not None and not df.empty else 0
+        self.record(query or 'adhoc', service, time.perf_counter() - started, rows, nbytes)
+
+    def start_request(self, label: str):
+        return label, _request_queries.set([])
+
+    def end_request(self, handle) -> Dict[str, Any]:
+        """Close the request opened by start_request and keep its breakdown in the recent list"""
+        label, token = handle
+        records = _request_queries.get() or []
+        _request_queries.reset(token)
+
+        by_query: Dict[str, Dict[str, Any]] = {}
+        for rec in records:
+            agg = by_query.setdefault(rec['query'], {'query': rec['query'], 'calls': 0, 'ms': 0.0, 'rows': 0})
+            agg['calls'] += 1
+            agg['ms'] = round(agg['ms'] + rec['ms'], 2)
+            agg['rows'] += rec['rows']
+        breakdown = {
+            'request': label,
+            'queries': len(records),
+            'dbMs': round(sum(rec['ms'] for rec in records), 2),
+            'byQuery': sorted(by_query.values(), key=lambda agg: agg['ms'], reverse=True),
+            'calls': records,
+        }
+        if records:
+            with self._lock:
+                self._recent.append(breakdown)
+        return breakdown
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Aggregates sorted by total time, and the most recent request breakdowns (newest first)"""
+        with self._lock:
+            stats = [dict(stat) for stat in self._stats.values()]
+            recent = list(self._recent)[::-1]
+        for stat in stats:
+            stat['avgMs'] = round(stat['totalMs'] / stat['calls'], 2) if stat['calls'] else 0.0
+            stat['totalMs'] = round(stat['totalMs'], 2)
+            stat['maxMs'] = round(stat['maxMs'], 2)
+        stats.sort(key=lambda stat: stat['totalMs'], reverse=True)
+        return {'queries': stats, 'recentRequests': recent}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._recent.clear()
+
+query_metrics = QueryMetrics()
@@ -1,7 +1,7 @@
 from __future__ import annotations
 import pandas as pd
 from dataclasses import dataclass, field
-from typing import Sequence
+from typing import Sequence, Optional, Dict, Any
 from ..services.services import DefaultServices
 from ..services.processor import Processor
 from ..services.parser import Parser
@@ -9,6 +9,8 @@ from ..services.resolver import SenderResolver, ReceiverResolver, StaffResolver
 from ..services.extractor import Extractor
 from ..services.classifier import Classifier
 from ..services.connector import Connector
+from ..services.pending_emails import pending_emails
+from ..core.connect_trace import connect_tracer
 
 
 
@@ -30,6 +32,9 @@ class EmailDataset:
     extractor: Extractor = field(init=False)
     classifier: Classifier = field(init=False)
     connector: Connector = field(init=False)
+
+    # Connector trace report of the last do_connect(trace=True) run
+    connect_report: Optional[Dict[str, Any]] = field(default=None, init=False)
     
     # Standard return columns for preprocessing
     RETURN_COLS: Sequence[str] = (
@@ -100,15 +105,27 @@ class EmailDataset:
         # Filter to only return required columns
         return self.df[list(self.RETURN_COLS)]
     
-    def do_connect(self) -> pd.DataFrame:
-        """Categorize emails and connect them with errands."""
+    def do_connect(self, trace: bool = False, track: bool = False) -> pd.DataFrame:
+        """Categorize emails and connect them with errands.
+        With trace (or CONNECTOR_TRACE set) the Connector strategies are traced into self.connect_report.
+        With track the unmatched emails are kept for re-matching (trusted callers only, see PendingEmails).
+        """
         try:
             self.df = self.do_preprocess()
             self.df = self.classifier.initialize_columns(self.df)
             self.df = self.extractor.extract_numbers_from_attach(self.df)
             self.df = self.extractor.extract_numbers_from_email(self.df)
             self.df = self.classifier.categorize_emails(self.df)
-            self.df = self.connector.connect_with_time_windows(self.df)
+            if trace or connect_tracer.enabled:
+                handle = connect_tracer.start(f"do_connect ({len(self.df)} emails)")
+                try:
+                    self.df = self.connector.connect_with_time_windows(self.df)
+                finally:
+                    self.connect_report = connect_tracer.finish(handle)
+            else:
+                self.df = self.connector.connect_with_time_windows(self.df)
+            if track:
+                pending_emails.track_later(self.df)
             self.df = self.classifier.refine_finalize(self.df)
             return self.df
 
@@ -1,8 +1,10 @@
 from __future__ import annotations
+import asyncio
 import pandas as pd
 from typing import Dict, Any, Optional
 from dataclasses import dataclass, field
 from ..services.utils import fetchFromDB
+from ..services.query_registry import query_registry
 from ..services.services import DefaultServices
 from ..services.base_service import BaseService
 from ..services.forward import ForwardService
@@ -18,29 +20,29 @@ class ForwardDataset:
     base_service: BaseService = field(init=False)
     forward_service: ForwardService = field(init=False)
     addressResolver: AddressResolver = field(init=False)
-    forward_query: str = field(init=False)
 
     def __post_init__(self):
         """Initialize all services and queries after dataclass creation"""
         self.base_service = BaseService()
         self.forward_service = self.services.get_forwarder()
         self.addressResolver = self.services.get_addressResolver()
-        self.forward_query = self.base_service.queries['forwardSummaryInfo'].iloc[0]
         self.journal_contact_query = self.base_service.queries['forwardJournalContact'].iloc[0]
-        self.journal_contact_df = fetchFromDB(self.journal_contact_query)
+        self.journal_contact_df = fetchFromDB(self.journal_contact_query, name='forwardJournalContact')
         fw_cates = self.base_service.forward_suggestion[
             self.base_service.forward_suggestion['action'].str.endswith('_Template')].action.to_list()
         self.fw_cates = [item.replace('_Template', '') for item in fw_cates]
 
 
-    def enrich_email_data(self) -> "ForwardDataset":
+    async def enrich_email_data(self) -> "ForwardDataset":
         """Enrich internal DataFrame with email data from database - returns self for chaining"""
         try:
             if not self.df.empty:
                 id = self.df.iloc[0]['id']
 
-                email_spec_query = self.base_service.queries['emailSpec'].iloc[0]
-                bas_email = fetchFromDB(email_spec_query.format(COND=(f"e.id = {id}")))
+                bas_email, adds_on = await asyncio.gather(
+                    query_registry.fetch_async('emailById', email_id=int(id)),
+                    query_registry.fetch_async('forwardSummaryInfo', email_id=int(id))
+                )
                 ds = EmailDataset(df=bas_email, services=self.services)
                 email = ds.do_preprocess()
 
@@ -49,9 +51,6 @@ class ForwardDataset:
                 columns_to_drop = ['receiver','errandId','reference','sender']
                 email = email.drop(columns=columns_to_drop)
 
-                forward_query = self.forward_query.format(COND=(f"e.id = {id}"))
-                adds_on = fetchFromDB(forward_query)
-
                 if not adds_on.empty:
                     category = adds_on['correctedCategory'].iloc[0]
                     if category not in self.fw_cates:
@@ -177,7 +176,7 @@ class ForwardDataset:
                 'journal_data': None
             }
 
-    def do_forward(self) -> pd.DataFrame:
+    async def do_forward(self) -> pd.DataFrame:
         """Perform forwarding on the internal DataFrame - main processing method
 
         Returns:
@@ -190,8 +189,7 @@ class ForwardDataset:
                 }])
 
         try:
-            (self.enrich_email_data()
-                 .clean_email_content())
+            (await self.enrich_email_data()).clean_email_content()
 
             if hasattr(self, 'error') and self.error:
                 return pd.DataFrame([{
@@ -199,6 +197,9 @@ class ForwardDataset:
                     'error': self.error
                 }])
 
+            if 'userId' in self.df.columns:
+                self.addressResolver.errand_lookup.prefetch_admins(self.df['userId'])
+
             results = []
             for _, row in self.df.iterrows():
                 forwarding_id = row.get('id')
@@ -18,7 +18,7 @@ class LogDataset:
         """Initialize services after dataclass creation"""
         self.log_service = LogService()
     
-    def do_chronological_log(self) -> pd.DataFrame:
+    async def do_chronological_log(self) -> pd.DataFrame:
         """
         Generate chronological logs for all errands in the internal DataFrame - main processing method
 
@@ -36,7 +36,7 @@ class LogDataset:
                     continue
                 
                 self.log_service.setup_query_conditions(errand_number)
-                base_data = self.log_service.get_errand_base_data()
+                base_data = await self.log_service.get_errand_base_data()
 
                 if base_data.empty:
                     error_result = {
@@ -51,9 +51,9 @@ class LogDataset:
                     continue
 
                 errand_id = base_data['errandId'].iloc[0]
-                log_components = self._generate_all_log_components(base_data)
+                log_components = await self._generate_all_log_components(base_data)
 
-                group_log, group_ai = self.log_service.create_formatted_log(
+                group_log, group_ai = await self.log_service.create_formatted_log(
                     base_data,
                     *log_components
                 )
@@ -96,7 +96,7 @@ class LogDataset:
 
         return pd.DataFrame(results)
     
-    def _generate_all_log_components(self, base_data: pd.DataFrame) -> List[pd.DataFrame]:
+    async def _generate_all_log_components(self, base_data: pd.DataFrame) -> List[pd.DataFrame]:
         """
         Generate all log components efficiently.
         
@@ -119,7 +119,7 @@ class LogDataset:
             components.append(send_log)
 
         # Get email data and create update log
-        email_log, email_base = self.log_service.get_email_data()
+        email_log, email_base = await self.log_service.get_email_data()
         if not email_log.empty:
             components.append(email_log)
 
@@ -129,40 +129,40 @@ class LogDataset:
             components.append(update_log)
 
         # Get chat data
-        chat_log = self.log_service.get_chat_data(base_data)
+        chat_log = await self.log_service.get_chat_data(base_data)
         if not chat_log.empty:
             components.append(chat_log)
 
-        comment_log = self.log_service.get_comment_data(base_data)
+        comment_log = await self.log_service.get_comment_data(base_data)
         if not comment_log.empty:
             components.append(comment_log)
 
-        vet_fee_log = self.log_service.get_vet_fee_data()
+        vet_fee_log = await self.log_service.get_vet_fee_data()
         if not vet_fee_log.empty:
             components.append(vet_fee_log)
             
-        invoice_log = self.log_service.get_invoice_data()
+        invoice_log = await self.log_service.get_invoice_data()
         if not invoice_log.empty:
             components.append(invoice_log)
 
         # Get payment data
-        payment_log = self.log_service.get_payment_data()
+        payment_log = await self.log_service.get_payment_data()
         if not payment_log.empty:
             components.append(payment_log)
 
         # Get cancellation data
-        cancel_log = self.log_service.get_cancellation_data()
+        cancel_log = await self.log_service.get_cancellation_data()
         if not cancel_log.empty:
             components.append(cancel_log)
 
         # Get cancellation reversal data
-        remove_cancel_log = self.log_service.get_reversal_data()
+        remove_cancel_log = await self.log_service.get_reversal_data()
         if not remove_cancel_log.empty:
             components.append(remove_cancel_log)
         
         return components
 
-    def get_statistics(self) -> pd.DataFrame:
+    async def get_statistics(self) -> pd.DataFrame:
         """
         Get statistics for processed logs DataFrame
 
@@ -173,7 +173,7 @@ class LogDataset:
             return pd.DataFrame()
 
         # Process logs if not already done
-        result_df = self.do_chronological_log()
+        result_df = await self.do_chronological_log()
 
         if result_df.empty:
             return pd.DataFrame()
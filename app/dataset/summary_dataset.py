@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 import pandas as pd
 from typing import Any
 from dataclasses import dataclass, field
@@ -19,7 +20,7 @@ class SummaryDataset:
         """Initialize services after dataclass creation"""
         self.summary_service = self.services.get_summary_service()
 
-    def do_summary(self, use_case: str = 'api') -> pd.DataFrame:
+    async def do_summary(self, use_case: str = 'api') -> pd.DataFrame:
         """
         Generate comprehensive summary based on internal DataFrame - main processing method
 
@@ -35,15 +36,17 @@ class SummaryDataset:
         try:
             results = []
             for _, row in self.df.iterrows():
-                conditions = self.summary_service.build_condition(
+                lookup = self.summary_service.build_lookup(
                     email_id=row.get('emailId'),
                     errand_number=row.get('errandNumber'),
                     reference=row.get('reference')
                 )
 
-                chat_df = self.summary_service.fetch_data('chat', conditions['chat'])
-                email_df = self.summary_service.fetch_data('email', conditions['email'])
-                comment_df = self.summary_service.fetch_data('comment', conditions['comment'])
+                chat_df, email_df, comment_df = await asyncio.gather(
+                    self.summary_service.fetch_data('chat', lookup),
+                    self.summary_service.fetch_data('email', lookup),
+                    self.summary_service.fetch_data('comment', lookup)
+                )
 
                 # Generate summary data directly as dict instead of Pydantic model
                 if use_case == 'webService':
@@ -231,7 +234,7 @@ class SummaryDataset:
 
         return result_data
 
-    def get_statistics(self) -> pd.DataFrame:
+    async def get_statistics(self) -> pd.DataFrame:
         """Get statistics about available data for processed summaries
 
         Returns:
@@ -244,15 +247,17 @@ class SummaryDataset:
 
         try:
             for _, row in self.df.iterrows():
-                conditions = self.summary_service.build_condition(
+                lookup = self.summary_service.build_lookup(
                     email_id=row.get('emailId'),
                     errand_number=row.get('errandNumber'),
                     reference=row.get('reference')
                 )
 
-                chat_df = self.summary_service.fetch_data('chat', conditions['chat'])
-                email_df = self.summary_service.fetch_data('email', conditions['email'])
-                comment_df = self.summary_service.fetch_data('comment', conditions['comment'])
+                chat_df, email_df, comment_df = await asyncio.gather(
+                    self.summary_service.fetch_data('chat', lookup),
+                    self.summary_service.fetch_data('email', lookup),
+                    self.summary_service.fetch_data('comment', lookup)
+                )
 
                 stats = {
                     'emailId': row.get('emailId'),
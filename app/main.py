@@ -3,24 +3,53 @@ from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from .core.database import init_engine, dispose_engine, init_async_engine, dispose_async_engine
+from .core.query_metrics import query_metrics
+from .services.errand_cache import errand_cache
+from .services.pdf_text import pdf_text_extractor
+
 # Get project root directory path
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared database pools and warm the errand cache on startup; release the pools (and PDF workers) on shutdown"""
+    init_engine()
+    await init_async_engine()
+    errand_cache.refresh_async()
+    yield
+    await dispose_async_engine()
+    dispose_engine()
+    pdf_text_extractor.shutdown()
+
 app = FastAPI(
     title="Email Processing API",
     description="FastAPI application for email categorization and forwarding",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY", "your-secret-key"))
 
+@app.middleware("http")
+async def query_metrics_middleware(request: Request, call_next):
+    """Collect the database reads of each request; the totals are returned in the Server-Timing header"""
+    handle = query_metrics.start_request(f"{request.method} {request.url.path}")
+    try:
+        response = await call_next(request)
+    finally:
+        breakdown = query_metrics.end_request(handle)
+    response.headers["Server-Timing"] = f'db;dur={breakdown["dbMs"]};desc="{breakdown["queries"]} queries"'
+    return response
+
 @app.exception_handler(HTTPException)
 async def auth_exception_handler(request: Request, exc: HTTPException):
     """Handle authentication exceptions by redirecting to login"""
@@ -42,6 +71,7 @@ from .api.payment import router as payment_router
 from .api.summary import router as summary_router
 from .api.log import router as log_router
 from .api.update_clinic import router as clinic_router
+from .api.metrics import router as metrics_router
 
 app.include_router(auth_router, tags=["authentication"])
 app.include_router(category_router, tags=["categorization"])
@@ -50,6 +80,7 @@ app.include_router(payment_router, tags=["payment"])
 app.include_router(summary_router, tags=["summary"])
 app.include_router(log_router, tags=["chronological-log"])
 app.include_router(clinic_router, tags=["clinic-update"])
+app.include_router(metrics_router, tags=["metrics"])
 
 @app.get("/")
 async def home():
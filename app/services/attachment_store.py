@@ -0,0 +1,86 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Optional, Dict, Any, List
+
+class AttachmentStore:
+    """
+    Attachment contents spooled out of the request at ingestion, so DataFrames only carry small handles
+    (Name, ContentType, ContentLength, Hash) through the pipeline. Contents are kept as received (base64)
+    in content-addressed files under ATTACHMENT_SPOOL_DIR and only read, and decoded by the caller, for the
+    attachments that are actually needed. Files untouched for ATTACHMENT_SPOOL_TTL_SECONDS are removed.
+    """
+    def __init__(self):
+        self.folder = os.getenv('ATTACHMENT_SPOOL_DIR') or os.path.join(tempfile.gettempdir(), 'email_attachments')
+        self.ttl_seconds = int(os.getenv('ATTACHMENT_SPOOL_TTL_SECONDS', '3600'))
+        self._swept_at = 0.0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, key)
+
+    def _write(self, key: str, content: str):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.utime(path)  # keep a re-sent attachment alive
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix='.spool-')
+        with os.fdopen(fd, 'w', encoding='ascii', errors='ignore') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def _sweep(self):
+        now = time.time()
+        with self._lock:
+            if now - self._swept_at < self.ttl_seconds / 4 or not os.path.isdir(self.folder):
+                return
+            self._swept_at = now
+        try:
+            for entry in os.scandir(self.folder):
+                if entry.is_file() and now - entry.stat().st_mtime > self.ttl_seconds:
+                    os.remove(entry.path)
+        except OSError as e:
+            print(f"❌ Error cleaning attachment spool {self.folder}: {str(e)}")
+
+    @staticmethod
+    def _field(attachment: Any, name: str) -> Any:
+        if isinstance(attachment, dict):
+            return attachment.get(name, attachment.get(name.lower()))
+        return getattr(attachment, name, None)
+
+    def spool(self, attachments: Optional[List[Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Write the contents of AttachmentIn models (or dicts) to the store and return their handles"""
+        if attachments is None:
+            return None
+        self._sweep()
+        handles = []
+        for attachment in attachments:
+            content = self._field(attachment, 'Content')
+            handle = {'Name': self._field(attachment, 'Name'), 'ContentType': self._field(attachment, 'ContentType'),
+                      'ContentLength': self._field(attachment, 'ContentLength'), 'Hash': None}
+            if isinstance(content, str) and content:
+                key = hashlib.sha256(content.encode('utf-8')).hexdigest()
+                try:
+                    self._write(key, content)
+                    handle['Hash'] = key
+                except OSError as e:
+                    print(f"❌ Error spooling attachment {handle['Name']}: {str(e)}")
+                    handle['Content'] = content  # keep it inline rather than lose it
+                if handle['ContentLength'] is None:
+                    handle['ContentLength'] = len(content) * 3 // 4  # decoded size, roughly
+            handles.append(handle)
+        return handles
+
+    def read(self, key: str) -> Optional[str]:
+        """base64 content of a spooled attachment (None when it is gone)"""
+        try:
+            with open(self._path(key), encoding='ascii') as f:
+                return f.read()
+        except OSError as e:
+            print(f"❌ Error reading spooled attachment {key}: {str(e)}")
+            return None
+
+attachment_store = AttachmentStore()
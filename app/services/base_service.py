@@ -3,6 +3,8 @@ import regex as reg
 import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
+from .pattern_registry import pattern_registry, REGEX_ACTIONS, MATCH_FLAGS
+from .category_engine import CategoryEngine
 load_dotenv()
 
 class BaseService:
@@ -47,21 +49,15 @@ class BaseService:
         self.clinic_keyword['keyword'] = self.clinic_keyword['keyword'].apply(lambda x: x.split(',') if isinstance(x, str) else [])
 
         clinic_comp_type_df = pd.read_csv(f"{self.folder}/clinicCompType.csv")
-        self.clinic_complete_type = clinic_comp_type_df.complement.tolist()
 
-        # Text processing data
+        # Text processing data (compiled into the *_patterns handles below)
         stop_words_df = pd.read_csv(f"{self.folder}/stopWords.csv")
-        self.stop_words = stop_words_df.stopWords.tolist()
         forward_words_df = pd.read_csv(f"{self.folder}/forwardWords.csv")
-        self.forward_words = forward_words_df.forwardWords.tolist()
         self.forward_suggestion = pd.read_csv(f"{self.folder}/forwardSuggestion.csv")
         
         # Provet Cloud specific data
         self.clinic_provetcloud = self.clinic[self.clinic['provetCloud'].notna()][['clinicName','provetCloud']].drop_duplicates()
         self.clinic_provetcloud['keyword'] = self.clinic_provetcloud['provetCloud'].apply(lambda x: x.split(',') if isinstance(x, str) else [])
-        self.msg_provetcloud_reg = self.forward_suggestion[self.forward_suggestion['action']=='ProvetCloud_Msg'].templates.to_list()
-        self.clinic_provetcloud_reg = self.forward_suggestion[self.forward_suggestion['action']=='ProvetCloud_Clinic'].templates.to_list()
-        self.receiver_provetcloud_reg = self.forward_suggestion[self.forward_suggestion['action']=='ProvetCloud_Recipient'].templates.to_list()
         
         # Insurance company mappings
         self.receiver_mappings = {
@@ -97,6 +93,23 @@ class BaseService:
         # Payment service data
         self.info_reg = pd.read_csv(f"{self.folder}/infoReg.csv")
         self.bank_map = pd.read_csv(f"{self.folder}/bankMap.csv")
+
+        # Regexes of the tables above, compiled once per table snapshot (pattern_registry)
+        pattern_registry.new_generation()
+        self.forward_words_patterns = pattern_registry.table('forwardWords', forward_words_df, 'forwardWords')
+        self.forward_words_search_patterns = pattern_registry.table('forwardWords', forward_words_df, 'forwardWords', reg.DOTALL)
+        self.stop_words_patterns = pattern_registry.table('stopWords', stop_words_df, 'stopWords')
+        self.clinic_complete_type_patterns = pattern_registry.table('clinicCompType', clinic_comp_type_df, 'complement')
+        self.forward_suggestion_patterns = {
+            action: pattern_registry.table('forwardSuggestion', rows, 'templates', 0 if action == 'Forward_Address' else MATCH_FLAGS)
+            for action, rows in self.forward_suggestion[self.forward_suggestion['action'].isin(REGEX_ACTIONS)].groupby('action')
+        }
+        pattern_registry.table('numberReg', self.number_reg_list, 'regex')
+        pattern_registry.table('attachReg', self.attach_reg_list, 'regex')
+        pattern_registry.table('infoReg', self.info_reg, 'regex', reg.DOTALL | reg.IGNORECASE)
+        self.category_engine = CategoryEngine({category: regs.dropna().tolist()
+                                               for category, regs in self.category_reg_list.groupby('category')['regex']})
+        pattern_registry.sweep()
         
         # Cache all loaded data
         BaseService._data_cache = {
@@ -108,14 +121,8 @@ class BaseService:
             'clinic': self.clinic,
             'clinic_list': self.clinic_list,
             'clinic_keyword': self.clinic_keyword,
-            'clinic_complete_type': self.clinic_complete_type,
-            'stop_words': self.stop_words,
-            'forward_words': self.forward_words,
             'forward_suggestion': self.forward_suggestion,
             'clinic_provetcloud': self.clinic_provetcloud,
-            'msg_provetcloud_reg': self.msg_provetcloud_reg,
-            'clinic_provetcloud_reg': self.clinic_provetcloud_reg,
-            'receiver_provetcloud_reg': self.receiver_provetcloud_reg,
             'receiver_mappings': self.receiver_mappings,
             'number_reg_list': self.number_reg_list,
             'attach_reg_list': self.attach_reg_list,
@@ -128,7 +135,13 @@ class BaseService:
             'category_reg_list': self.category_reg_list,
             'forward_format': self.forward_format,
             'info_reg': self.info_reg,
-            'bank_map': self.bank_map
+            'bank_map': self.bank_map,
+            'forward_words_patterns': self.forward_words_patterns,
+            'forward_words_search_patterns': self.forward_words_search_patterns,
+            'stop_words_patterns': self.stop_words_patterns,
+            'clinic_complete_type_patterns': self.clinic_complete_type_patterns,
+            'forward_suggestion_patterns': self.forward_suggestion_patterns,
+            'category_engine': self.category_engine
         }
 
     def _load_from_cache(self):
@@ -142,14 +155,8 @@ class BaseService:
         self.clinic = cache['clinic']
         self.clinic_list = cache['clinic_list']
         self.clinic_keyword = cache['clinic_keyword']
-        self.clinic_complete_type = cache['clinic_complete_type']
-        self.stop_words = cache['stop_words']
-        self.forward_words = cache['forward_words']
         self.forward_suggestion = cache['forward_suggestion']
         self.clinic_provetcloud = cache['clinic_provetcloud']
-        self.msg_provetcloud_reg = cache['msg_provetcloud_reg']
-        self.clinic_provetcloud_reg = cache['clinic_provetcloud_reg']
-        self.receiver_provetcloud_reg = cache['receiver_provetcloud_reg']
         self.receiver_mappings = cache['receiver_mappings']
         self.number_reg_list = cache['number_reg_list']
         self.attach_reg_list = cache['attach_reg_list']
@@ -163,4 +170,10 @@ class BaseService:
         self.forward_format = cache['forward_format']
         self.info_reg = cache['info_reg']
         self.bank_map = cache['bank_map']
+        self.forward_words_patterns = cache['forward_words_patterns']
+        self.forward_words_search_patterns = cache['forward_words_search_patterns']
+        self.stop_words_patterns = cache['stop_words_patterns']
+        self.clinic_complete_type_patterns = cache['clinic_complete_type_patterns']
+        self.forward_suggestion_patterns = cache['forward_suggestion_patterns']
+        self.category_engine = cache['category_engine']
 
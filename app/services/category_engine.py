@@ -0,0 +1,173 @@
+import regex as reg
+from typing import Dict, List, Optional, Sequence
+from .regex_guard import regex_guard
+from .pattern_registry import pattern_registry
+
+# Escaped characters that stand for themselves
+_ESCAPED_LITERAL = set('.-/()[]{}?*+|^$\\:!,;=<>@#%&~\'"` ')
+# Global inline flags (e.g. (?x)) change how the rest of the pattern reads; such patterns get no prefilter
+_GLOBAL_FLAGS = reg.compile(r'\(\?[a-zA-Z]+\)')
+_QUANTIFIER = reg.compile(r'\*|\+|\?|\{(\d*)(,?)(\d*)\}')
+
+def _skip_class(src: str, i: int) -> int:
+    """Index after the character class starting at src[i] == '['"""
+    i += 1
+    if i < len(src) and src[i] == '^':
+        i += 1
+    if i < len(src) and src[i] == ']':
+        i += 1
+    while i < len(src) and src[i] != ']':
+        i += 2 if src[i] == '\\' else (_skip_class(src, i) - 1 if src[i] == '[' else 1)
+    return i + 1
+
+def _skip_group(src: str, i: int) -> int:
+    """Index after the group starting at src[i] == '('"""
+    depth = 0
+    while i < len(src):
+        c = src[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '[':
+            i = _skip_class(src, i)
+            continue
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+def _top_level_branches(src: str) -> List[str]:
+    branches, start, i = [], 0, 0
+    while i < len(src):
+        c = src[i]
+        if c == '\\':
+            i += 2
+        elif c == '[':
+            i = _skip_class(src, i)
+        elif c == '(':
+            i = _skip_group(src, i)
+        elif c == '|':
+            branches.append(src[start:i])
+            start = i = i + 1
+        else:
+            i += 1
+    branches.append(src[start:])
+    return branches
+
+def _branch_literal(branch: str) -> Optional[str]:
+    """Longest run of plain characters every match of the branch contains; None when it cannot be told"""
+    runs: List[str] = []
+    run: List[str] = []
+    i = 0
+    while i < len(branch):
+        c = branch[i]
+        if c == '\\':
+            nxt = branch[i + 1:i + 2]
+            if nxt in _ESCAPED_LITERAL:
+                atom: Optional[str] = nxt
+            elif nxt and nxt in 'dDwWsSbBntrfvAZ':
+                atom = None
+            else:
+                return None  # \x.., \p{..}, backreferences, ...: not worth interpreting
+            i += 2
+        elif c == '[':
+            atom, i = None, _skip_class(branch, i)
+        elif c == '(':
+            atom, i = None, _skip_group(branch, i)
+        elif c in '.^$':
+            atom, i = None, i + 1
+        elif c in '*+?{)':
+            return None
+        else:
+            atom, i = c, i + 1
+
+        quantifier = _QUANTIFIER.match(branch, i)
+        at_least_once = True
+        if quantifier is not None:
+            i = quantifier.end()
+            if i < len(branch) and branch[i] in '?+':
+                i += 1  # lazy / possessive
+            text = quantifier.group(0)
+            if text in ('*', '?') or (text.startswith('{') and not (quantifier.group(1) or '0').strip('0')):
+                at_least_once = False
+        if atom is None or not at_least_once:
+            runs.append(''.join(run))
+            run = []
+        else:
+            run.append(atom)
+            if quantifier is not None:
+                runs.append(''.join(run))
+                run = [atom]
+    runs.append(''.join(run))
+    longest = max(runs, key=len)
+    return longest or None
+
+def required_literals(src: str, casefold: bool = True) -> Optional[List[str]]:
+    """
+    Literals one of which occurs in every text the pattern matches, one per top-level branch; None when
+    some branch has no usable literal. Casefolded by default, which holds for case-insensitive matching
+    too; with casefold=False they are exact and only valid for case-sensitive patterns.
+    """
+    if _GLOBAL_FLAGS.search(src):
+        return None
+    literals = []
+    for branch in _top_level_branches(src):
+        literal = _branch_literal(branch)
+        if not literal:
+            return None
+        literals.append(literal.casefold() if casefold else literal)
+    return literals
+
+class CategoryEngine:
+    """
+    Classification of an email against the categoryReg.csv regexes with a literal prefilter.
+
+    Each regex is reduced to the literal text every match must contain; an email is casefolded once and
+    a category's regexes only run when one of its literals occurs in it (regexes without a usable literal
+    always run). first_match returns the first category, in the given precedence order, that matches.
+    BaseService builds one engine per loaded categoryReg snapshot; the combined pattern of each category
+    is compiled through pattern_registry (table 'categoryReg', keyed by category).
+    """
+    def __init__(self, regexes: Dict[str, List[str]], flags: int = reg.IGNORECASE):
+        self.flags = flags
+        self.patterns: Dict[str, reg.Pattern] = {}
+        self.literals: Dict[str, Optional[List[str]]] = {}
+        for category, sources in regexes.items():
+            sources = [str(p) for p in sources if str(p)]
+            if not sources:
+                continue
+            pattern = pattern_registry.pattern('categoryReg', category, '|'.join(f"(?:{p})" for p in sources), flags)
+            if pattern is None:
+                continue
+            self.patterns[category] = pattern
+            literals: Optional[List[str]] = []
+            for src in sources:
+                found = required_literals(src)
+                if found is None:
+                    literals = None
+                    break
+                literals += found
+            self.literals[category] = sorted(set(literals)) if literals is not None else None
+
+    def may_match(self, category: str, folded: str) -> bool:
+        """Prefilter: False when the category's regexes cannot match the (casefolded) text"""
+        literals = self.literals.get(category)
+        return literals is None or any(literal in folded for literal in literals)
+
+    def search(self, category: str, text: str) -> bool:
+        pattern = self.patterns.get(category)
+        return pattern is not None and regex_guard.search(pattern, text) is not None
+
+    def first_match(self, text: str, categories: Sequence[str], folded: Optional[str] = None) -> Optional[str]:
+        """The first of categories (precedence order) whose regex matches anywhere in text"""
+        if not text:
+            return None
+        folded = text.casefold() if folded is None else folded
+        for category in categories:
+            if category in self.patterns and self.may_match(category, folded) and self.search(category, text):
+                return category
+        return None
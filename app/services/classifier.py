@@ -1,25 +1,18 @@
-import regex as reg
+import numpy as np
 import pandas as pd
 from .base_service import BaseService
-from .utils import fetchFromDB, tz_convert
+from .utils import tz_convert
+from .query_registry import query_registry
+from .errand_lookup import ErrandLookup
+from .rule_plan import RulePlan, rule_plan_stats
 from typing import Optional
 
 class Classifier(BaseService):
-    def __init__(self):
+    def __init__(self, errand_lookup: Optional[ErrandLookup] = None):
         super().__init__()
-        self.info_query = self.queries['info'].iloc[0]
+        self.errand_lookup = errand_lookup or ErrandLookup()
         self.category_list = self.category_reg_list['category'].unique().tolist()
-        self.category_patterns = {category: reg.compile('|'.join(f"(?:{p})" for p in regs.dropna() if str(p)), reg.IGNORECASE)
-                                    for category, regs in self.category_reg_list.groupby('category')['regex']
-                                    if not regs.dropna().empty
-                                }
-
-    def _safe_pattern_search(self, pattern, s):
-        """Safely search pattern in string, handling None values and errors"""
-        try:
-            return bool(pattern and pattern.search(str(s))) if s and str(s) != 'nan' else False
-        except (AttributeError, TypeError):
-            return False
+        self.last_rule_plan: Optional[RulePlan] = None
 
     def initialize_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         number_cols = self.number_reg_list['number'].unique()
@@ -72,22 +65,46 @@ class Classifier(BaseService):
         df = pd.merge(df, fb_reference, left_on='sender', right_on='insuranceCompany', how='left').drop('insuranceCompany', axis=1)
         return df
     
-    def identify_first_info(self, infoDate, subject: str) -> str:
-        safe_subject = subject.replace("'", "''")
-        condition = (f"""ecr."timestamp" >= ('{infoDate}'::timestamptz) - INTERVAL '5 minutes'
-                        AND ecr."timestamp" < '{infoDate}'::timestamptz
-                        AND e.subject = '{safe_subject}'""" )
-        isFirst = fetchFromDB(self.info_query.format(CONDITION=condition))
-        isFirst = tz_convert(isFirst, 'timestamp')
-    
-        if isFirst.empty:
-            return 'FirstInfo'
-        return 'Discard'
+    @staticmethod
+    def _to_utc_ns(s: pd.Series) -> np.ndarray:
+        return s.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+
+    def identify_first_info(self, info: pd.DataFrame) -> pd.Series:
+        """
+        'Discard' when an Information email with the same subject arrived in the 5 minutes before, in the
+        database or earlier in this batch, else 'FirstInfo'
+        """
+        notes = pd.Series('FirstInfo', index=info.index, dtype=object)
+        dated = info.loc[info['date'].notna() & info['subject'].notna(), ['date', 'subject']]
+        if dated.empty:
+            return notes
+
+        # One query for the whole batch window, then a per-subject sorted timestamp lookup
+        earlier = query_registry.fetch('infoWindow',
+                                       start=dated['date'].min(),
+                                       end=dated['date'].max(),
+                                       subjects=dated['subject'].astype(str).unique().tolist())
+        earlier_by_subject = {}
+        if not earlier.empty:
+            earlier = tz_convert(earlier, 'timestamp').dropna(subset=['timestamp', 'subject'])
+            earlier_by_subject = {subject: self._to_utc_ns(group['timestamp'])
+                                  for subject, group in earlier.groupby('subject')}
+
+        window = np.timedelta64(5, 'm')
+        for subject, group in dated.groupby(dated['subject'].astype(str)):
+            dates = self._to_utc_ns(group['date'])
+            # the batch's own Information emails count too; strictly earlier, so an email never discards itself
+            timestamps = np.sort(np.concatenate([earlier_by_subject.get(subject, dates[:0]), dates]))
+            lo = np.searchsorted(timestamps, dates - window, side='left')
+            hi = np.searchsorted(timestamps, dates, side='left')
+            notes.loc[group.index[hi > lo]] = 'Discard'
+
+        return notes
     
     def process_info(self, df: pd.DataFrame) -> pd.DataFrame:
         info_mask = df['category'] == 'Information'
         if info_mask.any():
-            df.loc[info_mask, 'note'] = df.loc[info_mask, ['date', 'subject']].apply(lambda row: self.identify_first_info(row['date'], row['subject']), axis=1)
+            df.loc[info_mask, 'note'] = self.identify_first_info(df.loc[info_mask])
         return df
     
     def enrich_staff_animal(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -105,16 +122,18 @@ class Classifier(BaseService):
         return df
     
     def get_ic_ref(self, errandId: int) -> Optional[str]:
-        errandInfo = fetchFromDB(self.errand_info_query.format(COND=f"er.id = {errandId}"))
-        if not errandInfo.empty:
-            return errandInfo['reference'].iloc[0]
+        errandInfo = self.errand_lookup.errand_info(errandId)
+        if errandInfo is not None:
+            return errandInfo['reference']
 
         return None
 
     def process_icReference(self, df: pd.DataFrame) -> pd.DataFrame:
         mask_ic_ref = (df['insuranceCaseRef'].isna() & (df['errandId'].apply(lambda x: len(x) == 1 if isinstance(x, (list, tuple)) else bool(x))))
         if mask_ic_ref.any():
-            df.loc[mask_ic_ref, 'insuranceCaseRef'] = (df.loc[mask_ic_ref, 'errandId'].apply(lambda x: self.get_ic_ref(x[0] if isinstance(x, (list, tuple)) else x)))
+            errand_ids = df.loc[mask_ic_ref, 'errandId'].apply(lambda x: x[0] if isinstance(x, (list, tuple)) else x)
+            self.errand_lookup.prefetch_errand_info(errand_ids)
+            df.loc[mask_ic_ref, 'insuranceCaseRef'] = errand_ids.apply(self.get_ic_ref)
         return df
     
     def refine_finalize(self, df: pd.DataFrame) -> pd.DataFrame:    
@@ -138,51 +157,26 @@ class Classifier(BaseService):
         """categorize emails based on predefined patterns and rules."""
          
         category_rules = [
-            {'category': 'Complement_Reply', 'mask': (df['source'] != 'Insurance_Company')},
-            {'category': 'Complement', 'mask': (df['source'] != 'Clinic')},
-            {'category': 'Settlement_Request', 'mask': (df['source'] != 'Clinic')},
-            {'category': 'Insurance_Validation_Error', 'mask': (df['source'] != 'Clinic')},
-            {'category': 'Wisentic_Error', 'mask': (df['originSender'] == 'Wisentic')},
-            {'category': 'Settlement_Approved', 'mask': (df['source'] == 'Insurance_Company')},
-            {'category': 'Message', 'mask': True}, 
+            {'category': 'Complement_Reply', 'mask': (df['source'] != 'Insurance_Company'), 'condition': "source != 'Insurance_Company'"},
+            {'category': 'Complement', 'mask': (df['source'] != 'Clinic'), 'condition': "source != 'Clinic'"},
+            {'category': 'Settlement_Request', 'mask': (df['source'] != 'Clinic'), 'condition': "source != 'Clinic'"},
+            {'category': 'Insurance_Validation_Error', 'mask': (df['source'] != 'Clinic'), 'condition': "source != 'Clinic'"},
+            {'category': 'Wisentic_Error', 'mask': (df['originSender'] == 'Wisentic'), 'condition': "originSender == 'Wisentic'"},
+            {'category': 'Settlement_Approved', 'mask': (df['source'] == 'Insurance_Company'), 'condition': "source == 'Insurance_Company'"},
+            {'category': 'Message', 'mask': True, 'condition': 'all'},
         ]
 
-        unassigned_mask = df['category'].isna()
-
+        plan = RulePlan(self.category_engine)
         for rule in category_rules:
-            category = rule['category']
-            if category not in self.category_patterns:
-                continue
-            pattern = self.category_patterns.get(category)
-            if pattern is None:
-                continue
-
-            text = df['email'].astype(str)
-            mask_regex = text.map(lambda s: self._safe_pattern_search(pattern, s))
-            combined_mask = unassigned_mask & rule['mask'] & mask_regex.fillna(False)
-            
-            df.loc[combined_mask, 'category'] = category
-            unassigned_mask = df['category'].isna() 
+            plan.regex(rule['category'], rule['mask'], rule['condition'])
+        plan.assign('Message', df['settlementAmount'].isna() & (df['totalAmount'] >= 0),
+                    'settlementAmount is null and totalAmount >= 0')
+        plan.first_of([category for category in self.category_list
+                       if category not in {r['category'] for r in category_rules}])
 
-        msg_mask = (df['category'].isna()) & \
-                   (df['settlementAmount'].isna()) & (df['totalAmount'] >= 0)
-        df.loc[msg_mask, 'category'] = 'Message'
-        
-        remaining_categories = [
-            cat for cat in self.category_list if cat not in {r['category'] for r in category_rules}
-        ]
-        unassigned_mask = df['category'].isna()
-        for category in remaining_categories:
-            if category in self.category_patterns:
-                pattern = self.category_patterns[category]
-                if pattern is None:
-                    continue
-                text = df['email'].astype(str)
-                mask_regex = text.map(lambda s: self._safe_pattern_search(pattern, s))
-                mask = unassigned_mask & mask_regex.fillna(False)
-                df.loc[mask, 'category'] = category
-                unassigned_mask = df['category'].isna()
-        
+        df = plan.run(df)
+        self.last_rule_plan = plan
+        rule_plan_stats.record(plan)
         return df
 
     def refine_categories(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -1,43 +1,66 @@
-from typing import Dict, Any, Optional, Tuple
+import os
+import time
+from typing import Dict, Any, Optional, Tuple, List, Callable
+import numpy as np
 import pandas as pd
-from .utils import fetchFromDB, check_eq, pick_first, check_full_parts_match, list_deduplicate, as_id_list, tz_convert
+from .utils import CHECK_EQ_GROUP, list_deduplicate, as_id_list
 from pandas.api.types import is_datetime64tz_dtype # type: ignore
 from .processor import Processor
+from .errand_cache import errand_cache
+from .errand_index import ErrandIndex, CreationTimeline
+from ..core.connect_trace import connect_tracer, ConnectTrace
+
+# Row positions [first, last + 1) of a matching pass in the newest-first snapshot
+Window = Tuple[int, int]
+
+# Reference and number strategies in the order _find_match_for_single_email tries them:
+# (connectedCol, email amount that must match: None = both amounts missing, note)
+NUMBER_STRATEGIES = [
+    ('insuranceNumber', None, 'Unreliable'),
+    ('insuranceNumber', 'settlementAmount', 'Reliable'),
+    ('insuranceNumber', 'totalAmount', 'Reliable'),
+    ('damageNumber', None, 'Unreliable'),
+    ('damageNumber', 'settlementAmount', 'Reliable'),
+    ('damageNumber', 'totalAmount', 'Reliable'),
+]
 
 class Connector(Processor):
     def __init__(self) -> None:
         super().__init__()
-        self.errand_connect_query = self.queries['errandConnect'].iloc[0]
-        self.errand_query_condition = [
-            "er.\"createdAt\" >= NOW() - INTERVAL '15 day'",
-            "er.\"createdAt\" >= NOW() - INTERVAL '3 month' AND er.\"createdAt\" < NOW() - INTERVAL '15 day'"
-        ]
+        # Batch mode joins all unmatched emails against the index at once; otherwise emails are matched one by one
+        self.batch_mode = os.getenv('CONNECTOR_BATCH_MODE', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
+        # Age boundaries of the passes (CONNECTOR_WINDOWS, default '15d,3m'), shared with the errand snapshot range
+        self.window_boundaries = errand_cache.window_boundaries
+        # Errands created up to date_slack after an email are still candidates (0 for live emails; see PendingEmails)
+        self.date_slack = pd.Timedelta(0)
 
     def connect_with_time_windows(self, df: pd.DataFrame) -> pd.DataFrame:
         """Connect emails with errands.
-        - If an ErrandDataset is provided, use its preloaded DataFrame.
-        - Otherwise, fall back to the existing DB-backed method that fetches.
+        - Errands come from the process-level ErrandCache snapshot (one fetch covering every window, already cleaned)
+          and its ErrandIndex, annotated with the tier each errand falls in.
+        - The newest tier is tried first; older tiers only for emails still unmatched, all in memory.
         """
         df = df.copy()
-        windows = getattr(self, 'errand_query_condition', [
-            "er.\"createdAt\" >= NOW() - INTERVAL '15 day'",
-            "er.\"createdAt\" >= NOW() - INTERVAL '3 month' AND er.\"createdAt\" < NOW() - INTERVAL '15 day'",
-        ])
-
-        for condi in windows:
+        index = errand_cache.get_index()
+        if index is None or index.size == 0:
+            return df
+        now = pd.Timestamp.now(tz='Europe/Stockholm')
+
+        trace = connect_tracer.current()
+        for tier, window in enumerate(index.window_tiers(now, self.window_boundaries)):
+            if trace is not None:
+                trace.tier = tier
             unmatched_mask = df['errandId'].apply(lambda x: len(x) == 0 if isinstance(x, (list, tuple)) else not x)
             if not unmatched_mask.any():
                 break
-            errand = self._fetch_and_format_errand(condi)
-            
-            if errand is None or errand.empty:
+            if window[0] >= window[1]:
                 continue
-            df = self._single_connect(df, errand)
+            df = self._single_connect(df, index, window)
             
         return df
     
-    def _single_connect(self, emails: pd.DataFrame, errands: pd.DataFrame) -> pd.DataFrame:
-        if errands is None or errands.empty:
+    def _single_connect(self, emails: pd.DataFrame, index: ErrandIndex, window: Window) -> pd.DataFrame:
+        if index is None or index.size == 0:
             return emails
         
         df = emails.copy()
@@ -45,8 +68,10 @@ class Connector(Processor):
         unmatched_mask = df['errandId'].apply(lambda x: len(x) == 0 if isinstance(x, (list, tuple)) else not x)
         if unmatched_mask.any():
             sub = df.loc[unmatched_mask].copy() 
-            applied = sub.apply(lambda row: self._find_match_for_single_email(row, errands), axis=1, result_type='expand')
-
+            if self.batch_mode:
+                applied = self._batch_find_matches(sub, index, window)
+            else:
+                applied = sub.apply(lambda row: self._find_match_for_single_email(row, index, window), axis=1, result_type='expand')
             errand_matched = applied.get('errand_matched', pd.Series(False, index=applied.index))
             hit_mask = errand_matched.eq(True) if isinstance(errand_matched, pd.Series) else errand_matched == True
             hit_idx = applied.index[hit_mask]
@@ -85,83 +110,132 @@ class Connector(Processor):
 
         return df
 
-    def _fetch_and_format_errand(self, condition: str) -> Optional[pd.DataFrame]:
-        query = self.errand_connect_query.format(CONDITION=condition)
-        errand_df = fetchFromDB(query)
-        if errand_df.empty:
-            return None
-
-        errand_df = tz_convert(errand_df, 'date')
-        text_cols = []
-        for col in errand_df.select_dtypes(include=['object', 'string']).columns:
-            sample_val = errand_df[col].dropna().iloc[0] if not errand_df[col].dropna().empty else None
-            if sample_val is not None and isinstance(sample_val, str):
-                text_cols.append(col)
-
-        if text_cols:
-            errand_df[text_cols] = errand_df[text_cols].apply(
-                lambda col: col.map(lambda v: self.clean_email_text(v) if pd.notna(v) and isinstance(v, str) else v))
-        for col in ['animalName', 'ownerName']:
-            errand_df[col] = errand_df[col].str.replace(r'[,._\-()/*\s]+', ' ', regex=True) \
-                                            .str.replace(r'[^a-zA-ZåäöÅÄÖ\'"´ ]', '', regex=True) \
-                                            .str.strip()
-        return errand_df
-           
-    def _errand_row_filter(self, row, email_sender, email_receiver):
-        # if row['reference'] == '1000725927':
-        sender_match = (
-            pd.notna(row['sender']) and pd.isna(row['receiver']) and pd.notna(email_sender) and
-            check_eq(row['sender'], email_sender))
-            
-        receiver_match = (
-            pd.isna(row['sender']) and pd.notna(row['receiver']) and pd.notna(email_receiver) and
-            check_eq(row['receiver'], email_receiver))
-        
-        both_match = (
-            pd.notna(row['sender']) and pd.notna(row['receiver']) and
-            pd.notna(email_sender) and pd.notna(email_receiver) and
-            check_eq(row['sender'], email_sender) and check_eq(row['receiver'], email_receiver))
-        
-        empty_match = pd.isna(row['sender']) and pd.isna(row['receiver'])
-
-        return sender_match or receiver_match or both_match or empty_match 
-        
-    def _filter_candidate_errand(self, email_row: pd.Series, errand: pd.DataFrame) -> pd.DataFrame:
-        cand = errand[errand['date'] <= email_row['date']].copy() 
-        if cand.empty: return cand
-        
+    @staticmethod
+    def _in_window(positions: np.ndarray, window: Window) -> np.ndarray:
+        return (positions >= window[0]) & (positions < window[1])
+
+    @staticmethod
+    def _eq_mask(values: Optional[np.ndarray], target, size: int) -> np.ndarray:
+        """check_eq(value, target) for every value"""
+        if values is None or pd.isna(target):
+            return np.zeros(size, dtype=bool)
+        mask = pd.notna(values) & (values == target)
+        if target in CHECK_EQ_GROUP:
+            mask |= np.fromiter((v in CHECK_EQ_GROUP for v in values), dtype=bool, count=size)
+        return mask
+
+    @staticmethod
+    def _email_sides(email_row: pd.Series) -> Tuple[Optional[str], Optional[str], Any, Any]:
+        """(errand column compared with the sender, errand column compared with the receiver, sender, receiver)"""
         email_source, email_sendTo   = email_row.get('source'), email_row.get('sendTo')
         email_sender = email_row.get('sender') if (pd.notna(email_row.get('sender'))) and (email_row.get('sender') not in ['DRP','Wisentic','Provet_Cloud']) else None
         email_receiver= email_row.get('receiver') if (pd.notna(email_row.get('receiver'))) and (email_row.get('receiver') not in ['DRP','Wisentic']) else None
-        cand = cand.assign(sender=pd.NA, receiver=pd.NA)
+        sender_col, receiver_col = None, None
         if pd.notna(email_sender) and (email_source == 'Insurance_Company') and (email_sendTo == 'Clinic'):
-            cand.loc[:, 'sender'] = cand['insuranceCompany']
+            sender_col = 'insuranceCompany'
             if pd.notna(email_receiver):
-                cand.loc[:, 'receiver'] = cand['clinicName']
+                receiver_col = 'clinicName'
         elif pd.notna(email_sender) and (email_source == 'Clinic') and (email_sendTo == 'Insurance_Company'):
-            cand.loc[:, 'sender'] = cand['clinicName']
+            sender_col = 'clinicName'
             if pd.notna(email_receiver):
-                cand.loc[:, 'receiver'] = cand['insuranceCompany']
-        mask = cand.apply(lambda row: self._errand_row_filter(row, email_sender, email_receiver), axis=1)
-        # if not mask.any():
-        return cand[mask]
+                receiver_col = 'insuranceCompany'
+        return sender_col, receiver_col, email_sender, email_receiver
+
+    @staticmethod
+    def _side_values(index: ErrandIndex, col: Optional[str], positions: np.ndarray) -> Optional[np.ndarray]:
+        if col is None:
+            return None
+        return (index.insurance_company if col == 'insuranceCompany' else index.clinic_name)[positions]
+
+    def _sender_receiver_mask(self, email_row: pd.Series, index: ErrandIndex, positions: np.ndarray) -> np.ndarray:
+        """Errands whose insurance company / clinic agree with the email's sender and receiver"""
+        size = len(positions)
+        sender_col, receiver_col, email_sender, email_receiver = self._email_sides(email_row)
+        row_sender = self._side_values(index, sender_col, positions)
+        row_receiver = self._side_values(index, receiver_col, positions)
+
+        sender_na = pd.isna(row_sender) if row_sender is not None else np.ones(size, dtype=bool)
+        receiver_na = pd.isna(row_receiver) if row_receiver is not None else np.ones(size, dtype=bool)
+        sender_eq = self._eq_mask(row_sender, email_sender, size)
+        receiver_eq = self._eq_mask(row_receiver, email_receiver, size)
+
+        sender_match = ~sender_na & receiver_na & sender_eq
+        receiver_match = sender_na & ~receiver_na & receiver_eq
+        both_match = ~sender_na & ~receiver_na & sender_eq & receiver_eq
+        empty_match = sender_na & receiver_na
+        return sender_match | receiver_match | both_match | empty_match
+
+    def _date_cutoff(self, email_row: pd.Series) -> Optional[int]:
+        """The email date (plus date_slack) as UTC nanoseconds; errands created after it are not candidates"""
+        cutoff = CreationTimeline.to_ns(email_row.get('date'))
+        if cutoff is None:
+            return None
+        return cutoff + self.date_slack.value
+
+    def _visible_range(self, email_row: pd.Series, index: ErrandIndex, window: Window) -> Tuple[int, int]:
+        """Positions of the window's errands created at or before the email (binary search on the timeline)"""
+        cutoff = self._date_cutoff(email_row)
+        if cutoff is None:
+            return window[1], window[1]
+        return max(window[0], index.timeline.at_or_before(cutoff)), window[1]
+
+    def _candidate_positions(self, email_row: pd.Series, index: ErrandIndex, window: Window,
+                             positions: Optional[List[int]] = None) -> np.ndarray:
+        """Positions (of the given ones, or of the whole snapshot) in the window, created before the email
+        and compatible with its sender/receiver"""
+        first, last = self._visible_range(email_row, index, window)
+        if first >= last:
+            return np.empty(0, dtype=np.int64)
+        if positions is None:
+            pos = np.arange(first, last)
+        else:
+            pos = np.asarray(positions, dtype=np.int64)
+            pos = pos[(pos >= first) & (pos < last)]
+        if len(pos) == 0:
+            return pos
+        return pos[self._sender_receiver_mask(email_row, index, pos)]
+
+    @staticmethod
+    def _strategy_candidates(email_row: pd.Series, index: ErrandIndex, strategy: str) -> int:
+        """Index rows a strategy looks at for the email, before window/date/sender filtering (tracing only)"""
+        if strategy == 'name':
+            return sum(len(rows) for col in ['animalName', 'ownerName']
+                       for rows in index.name_positions(col, email_row.get(col)))
+        value = email_row.get(strategy)
+        if strategy == 'reference':
+            return len(index.positions('reference', value))
+        return len(index.number_positions(strategy, value))
+
+    def _run_strategy(self, trace: Optional[ConnectTrace], strategy: str, match: Callable[..., Tuple[Any, Any, Any]],
+                      email_row: pd.Series, index: ErrandIndex, window: Window, *args) -> Tuple[Any, Any, Any]:
+        """match(email_row, index, window, *args), timed and recorded on the trace when tracing is on"""
+        if trace is None:
+            return match(email_row, index, window, *args)
+        started = time.perf_counter()
+        result = match(email_row, index, window, *args)
+        elapsed = time.perf_counter() - started
+        trace.step(email_row.get('id', email_row.name), strategy,
+                   self._strategy_candidates(email_row, index, strategy), result[1], elapsed)
+        return result
 
-    def _find_match_for_single_email(self, email_row: pd.Series, errand: pd.DataFrame) -> Dict[str, Any]:
-        matched_errand, connected_col, note = self._match_by_reference(email_row, errand)
+    def _find_match_for_single_email(self, email_row: pd.Series, index: ErrandIndex, window: Window) -> Dict[str, Any]:
+        trace = connect_tracer.current()
+        matched_errand, connected_col, note = self._run_strategy(trace, 'reference', self._match_by_reference,
+                                                                 email_row, index, window)
+        for col in ['insuranceNumber', 'damageNumber']:
+            if matched_errand is not None:
+                break
+            matched_errand, connected_col, note = self._run_strategy(trace, col, self._match_by_number,
+                                                                     email_row, index, window, col)
+        if matched_errand is None:
+            matched_errand, connected_col, note = self._run_strategy(trace, 'name', self._match_by_name,
+                                                                     email_row, index, window)
         if matched_errand is not None:
+            if trace is not None:
+                trace.matched(email_row.get('id', email_row.name), connected_col or "")
             result_dict = self._fill_back_result(email_row, matched_errand, connected_col or "", note or "")
             return result_dict
 
-        cand = self._filter_candidate_errand(email_row, errand)
-
-        if not cand.empty:
-            matched_errand, connected_col, note = self._match_by_number(email_row, cand)
-            if matched_errand is None:
-                matched_errand, connected_col, note = self._match_by_name(email_row, cand)
-            if matched_errand is not None:
-                result_dict = self._fill_back_result(email_row, matched_errand, connected_col or "", note or "")
-                return result_dict
-
         # Return original email data with unmatched status
         # Preserve original errandId if it exists
         cur_ids = email_row.get('errandId')
@@ -175,54 +249,208 @@ class Connector(Processor):
 
         return result
         
-    def _match_by_reference(self, email_row: pd.Series, errand: pd.DataFrame) -> Tuple[Optional[pd.Series], Optional[str], Optional[str]]:
+    def _match_by_reference(self, email_row: pd.Series, index: ErrandIndex, window: Window) -> Tuple[Optional[pd.Series], Optional[str], Optional[str]]:
         ref = email_row.get('reference')
-        if pd.notna(ref) and 'reference' in errand.columns:
-            m = errand[errand['reference'] == ref]
-            hit = pick_first(m)
-            if hit is not None:
-                return hit, 'reference', 'Reliable'
+        if pd.notna(ref):
+            pos = np.asarray(index.positions('reference', ref), dtype=np.int64)
+            if len(pos) > 0:
+                pos = pos[self._in_window(pos, window)]
+                if len(pos) > 0:
+                    return index.errands.iloc[pos[0]], 'reference', 'Reliable'
         return None, None, None
     
-    def _match_by_number(self, email_row: pd.Series, cand: pd.DataFrame) -> Tuple[Optional[pd.Series], Optional[str], Optional[str]]:
+    def _first_candidate(self, email_row: pd.Series, index: ErrandIndex, window: Window, positions: List[int]) -> Optional[pd.Series]:
+        pos = self._candidate_positions(email_row, index, window, positions) if positions else []
+        return index.errands.iloc[pos[0]] if len(pos) > 0 else None
+
+    def _match_by_number(self, email_row: pd.Series, index: ErrandIndex, window: Window, col: str) -> Tuple[Optional[pd.Series], Optional[str], Optional[str]]:
+        """insuranceNumber / damageNumber strategies of one column (without amounts, then settlementAmount, totalAmount)"""
         email_settle = email_row.get('settlementAmount')
         email_total  = email_row.get('totalAmount')
-        
-        for col in ['insuranceNumber', 'damageNumber']:
-            email_val = email_row.get(col)
-            if pd.isna(email_val) or col not in cand.columns:
-                continue
+        email_val = email_row.get(col)
+        if pd.isna(email_val) or col not in index.keys:
+            return None, None, None
 
-            mask_full_match = cand[col] == email_val
-            if col == 'damageNumber': 
-                # remove the last part for avoiding overmatching(last part is usually a small number,e.g. 1)
-                mask_part_match = cand[col].apply(lambda v: str(email_val) in str(v).split('-') if pd.notna(v) else False)
-                possible = cand[mask_full_match | mask_part_match]
-            else:
-                possible = cand[cand[col] == email_val]
-
-            if pd.isna(email_settle) and pd.isna(email_total):
-                hit = pick_first(possible)
-                if hit is not None:
-                    return hit, col, 'Unreliable'
-
-            if pd.notna(email_settle) and 'settlementAmount' in possible.columns:
-                m_splittle = possible[possible['settlementAmount'].notna() &
-                                    (possible['settlementAmount'] == email_settle)]
-                hit = pick_first(m_splittle)
-                if hit is not None:
-                    return hit, col, 'Reliable'
-
-            if pd.notna(email_total) and 'totalAmount' in possible.columns:
-                m_total = possible[possible['totalAmount'].notna() &
-                                (possible['totalAmount'] == email_total)]
-                hit = pick_first(m_total)
-                if hit is not None:
-                    return hit, col, 'Reliable'
+        # damageNumber also matches a single '-' segment (the last part is usually a small number, e.g. 1)
+        if pd.isna(email_settle) and pd.isna(email_total):
+            hit = self._first_candidate(email_row, index, window, index.number_positions(col, email_val))
+            if hit is not None:
+                return hit, col, 'Unreliable'
+
+        if pd.notna(email_settle):
+            hit = self._first_candidate(email_row, index, window,
+                                        index.number_positions(col, email_val, 'settlementAmount', email_settle))
+            if hit is not None:
+                return hit, col, 'Reliable'
+
+        if pd.notna(email_total):
+            hit = self._first_candidate(email_row, index, window,
+                                        index.number_positions(col, email_val, 'totalAmount', email_total))
+            if hit is not None:
+                return hit, col, 'Reliable'
 
         return None, None, None
 
-    def _match_by_name(self, email_row: pd.Series, cand: pd.DataFrame) -> Tuple[Optional[pd.Series], Optional[str], Optional[str]]:
+    @staticmethod
+    def _pairs_eq(values: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """check_eq over aligned arrays"""
+        values_s, targets_s = pd.Series(values, dtype=object), pd.Series(targets, dtype=object)
+        both = values_s.notna().to_numpy() & targets_s.notna().to_numpy()
+        same = np.fromiter((a == b for a, b in zip(values, targets)), dtype=bool, count=len(values))
+        grouped = values_s.isin(CHECK_EQ_GROUP).to_numpy() & targets_s.isin(CHECK_EQ_GROUP).to_numpy()
+        return both & (same | grouped)
+
+    def _pairs_candidate_mask(self, pairs: pd.DataFrame, index: ErrandIndex, window: Window) -> np.ndarray:
+        """_candidate_positions for (email, errand position) pairs: window, date cutoff and sender/receiver"""
+        pos = pairs['pos'].to_numpy(dtype=np.int64)
+        has_cutoff = pairs['cutoff'].notna().to_numpy()
+        visible_from = index.timeline.at_or_before_many(pairs['cutoff'].fillna(0).to_numpy(dtype=np.int64))
+        mask = self._in_window(pos, window) & has_cutoff & (pos >= visible_from)
+
+        sides = {}
+        for side in ('sender', 'receiver'):
+            col = pairs[f'{side}Col'].to_numpy(dtype=object)
+            values = np.where(col == 'insuranceCompany', index.insurance_company[pos],
+                              np.where(col == 'clinicName', index.clinic_name[pos], None))
+            sides[side] = (pd.isna(values), self._pairs_eq(values, pairs[side].to_numpy(dtype=object)))
+        (sender_na, sender_eq), (receiver_na, receiver_eq) = sides['sender'], sides['receiver']
+        compatible = (~sender_na & receiver_na & sender_eq) | (sender_na & ~receiver_na & receiver_eq) | \
+                     (~sender_na & ~receiver_na & sender_eq & receiver_eq) | (sender_na & receiver_na)
+        return mask & compatible
+
+    @staticmethod
+    def _join_keys(emails: pd.DataFrame, email_col: str, keys: pd.DataFrame) -> pd.DataFrame:
+        left = emails.loc[emails[email_col].notna(), ['email', email_col]]
+        if left.empty or keys.empty:
+            return pd.DataFrame(columns=['email', 'pos'])
+        left = left.assign(**{email_col: left[email_col].astype(object)})
+        return left.merge(keys, left_on=email_col, right_on='key')[['email', 'pos']]
+
+    def _batch_number_matches(self, sub: pd.DataFrame, index: ErrandIndex, window: Window) -> Dict[Any, Tuple[int, str, str]]:
+        """
+        Reference and number strategies for all emails at once, as joins on the index key tables.
+        Every (email, errand) pair gets the rank of the strategy it satisfies; per email the lowest rank wins,
+        then the first errand in snapshot order, exactly as the per-email search would pick.
+        """
+        emails = pd.DataFrame({'email': np.arange(len(sub))})
+        for col in ['reference', 'insuranceNumber', 'damageNumber', 'settlementAmount', 'totalAmount']:
+            emails[col] = sub[col].to_numpy(dtype=object) if col in sub.columns else None
+        emails['damageNumberPart'] = [str(v) if pd.notna(v) else None for v in emails['damageNumber']]
+        cutoffs, sides = [], []
+        for _, row in sub.iterrows():
+            cutoffs.append(self._date_cutoff(row))
+            sides.append(self._email_sides(row))
+        emails['cutoff'] = pd.array(cutoffs, dtype='Int64')
+        emails['senderCol'], emails['receiverCol'], emails['sender'], emails['receiver'] = \
+            [pd.Series([s[i] for s in sides], dtype=object) for i in range(4)]
+        for col in ['settlementAmount', 'totalAmount']:
+            emails[col] = pd.to_numeric(emails[col], errors='coerce')
+
+        trace = connect_tracer.current()
+        ranked = []
+        started = time.perf_counter()
+        ref_pairs = self._join_keys(emails, 'reference', index.key_frame('reference'))
+        joined = len(ref_pairs)
+        if not ref_pairs.empty:
+            ref_pairs = ref_pairs[self._in_window(ref_pairs['pos'].to_numpy(dtype=np.int64), window)]
+            ranked.append(ref_pairs.assign(rank=0))
+        if trace is not None:
+            trace.batch_step('reference', len(sub), joined, ref_pairs['email'].nunique() if joined else 0,
+                             time.perf_counter() - started)
+
+        for col in ['insuranceNumber', 'damageNumber']:
+            started = time.perf_counter()
+            col_ranked = len(ranked)
+            pairs = self._join_keys(emails, col, index.key_frame(col))
+            if col == 'damageNumber':
+                pairs = pd.concat([pairs, self._join_keys(emails, 'damageNumberPart', index.key_frame('damageNumberPart'))]) \
+                          .drop_duplicates(['email', 'pos'])
+            if pairs.empty:
+                continue
+            pairs = pairs.merge(emails, on='email', how='left')
+            pairs = pairs[self._pairs_candidate_mask(pairs, index, window)]
+            if pairs.empty:
+                continue
+            pos = pairs['pos'].to_numpy(dtype=np.int64)
+            no_amount = (pairs['settlementAmount'].isna() & pairs['totalAmount'].isna()).to_numpy()
+            for rank, (strategy_col, amount_col, _) in enumerate(NUMBER_STRATEGIES, start=1):
+                if strategy_col != col:
+                    continue
+                if amount_col is None:
+                    hit = no_amount
+                else:
+                    hit = (pairs[amount_col].to_numpy(dtype=float) == index.amounts[amount_col][pos])
+                if hit.any():
+                    ranked.append(pairs.loc[hit, ['email', 'pos']].assign(rank=rank))
+            if trace is not None:
+                hits = pd.concat(ranked[col_ranked:])['email'].nunique() if len(ranked) > col_ranked else 0
+                trace.batch_step(col, len(sub), len(pairs), hits, time.perf_counter() - started)
+
+        if not ranked:
+            return {}
+        best = pd.concat(ranked, ignore_index=True).sort_values(['email', 'rank', 'pos']).drop_duplicates('email')
+        labels = sub.index
+        matches = {}
+        for email, pos, rank in zip(best['email'], best['pos'], best['rank']):
+            col, note = ('reference', 'Reliable') if rank == 0 else (NUMBER_STRATEGIES[rank - 1][0], NUMBER_STRATEGIES[rank - 1][2])
+            matches[labels[email]] = (int(pos), col, note)
+        return matches
+
+    def _batch_find_matches(self, sub: pd.DataFrame, index: ErrandIndex, window: Window) -> pd.DataFrame:
+        """Batch equivalent of applying _find_match_for_single_email to every row of sub"""
+        trace = connect_tracer.current()
+        matches = self._batch_number_matches(sub, index, window)
+        results = []
+        for label, email_row in sub.iterrows():
+            match = matches.get(label)
+            if match is not None:
+                pos, connected_col, note = match
+                if trace is not None:
+                    trace.matched(email_row.get('id', label), connected_col)
+                results.append(self._fill_back_result(email_row, index.errands.iloc[pos], connected_col, note))
+                continue
+            matched_errand, connected_col, note = self._run_strategy(trace, 'name', self._match_by_name,
+                                                                     email_row, index, window)
+            if matched_errand is not None:
+                if trace is not None:
+                    trace.matched(email_row.get('id', label), connected_col or "")
+                results.append(self._fill_back_result(email_row, matched_errand, connected_col or "", note or ""))
+                continue
+            cur_ids = email_row.get('errandId')
+            if not isinstance(cur_ids, list):
+                cur_ids = [] if pd.isna(cur_ids) else [cur_ids]
+            results.append({"errand_matched": False, "errandId": cur_ids})
+        return pd.DataFrame(results, index=sub.index)
+
+    def _name_hits(self, email_row: pd.Series, index: ErrandIndex, window: Window, col: str,
+                   name: Any) -> Tuple[List[Any], List[Any]]:
+        """
+        errandIds of the candidates whose col fully / partly matches name, restricted like the amount subsets
+        of the original check_full_parts_match passes (no amounts: any; else settlementAmount or totalAmount equal)
+        """
+        email_settle = email_row.get('settlementAmount')
+        email_total = email_row.get('totalAmount')
+        hits = []
+        for rows in index.name_positions(col, name):
+            pos = self._candidate_positions(email_row, index, window, rows) if len(rows) else rows
+            if len(pos) and not (pd.isna(email_settle) and pd.isna(email_total)):
+                keep = np.zeros(len(pos), dtype=bool)
+                if pd.notna(email_settle):
+                    keep |= index.amounts['settlementAmount'][pos] == email_settle
+                if pd.notna(email_total):
+                    keep |= index.amounts['totalAmount'][pos] == email_total
+                pos = pos[keep]
+            hits.append(list_deduplicate(index.errand_ids[pos].tolist()))
+        return hits[0], hits[1]
+
+    def _errand_candidates(self, email_row: pd.Series, index: ErrandIndex, window: Window, errand_ids: List[Any]) -> pd.DataFrame:
+        """The candidate rows (snapshot order) of the given errands"""
+        rows = [index.errand_rows[i] for i in errand_ids if i in index.errand_rows]
+        pos = np.sort(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+        return index.rows(self._candidate_positions(email_row, index, window, pos))
+
+    def _match_by_name(self, email_row: pd.Series, index: ErrandIndex, window: Window) -> Tuple[Optional[pd.Series], Optional[str], Optional[str]]:
+        """Full / partial animal and owner name matches, looked up in the ErrandIndex name indexes"""
         email_animal = email_row.get('animalName')
         email_owner  = email_row.get('ownerName')
         email_settle = email_row.get('settlementAmount')
@@ -231,37 +459,11 @@ class Connector(Processor):
         if pd.isna(email_animal) and pd.isna(email_owner):
             return None, None, None
 
-        base = cand[(cand['animalName'].notna()) | (cand['ownerName'].notna())]
-        if base.empty:
-            return None, None, None
-        settle_sub = base[(base['settlementAmount'].notna()) & (base['settlementAmount'] == email_settle)] if pd.notna(email_settle) else None
-        total_sub  = base[(base['totalAmount'].notna())      & (base['totalAmount'] == email_total)]       if pd.notna(email_total)  else None
-        
         name_cols = ['animalName', 'ownerName']
-        full = {c: [] for c in name_cols}
-        part = {c: [] for c in name_cols}
-
-        if pd.isna(email_settle) and pd.isna(email_total):
-            fa, pa = check_full_parts_match(base, 'animalName', email_animal)
-            fo, po = check_full_parts_match(base, 'ownerName',  email_owner)
-            full['animalName'] += fa;  part['animalName'] += pa
-            full['ownerName']  += fo;  part['ownerName']  += po
-
-        if pd.notna(email_settle):
-            fa, pa = check_full_parts_match(settle_sub, 'animalName', email_animal)
-            fo, po = check_full_parts_match(settle_sub, 'ownerName',  email_owner)
-            full['animalName'] += fa;  part['animalName'] += pa
-            full['ownerName']  += fo;  part['ownerName']  += po
-
-        if pd.notna(email_total):
-            fa, pa = check_full_parts_match(total_sub, 'animalName', email_animal)
-            fo, po = check_full_parts_match(total_sub, 'ownerName',  email_owner)
-            full['animalName'] += fa;  part['animalName'] += pa
-            full['ownerName']  += fo;  part['ownerName']  += po
-
-        for k in name_cols:
-            full[k] = list_deduplicate(full[k])
-            part[k] = list_deduplicate(part[k])
+        full: Dict[str, List[Any]] = {}
+        part: Dict[str, List[Any]] = {}
+        for col, name in zip(name_cols, [email_animal, email_owner]):
+            full[col], part[col] = self._name_hits(email_row, index, window, col, name)
 
         animal_matches = set(full['animalName']) | set(part['animalName'])
         owner_matches  = set(full['ownerName'])  | set(part['ownerName'])
@@ -270,11 +472,11 @@ class Connector(Processor):
             common_ids = list(animal_matches & owner_matches)
             common_ids = list_deduplicate(common_ids)
             if len(common_ids) > 1:
-                sub = cand[cand['errandId'].isin(common_ids)]
+                sub = self._errand_candidates(email_row, index, window, common_ids)
                 best = sub.sort_values('date', ascending=False).iloc[0]
                 return best, 'latestCommonName', 'Unreliable'
             elif len(common_ids) == 1:
-                best = cand[cand['errandId'] == common_ids[0]].iloc[0]
+                best = self._errand_candidates(email_row, index, window, common_ids).iloc[0]
                 if pd.isna(email_settle) and pd.isna(email_total):
                     return best, 'singleCommonName', 'Reliable'
                 
@@ -291,11 +493,11 @@ class Connector(Processor):
                     return best, 'singleCommonName', 'Unreliable'
 
         if len(full['animalName']) == 1 and len(full['ownerName']) == 0:
-            best = cand[cand['errandId'] == full['animalName'][0]].iloc[0]
+            best = self._errand_candidates(email_row, index, window, full['animalName']).iloc[0]
             return best, 'animalFullName', 'Unreliable'
 
         if len(full['ownerName']) == 1 and len(full['animalName']) == 0:
-            best = cand[cand['errandId'] == full['ownerName'][0]].iloc[0]
+            best = self._errand_candidates(email_row, index, window, full['ownerName']).iloc[0]
             return best, 'ownerFullName', 'Unreliable'
 
         return None, None, None
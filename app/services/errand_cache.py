@@ -0,0 +1,156 @@
+import os
+import threading
+import pandas as pd
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Tuple
+from .processor import Processor
+from .query_registry import query_registry, ERRAND_CONNECT_COLUMNS
+from ..core.data_source import apply_column_types
+from .utils import tz_convert
+from .errand_index import ErrandIndex, sort_newest_first, parse_window_boundaries, DEFAULT_WINDOW_BOUNDARIES
+
+class ErrandCache:
+    """
+    Process-level snapshot of the errands Connector matches against (errandConnect back to the oldest
+    connector window boundary, 3 months by default), stored in cleaned and normalized form.
+
+    The first request loads the full window; afterwards the snapshot is refreshed incrementally with the
+    errands created or updated since the last watermark. Refreshes run on a background thread, build the
+    ErrandIndex of the new snapshot there too, and publish (snapshot, index) in a single assignment, so
+    readers always see a complete DataFrame with its index and never build one on the request thread.
+    """
+    def __init__(self):
+        self.refresh_seconds = int(os.getenv('ERRAND_CACHE_REFRESH_SECONDS', '60'))
+        self.full_reload_seconds = int(os.getenv('ERRAND_CACHE_FULL_RELOAD_SECONDS', '3600'))
+        self.watermark_overlap = timedelta(minutes=5)   # re-read a small overlap to cover commit lag
+        # Connector matching tiers, e.g. '15d,3m' = last 15 days, then 15 days to 3 months; the last one bounds the snapshot
+        window_spec = os.getenv('CONNECTOR_WINDOWS', DEFAULT_WINDOW_BOUNDARIES)
+        try:
+            self.window_boundaries = parse_window_boundaries(window_spec)
+        except ValueError as e:
+            print(f"❌ Error in CONNECTOR_WINDOWS, using '{DEFAULT_WINDOW_BOUNDARIES}': {str(e)}")
+            self.window_boundaries = parse_window_boundaries(DEFAULT_WINDOW_BOUNDARIES)
+        self._published: Optional[Tuple[pd.DataFrame, ErrandIndex]] = None
+        self._watermark: Optional[datetime] = None      # start time of the last successful refresh (UTC)
+        self._refreshed_at: Optional[datetime] = None
+        self._full_loaded_at: Optional[datetime] = None
+        self._load_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._processor: Optional[Processor] = None
+
+    @property
+    def processor(self) -> Processor:
+        if self._processor is None:
+            self._processor = Processor()
+        return self._processor
+
+    def _format(self, errand_df: pd.DataFrame) -> pd.DataFrame:
+        """Clean text columns and normalize animal/owner names once, when rows enter the snapshot"""
+        errand_df = tz_convert(errand_df, 'date')
+        text_cols = []
+        for col in errand_df.select_dtypes(include=['object', 'string', 'category']).columns:
+            sample_val = errand_df[col].dropna().iloc[0] if not errand_df[col].dropna().empty else None
+            if sample_val is not None and isinstance(sample_val, str):
+                text_cols.append(col)
+
+        if text_cols:
+            errand_df[text_cols] = errand_df[text_cols].apply(
+                lambda col: col.map(lambda v: self.processor.clean_email_text(v) if pd.notna(v) and isinstance(v, str) else v))
+        for col in ['animalName', 'ownerName']:
+            errand_df[col] = errand_df[col].str.replace(r'[,._\-()/*\s]+', ' ', regex=True) \
+                                            .str.replace(r'[^a-zA-ZåäöÅÄÖ\'"´ ]', '', regex=True) \
+                                            .str.strip()
+        return errand_df
+
+    def _oldest(self) -> pd.Timestamp:
+        """Creation time of the oldest errand the snapshot keeps"""
+        return pd.Timestamp.now(tz='Europe/Stockholm') - self.window_boundaries[-1]
+
+    def _full_load(self):
+        started = datetime.now(timezone.utc)
+        errand_df = query_registry.fetch('errandConnectWindow', oldest=self._oldest())
+        snapshot = self._format(errand_df) if not errand_df.empty else errand_df
+        if not snapshot.empty:
+            snapshot = sort_newest_first(snapshot, 'date').reset_index(drop=True)
+        self._publish(snapshot)
+        self._watermark = started
+        self._refreshed_at = started
+        self._full_loaded_at = started
+
+    def _incremental_refresh(self):
+        started = datetime.now(timezone.utc)
+        since = self._watermark - self.watermark_overlap  # type: ignore[operator]
+        delta = query_registry.fetch('errandConnectSince', since=since, oldest=self._oldest())
+        snapshot = self._snapshot
+        previous = snapshot
+        if not delta.empty:
+            delta = self._format(delta)
+            if snapshot is None or snapshot.empty:
+                snapshot = delta
+            else:
+                # An updated errand comes back with all of its insurance cases, so replace it as a whole
+                kept = snapshot.loc[~snapshot['errandId'].isin(delta['errandId'])]
+                snapshot = pd.concat([delta, kept], ignore_index=True)
+                # concat of categoricals with different categories gives object columns
+                snapshot = apply_column_types(snapshot, {col: kind for col, kind in ERRAND_CONNECT_COLUMNS.items()
+                                                         if kind == 'category'})
+            snapshot = snapshot.sort_values('date', ascending=False, kind='stable')
+        if snapshot is not None and not snapshot.empty:
+            # errands age out of the window on every refresh, not only when something changed
+            expired = snapshot['date'] < self._oldest()
+            if not delta.empty or expired.any():
+                snapshot = snapshot.loc[~expired].reset_index(drop=True)
+        if snapshot is not previous:
+            self._publish(snapshot)
+        self._watermark = started
+        self._refreshed_at = started
+
+    @property
+    def _snapshot(self) -> Optional[pd.DataFrame]:
+        published = self._published
+        return published[0] if published is not None else None
+
+    def _publish(self, snapshot: pd.DataFrame):
+        """Index the new snapshot (on the refreshing thread) and swap both in at once"""
+        self._published = (snapshot, ErrandIndex(snapshot))
+
+    def refresh(self):
+        """Bring the snapshot up to date (full reload when missing or older than full_reload_seconds)"""
+        with self._load_lock:
+            now = datetime.now(timezone.utc)
+            if (self._snapshot is None or self._full_loaded_at is None or
+                    (now - self._full_loaded_at).total_seconds() >= self.full_reload_seconds):
+                self._full_load()
+            else:
+                self._incremental_refresh()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"❌ Error refreshing errand cache: {str(e)}")
+
+    def refresh_async(self):
+        """Start a background refresh unless one is already running"""
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh_in_background, name='errand-cache-refresh', daemon=True)
+        self._refresh_thread.start()
+
+    def get_snapshot(self) -> pd.DataFrame:
+        """Current snapshot; loads synchronously on first use and schedules a background refresh when stale"""
+        if self._snapshot is None:
+            self.refresh()
+        elif self._refreshed_at is None or \
+                (datetime.now(timezone.utc) - self._refreshed_at).total_seconds() >= self.refresh_seconds:
+            self.refresh_async()
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None else pd.DataFrame()
+
+    def get_index(self) -> ErrandIndex:
+        """ErrandIndex of the current snapshot (built by the refresh that published it)"""
+        self.get_snapshot()
+        published = self._published
+        return published[1] if published is not None else ErrandIndex(pd.DataFrame())
+
+errand_cache = ErrandCache()
@@ -0,0 +1,248 @@
+import regex as reg
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional, Iterable, Tuple, Union
+
+NUMBER_COLS = ['reference', 'insuranceNumber', 'damageNumber']
+AMOUNT_COLS = ['settlementAmount', 'totalAmount']
+NAME_COLS = ['animalName', 'ownerName']
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+# Age boundaries of the connector's matching passes: newest tier first, the last one is the snapshot range
+DEFAULT_WINDOW_BOUNDARIES = '15d,3m'
+Boundary = Union[pd.Timedelta, pd.DateOffset]
+
+def parse_window_boundaries(spec: str) -> List[Boundary]:
+    """
+    '15d,3m' -> [15 days, 3 months]: ascending ages, units d (days), w (weeks) or m (months).
+    Tier k holds the errands created between boundary k-1 (or now) and boundary k ago.
+    """
+    boundaries: List[Boundary] = []
+    for part in spec.split(','):
+        found = reg.fullmatch(r'\s*(\d+)\s*([dwm])\s*', part.lower())
+        if not found:
+            raise ValueError(f"Invalid window boundary '{part}' in '{spec}'")
+        n, unit = int(found.group(1)), found.group(2)
+        boundaries.append(pd.DateOffset(months=n) if unit == 'm' else pd.Timedelta(days=n * (7 if unit == 'w' else 1)))
+    probe = pd.Timestamp('2000-01-01')
+    ages = [probe - (probe - b) for b in boundaries]
+    if any(later <= earlier for earlier, later in zip(ages, ages[1:])):
+        raise ValueError(f"Window boundaries must be increasing: '{spec}'")
+    return boundaries
+
+def sort_newest_first(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    """df ordered by col descending (missing dates last); returned unchanged when already in that order"""
+    dates = pd.to_datetime(df[col], utc=True)
+    valid = dates.notna().to_numpy()
+    n_valid = int(valid.sum())
+    if valid[:n_valid].all() and dates.iloc[:n_valid].is_monotonic_decreasing:
+        return df
+    return df.sort_values(col, ascending=False, kind='stable', na_position='last')
+
+class CreationTimeline:
+    """
+    Creation dates of a frame sorted newest first (see sort_newest_first), as UTC nanoseconds.
+    Rows created at or before T are the suffix [at_or_before(T), end), so an as-of view is one
+    searchsorted and a zero-copy slice instead of a boolean mask and a copy per lookup.
+    """
+    def __init__(self, dates: pd.Series):
+        self.ns = pd.DatetimeIndex(pd.to_datetime(dates, utc=True)).asi8.copy()  # NaT -> int64 min
+        self.end = int(pd.notna(dates).sum())                                     # missing dates are sorted last
+        self._ascending = self.ns[:self.end][::-1]
+
+    @staticmethod
+    def to_ns(value: Any, tz: str = 'Europe/Stockholm') -> Optional[int]:
+        """A timestamp as UTC nanoseconds (naive values are read in tz); None for missing values"""
+        if value is None or pd.isna(value):
+            return None
+        value = pd.Timestamp(value)
+        if value.tzinfo is None:
+            value = value.tz_localize(tz)
+        return value.value
+
+    def at_or_before(self, t: Optional[int]) -> int:
+        """First position created at or before t (end when none, or t is None)"""
+        if t is None:
+            return self.end
+        return self.end - int(np.searchsorted(self._ascending, t, side='right'))
+
+    def at_or_before_many(self, t: np.ndarray) -> np.ndarray:
+        return self.end - np.searchsorted(self._ascending, t, side='right')
+
+    def before(self, t: int) -> int:
+        """First position created strictly before t"""
+        return self.end - int(np.searchsorted(self._ascending, t, side='left'))
+
+    def between(self, start: int, end: Optional[int] = None) -> Tuple[int, int]:
+        """Position range of the rows created in [start, end)"""
+        return (self.before(end) if end is not None else 0), self.before(start)
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+class ErrandIndex:
+    """
+    Hash indexes over one errand snapshot, built once and shared by every email matched against it.
+    Rows are kept newest first, so date windows and cutoffs are position ranges (see CreationTimeline).
+    Keys map to row positions (ascending, i.e. snapshot order):
+    - reference, insuranceNumber and damageNumber values, and every '-' separated damageNumber segment
+    - per key, sub-indexes by settlementAmount and totalAmount
+    - animalName / ownerName: the lowercased full name and each of its words (see name_positions)
+    - errandId, for going from a matched errand back to its rows
+    """
+    def __init__(self, errands: pd.DataFrame):
+        self.source = errands  # the snapshot object the index was built from
+        if 'date' not in errands.columns:
+            errands = errands.assign(date=pd.NaT)
+        self.errands = sort_newest_first(errands, 'date').reset_index(drop=True)
+        self.size = len(self.errands)
+        self.timeline = CreationTimeline(self.errands['date'])
+        self.dates = self.timeline.ns
+        self.insurance_company = self._object_array('insuranceCompany')
+        self.clinic_name = self._object_array('clinicName')
+        self.amounts = {col: pd.to_numeric(self.errands[col], errors='coerce').to_numpy(dtype=float)
+                        if col in self.errands.columns else np.full(self.size, np.nan) for col in AMOUNT_COLS}
+        self._key_frames: Dict[str, pd.DataFrame] = {}
+        self.errand_ids = np.asarray(self.errands['errandId'].tolist() if 'errandId' in self.errands.columns
+                                     else [None] * self.size, dtype=object)
+        self.errand_rows = self._group_positions(self.errand_ids.tolist())
+        self.names = {col: self._build_names(col) for col in NAME_COLS}
+
+        self.keys: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        for col in NUMBER_COLS:
+            if col in self.errands.columns:
+                self.keys[col] = self._build(self.errands[col].tolist())
+        if 'damageNumber' in self.errands.columns:
+            self.keys['damageNumberPart'] = self._build(
+                [str(v).split('-') if pd.notna(v) else None for v in self.errands['damageNumber'].tolist()], multi=True)
+
+    def _object_array(self, col: str) -> np.ndarray:
+        if col not in self.errands.columns:
+            return np.full(self.size, None, dtype=object)
+        return self.errands[col].astype(object).to_numpy()
+
+    @staticmethod
+    def _group_positions(values: List[Any]) -> Dict[Any, np.ndarray]:
+        groups: Dict[Any, List[int]] = {}
+        for pos, value in enumerate(values):
+            if _hashable(value) and not pd.isna(value):
+                groups.setdefault(value, []).append(pos)
+        return {value: np.asarray(rows, dtype=np.int64) for value, rows in groups.items()}
+
+    def _build_names(self, col: str) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """(lowercased name -> rows, lowercased word -> rows) over the text values of col"""
+        if col not in self.errands.columns:
+            return {}, {}
+        lowered = [v.lower() if isinstance(v, str) else None for v in self.errands[col].tolist()]
+        tokens: Dict[str, List[int]] = {}
+        for pos, name in enumerate(lowered):
+            if name:
+                for token in set(name.split()):
+                    tokens.setdefault(token, []).append(pos)
+        return (self._group_positions(lowered),
+                {token: np.asarray(rows, dtype=np.int64) for token, rows in tokens.items()})
+
+    def name_positions(self, col: str, name: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (full, part) rows for an email name, as utils.check_full_parts_match defines them: col equals the name
+        ignoring case, or (otherwise) contains every word of it. Sorted, i.e. snapshot order.
+        """
+        if name is None or col not in self.names:
+            return _NO_ROWS, _NO_ROWS
+        full_index, token_index = self.names[col]
+        key = str(name).lower()
+        full = full_index.get(key, _NO_ROWS)
+        words = set(key.split())
+        if not words:
+            return full, _NO_ROWS
+        postings = sorted((token_index.get(word, _NO_ROWS) for word in words), key=len)
+        part = postings[0]
+        for rows in postings[1:]:
+            if len(part) == 0:
+                break
+            part = np.intersect1d(part, rows, assume_unique=True)
+        if len(part) and len(full):
+            part = np.setdiff1d(part, full, assume_unique=True)
+        return full, part
+
+    def _build(self, values: List[Any], multi: bool = False) -> Dict[Any, Dict[str, Any]]:
+        amounts = {col: self.errands[col].tolist() if col in self.errands.columns else [None] * self.size
+                   for col in AMOUNT_COLS}
+        index: Dict[Any, Dict[str, Any]] = {}
+        for pos, value in enumerate(values):
+            if value is None:
+                continue
+            for key in (value if multi else [value]):
+                if not _hashable(key) or pd.isna(key):
+                    continue
+                entry = index.get(key)
+                if entry is None:
+                    entry = index[key] = {'rows': [], **{col: {} for col in AMOUNT_COLS}}
+                if entry['rows'] and entry['rows'][-1] == pos:
+                    continue  # the same segment twice in one damageNumber
+                entry['rows'].append(pos)
+                for col in AMOUNT_COLS:
+                    amount = amounts[col][pos]
+                    if pd.notna(amount):
+                        entry[col].setdefault(amount, []).append(pos)
+        return index
+
+    def positions(self, col: str, value: Any, amount_col: Optional[str] = None, amount: Any = None) -> List[int]:
+        """Rows whose col equals value (optionally also amount_col == amount), in snapshot order"""
+        index = self.keys.get(col)
+        if index is None or value is None or not _hashable(value) or pd.isna(value):
+            return []
+        entry = index.get(value)
+        if entry is None:
+            return []
+        if amount_col is None:
+            return entry['rows']
+        if amount is None or not _hashable(amount) or pd.isna(amount):
+            return []
+        return entry[amount_col].get(amount, [])
+
+    def number_positions(self, col: str, value: Any, amount_col: Optional[str] = None, amount: Any = None) -> List[int]:
+        """
+        Rows matching an email number: equal values, and for damageNumber also rows having the value
+        as one of their '-' separated segments
+        """
+        full = self.positions(col, value, amount_col, amount)
+        if col != 'damageNumber' or value is None or pd.isna(value):
+            return full
+        part = self.positions('damageNumberPart', str(value), amount_col, amount)
+        if not part:
+            return full
+        if not full:
+            return part
+        return sorted(set(full) | set(part))
+
+    def key_frame(self, col: str) -> pd.DataFrame:
+        """The index of col as a (key, pos) table, for joining a whole batch of emails at once"""
+        frame = self._key_frames.get(col)
+        if frame is None:
+            index = self.keys.get(col, {})
+            keys = [key for key, entry in index.items() for _ in entry['rows']]
+            positions = [pos for entry in index.values() for pos in entry['rows']]
+            frame = pd.DataFrame({'key': pd.Series(keys, dtype=object), 'pos': np.asarray(positions, dtype=np.int64)})
+            self._key_frames[col] = frame
+        return frame
+
+    def window_tiers(self, now: pd.Timestamp, boundaries: List[Boundary]) -> List[Tuple[int, int]]:
+        """
+        Tier annotation of the snapshot: tier k is the position range of the errands created in
+        [now - boundaries[k], now - boundaries[k-1]) (tier 0 up to now). Ranges are contiguous
+        because rows are newest first.
+        """
+        tiers, newest = [], None
+        for oldest in boundaries:
+            end = (now - newest).value if newest is not None else None
+            tiers.append(self.timeline.between((now - oldest).value, end))
+            newest = oldest
+        return tiers
+
+    def rows(self, positions: Iterable[int]) -> pd.DataFrame:
+        return self.errands.iloc[list(positions)]
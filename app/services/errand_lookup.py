@@ -0,0 +1,71 @@
+import pandas as pd
+from typing import Dict, Optional, Any, Iterable, Callable
+from .query_registry import query_registry
+
+class ErrandLookup:
+    """
+    Request-scoped bulk lookups of errand info, errand links and admin users.
+    Keys needed by a batch are collected and resolved with one set-based query,
+    and every result (including misses) is memoized for the rest of the request.
+    """
+    def __init__(self):
+        self._errand_info: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._link_by_ic_id: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._link_by_ref: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._admin: Dict[int, Optional[Dict[str, Any]]] = {}
+
+    @staticmethod
+    def _load(cache: Dict[Any, Optional[Dict[str, Any]]], keys: Iterable[Any], cast: Callable[[Any], Any],
+              query_name: str, param: str, key_col: str):
+        """Fetch all keys missing from cache in one query; the first row per key wins"""
+        missing = []
+        for key in keys:
+            if key is None or pd.isna(key):
+                continue
+            key = cast(key)
+            if key not in cache:
+                cache[key] = None
+                missing.append(key)
+        if not missing:
+            return
+
+        try:
+            df = query_registry.fetch(query_name, **{param: missing})
+        except Exception:
+            for key in missing:
+                cache.pop(key, None)
+            raise
+        for record in df.to_dict('records'):
+            key = cast(record[key_col])
+            if cache.get(key) is None:
+                cache[key] = record
+
+    def prefetch_errand_info(self, errand_ids: Iterable[Any]) -> "ErrandLookup":
+        self._load(self._errand_info, errand_ids, int, 'errandInfoByIds', 'ids', 'errandId')
+        return self
+
+    def errand_info(self, errand_id: Any) -> Optional[Dict[str, Any]]:
+        """errandId, reference, clinicName and insuranceCompany of one errand"""
+        self.prefetch_errand_info([errand_id])
+        return self._errand_info.get(int(errand_id))
+
+    def prefetch_links(self, ic_ids: Iterable[Any] = (), refs: Iterable[Any] = ()) -> "ErrandLookup":
+        self._load(self._link_by_ic_id, ic_ids, int, 'errandLinkByIds', 'ids', 'id')
+        self._load(self._link_by_ref, refs, str, 'errandLinkByRefs', 'refs', 'reference')
+        return self
+
+    def link_by_ic_id(self, ic_id: Any) -> Optional[Dict[str, Any]]:
+        self.prefetch_links(ic_ids=[ic_id])
+        return self._link_by_ic_id.get(int(ic_id))
+
+    def link_by_reference(self, ref: Any) -> Optional[Dict[str, Any]]:
+        self.prefetch_links(refs=[ref])
+        return self._link_by_ref.get(str(ref))
+
+    def prefetch_admins(self, user_ids: Iterable[Any]) -> "ErrandLookup":
+        self._load(self._admin, user_ids, int, 'adminByIds', 'ids', 'id')
+        return self
+
+    def admin(self, user_id: Any) -> Optional[Dict[str, Any]]:
+        self.prefetch_admins([user_id])
+        return self._admin.get(int(user_id))
@@ -0,0 +1,38 @@
+import regex as reg
+import pandas as pd
+from typing import Dict, List, Optional, Tuple, Any
+from .category_engine import required_literals
+from .regex_guard import regex_guard
+from .pattern_registry import pattern_registry, MATCH_FLAGS
+
+class ExtractionPlan:
+    """
+    A numberReg-style table (field -> ordered regexes) compiled once. Each regex keeps the literals one of
+    which every match contains (see category_engine.required_literals), so an email that lacks them is not
+    searched. first_match has base_match semantics: group 1 of the first pattern that matches.
+    """
+    def __init__(self, table: str, regex_df: pd.DataFrame, group_col: str, flags: int = MATCH_FLAGS):
+        self.fields: Dict[str, List[Tuple[reg.Pattern, Optional[List[str]]]]] = {}
+        ids = regex_df['id'].tolist() if 'id' in regex_df.columns else regex_df.index.tolist()
+        for row_id, field, source in zip(ids, regex_df[group_col].tolist(), regex_df['regex'].tolist()):
+            patterns = self.fields.setdefault(field, [])
+            pattern = pattern_registry.pattern(table, row_id, source, flags)
+            if pattern is not None:
+                patterns.append((pattern, required_literals(source)))
+
+    def first_match(self, field: str, text: str, folded: str) -> Optional[str]:
+        """Group 1 of the first of field's patterns matching text (folded: text.casefold())"""
+        for pattern, literals in self.fields.get(field, []):
+            if literals is not None and not any(literal in folded for literal in literals):
+                continue
+            matched = regex_guard.search(pattern, text)
+            if matched:
+                return matched.group(1)
+        return None
+
+    def extract(self, text: Any, fields: List[str]) -> Dict[str, Optional[str]]:
+        """Raw first matches of several fields in one pass over one email"""
+        if not isinstance(text, str):
+            return {field: None for field in fields}
+        folded = text.casefold()
+        return {field: self.first_match(field, text, folded) for field in fields}
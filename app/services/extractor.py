@@ -1,15 +1,20 @@
 import json
-import base64
-import fitz
 import regex as reg
 import pandas as pd
 from html import escape
 import inscriptis
-from typing import Dict, Any
-from .utils import base_match
+from typing import Dict, Any, List, Optional, Tuple
 from .processor import Processor
+from .extraction_plan import ExtractionPlan
+from .pdf_text import pdf_text_extractor
+from .attachment_store import attachment_store
+
+AMOUNT_COLS = ['settlementAmount', 'attach_settlementAmount', 'totalAmount', 'attach_totalAmount', 'folksamOtherAmount']
+NAME_COLS = ['animalName', 'attach_animalName', 'animalName_Sveland', 'ownerName', 'attach_ownerName']
 
 class Extractor(Processor):
+    _plans: Dict[str, Tuple[pd.DataFrame, ExtractionPlan]] = {}  # para table name -> (table, compiled plan)
+
     def __init__(self):
         super().__init__()
  
@@ -25,54 +30,61 @@ class Extractor(Processor):
         return None
    
 
-    def extract_and_format_number(self, text: str, regex_df: pd.DataFrame, col_group: str) -> Any:
-        regex_list = regex_df['regex'].to_list()
-        matched_value = base_match(text, regex_list) 
-        amount_cols = ['settlementAmount', 'attach_settlementAmount', 'totalAmount', 'attach_totalAmount', 'folksamOtherAmount']
-        
+    @classmethod
+    def _extraction_plan(cls, table: str, regex_df: pd.DataFrame, group_col: str = 'number') -> ExtractionPlan:
+        """ExtractionPlan of a para table, compiled once per loaded version of the table (BaseService reloads daily)"""
+        cached = cls._plans.get(table)
+        if cached is None or cached[0] is not regex_df:
+            cached = cls._plans[table] = (regex_df, ExtractionPlan(table, regex_df, group_col))
+        return cached[1]
+
+    def format_number(self, matched_value: Optional[str], col_group: str) -> Any:
+        """Typed value of a raw match: amounts as numbers, names cleaned, ids without line breaks"""
         if not matched_value:
-            if col_group in amount_cols:
+            if col_group in AMOUNT_COLS:
                 return pd.NA
             else:
                 return None
             
         matched_value = self.clean_email_text(matched_value) 
-        name_cols = ['animalName', 'attach_animalName', 'animalName_Sveland', 'ownerName', 'attach_ownerName']
         
-        if col_group in name_cols:
+        if col_group in NAME_COLS:
             matched_value = reg.sub(r'\(Hund\)|\(hund\)|\(Katt\)|\(katt\)', '', matched_value)
             matched_value = reg.sub(r'[,._\-()/*\s]+', ' ', matched_value)
             matched_value = reg.sub(r'[^a-zA-ZåäöÅÄÖ\'"´ ]', '', matched_value).strip()
             return matched_value or None
             
-        elif col_group in amount_cols:
+        elif col_group in AMOUNT_COLS:
             cleaned_val = matched_value.replace(',00', '').replace('.', '').replace(',', '').replace(' ', '')
             return pd.to_numeric(cleaned_val, errors='coerce')
             
         else:
             return reg.sub(r'\n', '', matched_value).strip()
 
-
     def extract_numbers_from_email(self, df: pd.DataFrame) -> pd.DataFrame:
-        number_cols = self.number_reg_list['number'].unique()
-        
-        for col in number_cols:
-            if col == 'reference' and df[col].notna().all():
-                continue
-            
-            mask_sveland = (df['originSender'] == 'Sveland')
-            process_mask = (df[col].isna()) & (mask_sveland if col == 'animalName_Sveland' else True)
-            
-            if not process_mask.any():
+        """
+        Fill the numberReg fields still missing from each email's origin, with one pass per email over
+        the fields it needs (animalName_Sveland only for Sveland); values go in as Float64 / string arrays.
+        """
+        plan = self._extraction_plan('numberReg', self.number_reg_list)
+        number_cols = list(plan.fields)
+        is_sveland = (df['originSender'] == 'Sveland').fillna(False).to_numpy(dtype=bool)
+        missing = {col: df[col].isna().to_numpy(dtype=bool) & (is_sveland if col == 'animalName_Sveland' else True)
+                   for col in number_cols}
+
+        values: Dict[str, List[Any]] = {col: [] for col in number_cols}
+        origins = df['origin'].tolist()
+        for pos, text in enumerate(origins):
+            fields = [col for col in number_cols if missing[col][pos]]
+            if not fields:
                 continue
+            for col, matched_value in plan.extract(text, fields).items():
+                values[col].append(self.format_number(matched_value, col))
 
-            col_regex_df = self.number_reg_list[self.number_reg_list['number'] == col]
-            
-            extracted_values = df.loc[process_mask, 'origin'].apply(
-                lambda text: self.extract_and_format_number(text, col_regex_df, col)
-            )
-            
-            df.loc[process_mask, col] = extracted_values
+        for col in number_cols:
+            if values[col]:
+                dtype = 'Float64' if col in AMOUNT_COLS else 'string'
+                df.loc[missing[col], col] = pd.array(values[col], dtype=dtype)
             
         df['animalName'] = df['animalName'].fillna(df['animalName_Sveland'])
         animal_name_replacements = {
@@ -90,49 +102,72 @@ class Extractor(Processor):
         
         mask = df['sender'].isin(['Sveland', 'Svedea'])
         if mask.any():
-            new_data_df = df.loc[mask].apply(self.parse_single_pdf, axis=1)
+            rows = df.loc[mask]
+            pdfs = [self._claim_pdfs(attachments) for attachments in rows['attachments'].tolist()]
+            texts = pdf_text_extractor.texts([content for row_pdfs in pdfs for content in row_pdfs])  # whole batch at once
+            updated, start = [], 0
+            for (_, row), row_pdfs in zip(rows.iterrows(), pdfs):
+                updated.append(self._apply_pdf_texts(row, texts[start:start + len(row_pdfs)]))
+                start += len(row_pdfs)
+            new_data_df = pd.DataFrame(updated)
             if not new_data_df.empty:
                 df.update(new_data_df)
                 
         return df
-   
-    
-    def parse_single_pdf(self, row: pd.Series) -> pd.Series:
-        attachments_json = row['attachments']
-        if not isinstance(attachments_json, (str, list)):
-            return row
 
+    @staticmethod
+    def _claim_pdfs(attachments_json: Any) -> List[str]:
+        """
+        base64 contents of the claim payment / damage specification PDFs among an email's attachments; spooled
+        attachments (handles with a hash, see AttachmentStore) are only read from the store when they qualify
+        """
+        if not isinstance(attachments_json, (str, list)):
+            return []
         try:
             atts = json.loads(attachments_json) if isinstance(attachments_json, str) else attachments_json
             atts = [{k.lower(): v for k, v in att.items()} for att in atts]
-        except (json.JSONDecodeError, TypeError):
-            return row
-
+        except (json.JSONDecodeError, TypeError, AttributeError):
+            return []
+        contents = []
         for att in atts:
-            if att.get('name', '').endswith('.pdf') and att['name'].startswith(('claimpaymenttemplate', 'Skadespecifikation')):
-                try:
-                    decoded_content = base64.b64decode(att['content'])
-                    with fitz.open("pdf", decoded_content) as pdf_doc:
-                        all_text = "".join(page.get_text() for page in pdf_doc)
-                    attach_data = self.get_row_attach_data(all_text, self.attach_reg_list, 'number')
-                    for col, value in attach_data.items():
-                        if col in row.index:
-                            row[col] = value                    
-                    settlement_amount = attach_data.get('settlementAmount')
-                    if pd.notna(settlement_amount) and settlement_amount >= 0:
-                        row['category'] = 'Settlement_Approved'                       
-                except Exception: 
-                    continue
+            name = att.get('name') or ''
+            if not (name.endswith('.pdf') and name.startswith(('claimpaymenttemplate', 'Skadespecifikation'))):
+                continue
+            content = att.get('content')
+            if content is None and att.get('hash'):
+                content = attachment_store.read(att['hash'])
+            if isinstance(content, str):
+                contents.append(content)
+        return contents
+
+    def _apply_pdf_texts(self, row: pd.Series, texts: List[Optional[str]]) -> pd.Series:
+        for all_text in texts:
+            if all_text is None:
+                continue
+            try:
+                attach_data = self.get_row_attach_data(all_text, self.attach_reg_list, 'number', 'attachReg')
+                for col, value in attach_data.items():
+                    if col in row.index:
+                        row[col] = value                    
+                settlement_amount = attach_data.get('settlementAmount')
+                if pd.notna(settlement_amount) and settlement_amount >= 0:
+                    row['category'] = 'Settlement_Approved'                       
+            except Exception: 
+                continue
         return row
+    
+    def parse_single_pdf(self, row: pd.Series) -> pd.Series:
+        row = row.copy()
+        return self._apply_pdf_texts(row, pdf_text_extractor.texts(self._claim_pdfs(row['attachments'])))
    
     
-    def get_row_attach_data(self, text: str, regex_df: pd.DataFrame, group_col: str) -> Dict[str, Any]:
+    def get_row_attach_data(self, text: str, regex_df: pd.DataFrame, group_col: str, table: str = 'attachReg') -> Dict[str, Any]:
         extracted_data = {}
-        for col, group in regex_df.groupby(group_col):
-            col_name = col.split('_')[-1]
-            matched_value = self.extract_and_format_number(text, group, col)
+        plan = self._extraction_plan(table, regex_df, group_col)
+        for col, matched_value in plan.extract(text, sorted(plan.fields)).items():
+            matched_value = self.format_number(matched_value, col)
             if matched_value is not None:
-                extracted_data[col_name] = matched_value
+                extracted_data[col.split('_')[-1]] = matched_value
         return extracted_data
     
 
@@ -14,7 +14,7 @@ from .utils import truncate_text, base_match
 @dataclass
 class ForwardService(BaseService):
     """Content generator service for email forwarding"""
-    request_fw_sub: List[str] = field(default_factory=list)
+    request_fw_sub: List[reg.Pattern] = field(default_factory=list)
 
     def __post_init__(self):
         super().__init__()  
@@ -22,9 +22,9 @@ class ForwardService(BaseService):
     
     def _setup_generation_configs(self):
         try:
-            self.trun_list = self.forward_suggestion[self.forward_suggestion['action']=='Trim'].templates.to_list()
+            self.trun_list = self.forward_suggestion_patterns.get('Trim', [])
             self.sub_list = self.forward_suggestion[self.forward_suggestion['action']=='Subject'].templates.to_list()
-            self.request_fw_sub = self.forward_suggestion[self.forward_suggestion['action']=='Forward_Subject'].templates.to_list()
+            self.request_fw_sub = self.forward_suggestion_patterns.get('Forward_Subject', [])
         except Exception as e:
             print(f"❌ Error in _setup_generation_configs: {str(e)}")
             raise e
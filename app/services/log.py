@@ -3,12 +3,12 @@ import re
 from typing import Dict, Tuple, Optional, Any, List
 from .base_service import BaseService
 from .processor import Processor
-from .utils import (fetchFromDB,
-                    skip_thinking_part,
+from .utils import (skip_thinking_part,
                     get_groq_client,
                     tz_convert,
                     groq_chat_with_fallback,
                     parse_payex_xml)
+from .query_registry import query_registry
 
 
 class LogService(BaseService):
@@ -19,31 +19,15 @@ class LogService(BaseService):
     
     def __init__(self):
         super().__init__()
-        self.cond = True 
+        self.errand_number = None
         self.processor = Processor()  # Initialize processor for text merging
         self._setup_mappings()
         self._setup_rules()
         self._setup_system_prompt()
 
     def setup_query_conditions(self, errand_number: str):
-        """Setup query conditions and reload queries with new parameters"""
-        self.cond = f"er.\"reference\" = '{errand_number}'"
-
-        self.log_base_query = (self.queries['logBase'].iloc[0]).format(COND=self.cond)
-        self.log_email_query = (self.queries['logEmail'].iloc[0]).format(COND=self.cond)
-        self.log_chat_query = (self.queries['logChat'].iloc[0]).format(COND=self.cond)
-        self.log_comment_query = (self.queries['logComment'].iloc[0]).format(COND=self.cond)
-        self.log_original_invoice_query = (self.queries['logOriginalInvoice'].iloc[0]).format(COND=self.cond)
-        self.log_vet_fee_query = (self.queries['logVetFee'].iloc[0]).format(COND=self.cond)
-        self.log_payment_option_query = (self.queries['logPaymentOption'].iloc[0]).format(COND=self.cond)
-        self.log_invoice_sp_query = (self.queries['logInvoiceSP'].iloc[0]).format(COND=self.cond)
-        self.log_invoice_fortus_query = (self.queries['logInvoiceFortus'].iloc[0]).format(COND=self.cond)
-        self.log_invoice_ka_query = (self.queries['logInvoiceKA'].iloc[0]).format(COND=self.cond)
-        self.log_invoice_fortnox_query = (self.queries['logInvoiceFortnox'].iloc[0]).format(COND=self.cond)
-        self.log_invoice_px_query = (self.queries['logInvoicePayex'].iloc[0]).format(COND=self.cond)
-        self.log_receive_query = (self.queries['logReceive'].iloc[0])
-        self.log_cancel_query = (self.queries['logCancel'].iloc[0]).format(COND=self.cond)
-        self.log_remove_cancel_query = (self.queries['logRemoveCancel'].iloc[0]).format(COND=self.cond)
+        """Set the errand number bound to every log query"""
+        self.errand_number = str(errand_number)
         self.groq_client = get_groq_client()
         self.model = self.model_df['model'].iloc[0] if not self.model_df.empty else "deepseek-r1-distill-llama-70b"
     
@@ -209,9 +193,13 @@ class LogService(BaseService):
             "If any action violates the logical rules, explicitly mention it in the response."
         ]
     
-    def get_errand_base_data(self) -> pd.DataFrame:
+    async def _fetch_log(self, query_name: str) -> pd.DataFrame:
+        """Run a named log query for the current errand number"""
+        return await query_registry.fetch_async(query_name, errand_number=self.errand_number)
+
+    async def get_errand_base_data(self) -> pd.DataFrame:
         """Get base errand data with optimized data types"""
-        base = fetchFromDB(self.log_base_query)
+        base = await self._fetch_log('logBase')
         if base.empty:
             return pd.DataFrame()
 
@@ -269,9 +257,9 @@ class LogService(BaseService):
 
         return send[self.columns]
     
-    def get_email_data(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    async def get_email_data(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """Get and process email data with efficiency optimizations"""
-        email_base = fetchFromDB(self.log_email_query)
+        email_base = await self._fetch_log('logEmail')
         email_base_columns = ['errandId', 'emailId', 'subject', 'textPlain', 'textHtml', 
                              'emailTime', 'category', 'correctedCategory', 'source']
         if email_base.empty:
@@ -298,12 +286,12 @@ class LogService(BaseService):
 
         return email[self.columns], email_base
     
-    def get_chat_data(self, base: pd.DataFrame) -> pd.DataFrame:
+    async def get_chat_data(self, base: pd.DataFrame) -> pd.DataFrame:
         """Get and process chat data"""
         if base.empty:
             return pd.DataFrame(columns=self.columns)
         
-        chat = fetchFromDB(self.log_chat_query)
+        chat = await self._fetch_log('logChat')
         if chat.empty:
             return pd.DataFrame(columns=self.columns)
         
@@ -327,12 +315,12 @@ class LogService(BaseService):
 
         return chat[self.columns]
     
-    def get_comment_data(self, base: pd.DataFrame) -> pd.DataFrame:
+    async def get_comment_data(self, base: pd.DataFrame) -> pd.DataFrame:
         """Get and process comment data"""
         if base.empty:
             return pd.DataFrame(columns=self.columns)
         
-        comment = fetchFromDB(self.log_comment_query)
+        comment = await self._fetch_log('logComment')
         if comment.empty:
             return pd.DataFrame(columns=self.columns)
         
@@ -399,9 +387,9 @@ class LogService(BaseService):
 
         return update[self.columns]
      
-    def get_vet_fee_data(self) -> pd.DataFrame:
+    async def get_vet_fee_data(self) -> pd.DataFrame:
         try:
-            vetfee = fetchFromDB(self.log_vet_fee_query)
+            vetfee = await self._fetch_log('logVetFee')
             if vetfee.empty:
                 return pd.DataFrame(columns=self.columns)
         except Exception as e:
@@ -423,25 +411,25 @@ class LogService(BaseService):
 
         return vetfee[self.columns]
         
-    def get_invoice_data(self) -> pd.DataFrame:
+    async def get_invoice_data(self) -> pd.DataFrame:
         """Get and process invoice data from multiple sources"""
         invoice_queries_map = {
-            "swedbank": self.log_invoice_sp_query,
-            "fortus": self.log_invoice_fortus_query,
-            "kassa": self.log_invoice_ka_query, 
-            "datacentralen": self.log_invoice_fortnox_query,
-            "datacentralen12": self.log_invoice_fortnox_query,
-            "payex": self.log_invoice_px_query,
+            "swedbank": 'logInvoiceSP',
+            "fortus": 'logInvoiceFortus',
+            "kassa": 'logInvoiceKA', 
+            "datacentralen": 'logInvoiceFortnox',
+            "datacentralen12": 'logInvoiceFortnox',
+            "payex": 'logInvoicePayex',
         }
         invoice_dfs = []
-        payment_option_df = fetchFromDB(self.log_payment_option_query)
+        payment_option_df = await self._fetch_log('logPaymentOption')
         if not payment_option_df.empty:
             payment_option = payment_option_df['paymentOption'].iloc[0]
             if payment_option and payment_option in invoice_queries_map:
-                query = invoice_queries_map[payment_option]
+                query_name = invoice_queries_map[payment_option]
 
                 try:
-                    df = fetchFromDB(query)
+                    df = await self._fetch_log(query_name)
                     if not df.empty:
                         if payment_option == 'payex':
                             try:
@@ -478,21 +466,20 @@ class LogService(BaseService):
 
         return invoice[self.columns]
     
-    def get_payment_data(self) -> pd.DataFrame:
+    async def get_payment_data(self) -> pd.DataFrame:
         """Get and process payment data from multiple sources with optimized queries"""
-        # Define payment conditions
+        # Payment queries (logReceive variants in the query registry) per node
         payment_conditions = [
-            (" AND a.\"ownerType\"='insurance_company' AND a.type_='receivable' AND tl.type_='settlement_payment_line' AND es.\"settlementPaid\" IS TRUE", 'Receive_Payment_From_FB'),
-            (" AND a.\"ownerType\"='animal_owner' AND a.type_='receivable' AND tl.type_='customer_payment_line' AND es.\"customerPaid\" IS TRUE", 'Receive_Payment_From_DÄ'),
-            (" AND a.\"ownerType\"='clinic' AND a.type_='cash' AND tl.type_='veterinary_payout_line' AND es.\"disbursed\" IS TRUE", 'Pay_Out_To_CLinic'),
-            (" AND a.\"ownerType\"='animal_owner' AND a.type_='receivable' AND tl.type_='customer_reversal_line'", 'Pay_Back_To_Customer')
+            ('logReceiveFromFB', 'Receive_Payment_From_FB'),
+            ('logReceiveFromOwner', 'Receive_Payment_From_DÄ'),
+            ('logPayOutToClinic', 'Pay_Out_To_CLinic'),
+            ('logPayBackToCustomer', 'Pay_Back_To_Customer')
         ]
         
         payment_dfs = []
-        for cond_suffix, node_type in payment_conditions:
+        for query_name, node_type in payment_conditions:
             try:
-                full_cond = str(self.cond) + cond_suffix
-                df = fetchFromDB(self.log_receive_query.format(COND=full_cond))
+                df = await self._fetch_log(query_name)
                 if not df.empty:
                     df['node'] = node_type
                     mask = df['accountingDate'].isna()
@@ -521,9 +508,9 @@ class LogService(BaseService):
 
         return payment[self.columns]
     
-    def get_cancellation_data(self) -> pd.DataFrame:
+    async def get_cancellation_data(self) -> pd.DataFrame:
         """Get cancellation data"""
-        cancel = fetchFromDB(self.log_cancel_query)
+        cancel = await self._fetch_log('logCancel')
         if cancel.empty:
             return pd.DataFrame(columns=self.columns)
         
@@ -542,9 +529,9 @@ class LogService(BaseService):
 
         return cancel[self.columns]
     
-    def get_reversal_data(self) -> pd.DataFrame:
+    async def get_reversal_data(self) -> pd.DataFrame:
         """Get cancellation reversal data"""
-        remove = fetchFromDB(self.log_remove_cancel_query)
+        remove = await self._fetch_log('logRemoveCancel')
         if remove.empty:
             return pd.DataFrame(columns=self.columns)
         
@@ -563,7 +550,7 @@ class LogService(BaseService):
 
         return remove[self.columns]
     
-    def create_formatted_log(self, base: pd.DataFrame, *log_dfs) -> Tuple[Dict, Dict]:
+    async def create_formatted_log(self, base: pd.DataFrame, *log_dfs) -> Tuple[Dict, Dict]:
         """Create formatted chronological log with optimized processing"""
         def filter_columns(df):
             return df.loc[:, df.notna().any()] if not df.empty else df
@@ -590,11 +577,10 @@ class LogService(BaseService):
             complete_nodes = group_df['node'].drop_duplicates().to_list()
 
             clinic_id = group_df['clinicId'].iloc[0]
-            drp_fee_query = f'SELECT (c."apoexFeeAmount" / 100) AS "drp_fee"  FROM clinic c WHERE c.id = {clinic_id}'
-            clinic_drp_fee_df = fetchFromDB(drp_fee_query)
+            clinic_drp_fee_df = await query_registry.fetch_async('clinicDrpFee', clinic_id=int(clinic_id))
             drp_fee = int(clinic_drp_fee_df['drp_fee'].iloc[0]) if not clinic_drp_fee_df.empty else 199
 
-            paragraph, discrepancy = self._generate_chronologic_log(group_id, group_df, drp_fee)
+            paragraph, discrepancy = await self._generate_chronologic_log(group_id, group_df, drp_fee)
             if discrepancy == 0:
                 title = f"Ärenden: {group_id} °Betalningsavvikelse: Nej§"
             else:
@@ -616,10 +602,10 @@ class LogService(BaseService):
         
         return group_log, group_ai
     
-    def _generate_chronologic_log(self, group_id: Any, group_df: pd.DataFrame, drp_fee: int) -> Tuple[str, float]:
+    async def _generate_chronologic_log(self, group_id: Any, group_df: pd.DataFrame, drp_fee: int) -> Tuple[str, float]:
         """Generate log content for a specific errand group"""
         paragraph = f"Ärenden: {group_id}\n\n"
-        origin_invoice = fetchFromDB(self.log_original_invoice_query)
+        origin_invoice = await self._fetch_log('logOriginalInvoice')
         discrepancy = origin_invoice['invoiceAmount'].sum() + drp_fee
         date_cache = {}
         placeholder = '€' * 11
@@ -1,12 +1,17 @@
 import regex as reg
 import pandas as pd
-from .utils import fetchFromDB, extract_first_address, base_match
+from .utils import extract_first_address, base_match
+from typing import Optional
+from .query_registry import query_registry
+from .errand_lookup import ErrandLookup
 from .extractor import Extractor
 from .base_service import BaseService
+from .regex_guard import regex_guard
 
 class Parser(BaseService):  
-    def __init__(self):
+    def __init__(self, errand_lookup: Optional[ErrandLookup] = None):
         super().__init__()
+        self.errand_lookup = errand_lookup or ErrandLookup()
         self.extractor = Extractor()
         self.wisentic_sender_patts = {
             'If': [
@@ -32,17 +37,17 @@ class Parser(BaseService):
         """
         Parse the sender of an email from a forwarded email, and check if it is Direktreglering or Skadeanmänlan.
         """
-        fw_patts = [reg.compile(r, reg.DOTALL) for r in self.forward_words]
-        fw_adds_reg_list = self.forward_suggestion[self.forward_suggestion['action']=='Forward_Address'].templates.to_list()
+        fw_patts = self.forward_words_search_patterns
+        fw_adds_reg_list = self.forward_suggestion_patterns.get('Forward_Address', [])
         flag_dr_sa = captured_fb = fw_adds = None
 
         for patt in fw_patts:
             if patt.search(text):
-                flag_dr_sa = base_match(text, self.clinic_complete_type)
+                flag_dr_sa = base_match(text, self.clinic_complete_type_patterns)
                 if source == 'Clinic':
                     matches = []
                     for adds_reg in fw_adds_reg_list:
-                        for m in reg.findall(adds_reg, text):
+                        for m in regex_guard.findall(adds_reg, text):
                             if '@' in m and any(fb in m for fb in self.fb_ref_list):
                                 matches.append(m)
                     if matches:
@@ -64,11 +69,11 @@ class Parser(BaseService):
         Parse sender and receiver of a completment reply email came from Provet Cloud.
         """
         email, sender, receiver = '', 'Provet_Cloud', None
-        m = base_match(text, self.msg_provetcloud_reg)
+        m = base_match(text, self.forward_suggestion_patterns.get('ProvetCloud_Msg', []))
         email = f"[BODY]{m}" if m else "[BODY]Provet_Cloud blank msg"
 
         if not errandIds:
-            clinic = base_match(text, self.clinic_provetcloud_reg)
+            clinic = base_match(text, self.forward_suggestion_patterns.get('ProvetCloud_Clinic', []))
             if clinic:
                 mClinic = self.extractor.extract_clinic_by_kws(clinic)
                 if mClinic: sender = mClinic
@@ -78,7 +83,7 @@ class Parser(BaseService):
                (lambda t: 'Folksam', lambda t: reg.search(r'och FF\d+S|CV-?\d*-?\d*', t)),
                (lambda t: 'Lassie', lambda t: reg.search(r'VOFF-?\w*-?\d*', t)),
                (lambda t: 'Svedea', lambda t: reg.search(r'HU\d{2}-|försäkringsnummer \d+', t)),
-               (lambda t: None, lambda t: base_match(t, self.receiver_provetcloud_reg) is not None),
+               (lambda t: None, lambda t: base_match(t, self.forward_suggestion_patterns.get('ProvetCloud_Recipient', [])) is not None),
             ]
             for func, cond in mapping:
                 if cond(text):
@@ -94,10 +99,10 @@ class Parser(BaseService):
                     receiver = v; break
 
         elif len(errandIds)==1:
-            df = fetchFromDB(self.errand_info_query.format(COND=f"er.id = {errandIds[0]}"))
-            if not df.empty:
-                sender = df['clinicName'].iloc[0]
-                receiver = df['insuranceCompany'].iloc[0]
+            errand_info = self.errand_lookup.errand_info(errandIds[0])
+            if errand_info is not None:
+                sender = errand_info['clinicName']
+                receiver = errand_info['insuranceCompany']
 
         return pd.Series({'email': email, 'sender': sender, 'receiver': receiver})
 
@@ -105,6 +110,8 @@ class Parser(BaseService):
         df['sender'], df['receiver'] = df['originSender'], df['originReceiver']
         mask = (df['originSender'] == 'Provet_Cloud')
         if mask.any():
+            single_ids = [ids[0] for ids in df.loc[mask, 'errandId'] if isinstance(ids, (list, tuple)) and len(ids) == 1]
+            self.errand_lookup.prefetch_errand_info(single_ids)
             df.loc[mask, ['email', 'sender', 'receiver']] = df.loc[mask, ['email', 'errandId']
                 ].apply(lambda row: self.parse_provet_cloud_row(row['email'], row['errandId']), axis=1) 
                   
@@ -139,8 +146,7 @@ class Parser(BaseService):
         df['reference'] = df['parsedTo'].str.extract(r'mail\+(\d+)@drp\.se')[0]
 
         refList = df['reference'].dropna().unique().tolist()
-        refList = ",".join(f"'{ref}'" for ref in refList)
-        refDB = fetchFromDB(self.errand_info_query.format(COND=f"ic.reference IN ({refList})"))
+        refDB = query_registry.fetch('errandInfoByRefs', refs=refList)
         df = pd.merge(df[['id','reference']], refDB, on='reference', how='left')
 
         return df[['clinicName','insuranceCompany', 'reference', 'errandId']]
@@ -0,0 +1,117 @@
+import time
+import threading
+import regex as reg
+import pandas as pd
+from typing import Optional, Dict, Any, List, Tuple, Union
+
+# forwardSuggestion actions whose templates are regexes (the rest are reply text)
+REGEX_ACTIONS = ['Trim', 'Subject', 'Forward_Subject', 'Forward_Address', 'ProvetCloud_Msg',
+                 'ProvetCloud_Clinic', 'ProvetCloud_Recipient', 'Wisentic_Msg']
+# Flags of base_match / find_trunc_pos
+MATCH_FLAGS = reg.DOTALL | reg.MULTILINE
+_ADHOC_LIMIT = 1024
+
+PatternLike = Union[str, reg.Pattern]
+
+class PatternRegistry:
+    """
+    Process-wide compiled para-table regexes keyed by (table, row id, flags). BaseService compiles every
+    table once when it loads a snapshot of the tables (a new generation); a row whose source is unchanged
+    keeps its compiled pattern, rows that disappeared are dropped, and a table's version moves on whenever
+    one of its rows is (re)compiled. Helpers take the compiled handles; plain strings still work through
+    adhoc(), which caches them by (source, flags).
+    """
+    def __init__(self):
+        self.generation = 0
+        self._entries: Dict[Tuple[str, Any, int], Dict[str, Any]] = {}
+        self._adhoc: Dict[Tuple[str, int], reg.Pattern] = {}
+        self._versions: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    def _stat(self, table: str) -> Dict[str, Any]:
+        stat = self._stats.get(table)
+        if stat is None:
+            stat = self._stats[table] = {'table': table, 'hits': 0, 'misses': 0, 'errors': 0, 'compileMs': 0.0}
+        return stat
+
+    def _compile(self, table: str, source: str, flags: int) -> Optional[reg.Pattern]:
+        stat = self._stat(table)
+        started = time.perf_counter()
+        try:
+            pattern = reg.compile(source, flags)
+        except reg.error as e:
+            stat['errors'] += 1
+            print(f"❌ Error compiling {table} pattern {source[:80]!r}: {str(e)}")
+            pattern = None
+        stat['misses'] += 1
+        stat['compileMs'] += (time.perf_counter() - started) * 1000
+        return pattern
+
+    def new_generation(self):
+        """Start loading a new snapshot of the para tables"""
+        with self._lock:
+            self.generation += 1
+
+    def sweep(self):
+        """Drop the patterns of rows the current snapshot no longer has"""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry['generation'] < self.generation]
+            for key in stale:
+                del self._entries[key]
+                self._versions[key[0]] = self.generation
+
+    def pattern(self, table: str, row_id: Any, source: Any, flags: int = MATCH_FLAGS) -> Optional[reg.Pattern]:
+        """Compiled pattern of one table row (None when the source is missing or does not compile)"""
+        if not isinstance(source, str) or not source:
+            return None
+        key = (table, row_id, flags)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['source'] == source:
+                self._stat(table)['hits'] += 1
+            else:
+                entry = self._entries[key] = {'source': source, 'pattern': self._compile(table, source, flags)}
+                self._versions[table] = self.generation
+            entry['generation'] = self.generation
+            return entry['pattern']
+
+    def table(self, table: str, df: pd.DataFrame, col: str, flags: int = MATCH_FLAGS, id_col: str = 'id') -> List[reg.Pattern]:
+        """Compiled patterns of df[col] in row order, skipping empty and invalid ones"""
+        ids = df[id_col].tolist() if id_col in df.columns else df.index.tolist()
+        patterns = [self.pattern(table, row_id, source, flags) for row_id, source in zip(ids, df[col].tolist())]
+        return [pattern for pattern in patterns if pattern is not None]
+
+    def adhoc(self, source: PatternLike, flags: int = MATCH_FLAGS) -> reg.Pattern:
+        """A compiled pattern for a pattern given as a string outside the para tables"""
+        if isinstance(source, reg.Pattern):
+            return source
+        key = (source, flags)
+        with self._lock:
+            pattern = self._adhoc.get(key)
+            if pattern is not None:
+                self._stat('adhoc')['hits'] += 1
+                return pattern
+            if len(self._adhoc) >= _ADHOC_LIMIT:
+                self._adhoc.clear()
+            stat = self._stat('adhoc')
+            started = time.perf_counter()
+            pattern = self._adhoc[key] = reg.compile(source, flags)
+            stat['misses'] += 1
+            stat['compileMs'] += (time.perf_counter() - started) * 1000
+            return pattern
+
+    def compiled(self, patterns: List[PatternLike], flags: int = MATCH_FLAGS) -> List[reg.Pattern]:
+        return [self.adhoc(p, flags) for p in patterns]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for table, _, _ in self._entries:
+                counts[table] = counts.get(table, 0) + 1
+            counts['adhoc'] = len(self._adhoc)
+            tables = [dict(stat, compileMs=round(stat['compileMs'], 2), patterns=counts.get(table, 0),
+                           version=self._versions.get(table)) for table, stat in self._stats.items()]
+            return {'generation': self.generation, 'tables': sorted(tables, key=lambda stat: stat['table'])}
+
+pattern_registry = PatternRegistry()
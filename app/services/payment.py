@@ -1,18 +1,26 @@
 from __future__ import annotations
 import regex as reg
+import numpy as np
 import pandas as pd
+from bisect import bisect_left
 from typing import List, Dict, Any, Optional, Tuple, Union
 from itertools import combinations
 from .base_service import BaseService
-from .utils import get_payoutEntity, fetchFromDB, tz_convert
+from .utils import get_payoutEntity, tz_convert
+from .query_registry import query_registry
+from .errand_lookup import ErrandLookup
+from .errand_index import CreationTimeline, sort_newest_first
+from .regex_guard import regex_guard
+from .pattern_registry import pattern_registry
 
 
 class PaymentService(BaseService):
     """Service for payment matching functionality"""
     
-    def __init__(self, payment_df: Optional[pd.DataFrame] = None):
+    def __init__(self, payment_df: Optional[pd.DataFrame] = None, errand_lookup: Optional[ErrandLookup] = None):
         super().__init__()
         self.payment_df: pd.DataFrame = payment_df if payment_df is not None else pd.DataFrame()
+        self.errand_lookup = errand_lookup or ErrandLookup()
         # Use cached data instead of reading CSV files directly
         # self.info_reg and self.bank_map are already loaded by BaseService
         self.info_item_list = self.info_reg.item.to_list()
@@ -21,10 +29,6 @@ class PaymentService(BaseService):
         self.matching_cols_pay = ['extractReference','extractOtherNumber','extractDamageNumber']
         self.matching_cols_errand = ['isReference','damageNumber','invoiceReference','ocrNumber']
         self.base_url = 'https://admin.direktregleringsportalen.se/errands/'         
-        self.errand_pay_query = self.queries['errandPay'].iloc[0] 
-        self.partial_pay_query = self.queries['partialPay'].iloc[0]
-        self.errand_link_query = self.queries['errandLink'].iloc[0]
-        self.payout_query = self.queries['payout'].iloc[0]
         
         # Pre-compile regex patterns for better performance
         self.ref_reg = reg.compile(r'\d+')
@@ -36,18 +40,16 @@ class PaymentService(BaseService):
         self._payout_entity_source = {}
         self._fb_dict = {}
         self._clinic_dict = {}
+
+        # Errands ordered newest first with their timeline and value lookups, built once per errand frame
+        self._errand_view_source: Optional[pd.DataFrame] = None
+        self._errand_view: Optional[Tuple[pd.DataFrame, CreationTimeline, Any, Optional[Any], Dict[str, Dict[Any, List[int]]]]] = None
         
     def _compile_info_patterns(self):
-        """Pre-compile all regex patterns from infoReg for better performance"""
+        """infoReg patterns by item, compiled once per table snapshot (pattern_registry)"""
         for _, row in self.info_reg.iterrows():
-            pattern = row['regex']
-            item = row['item']
-            try:
-                compiled_pattern = reg.compile(pattern, reg.DOTALL | reg.IGNORECASE)
-                self._precompiled_patterns[item] = compiled_pattern
-            except Exception as e:
-                print(f"❌ Error compiling pattern '{item}': {str(e)}")
-                self._precompiled_patterns[item] = None
+            self._precompiled_patterns[row['item']] = pattern_registry.pattern(
+                'infoReg', row['id'], row['regex'], reg.DOTALL | reg.IGNORECASE)
                 
     @property
     def payout_entity(self):
@@ -66,33 +68,40 @@ class PaymentService(BaseService):
         return self._payout_entity_source, self._fb_dict, self._clinic_dict
 
     def load_preprocess_database(self, ) -> Tuple[pd.DataFrame, pd.DataFrame]:
-        errand = fetchFromDB(self.errand_pay_query)
+        errand = query_registry.fetch('errandPay')
         errand = tz_convert(errand, 'createdAt')
         errand['settlementAmount'] = errand['settlementAmount'].fillna(0).astype(float)
+        errand = sort_newest_first(errand, 'createdAt')
    
-        payout = fetchFromDB(self.payout_query)
+        payout = query_registry.fetch('payout')
         if not payout.empty:
             payout['reference'] = payout['reference'].astype(str)
         
         return errand, payout
     
-    def _build_errand_lookup(self, errand: pd.DataFrame, row_pay: pd.Series) -> Dict[str, Dict[str, List[int]]]:
-        date_mask = (errand['createdAt'] <= row_pay['createdAt'])
-        if not date_mask.any():
-            return {}
-        
-        errand = errand.loc[date_mask].copy()
-        errand_lookup = {}
-        for col in self.matching_cols_errand:
-            if col in errand.columns:
-                s = errand[col]
-                notna_mask = s.notna()
-                if notna_mask.any():
-                    filtered_s = s[notna_mask]
-                    groups = filtered_s.groupby(filtered_s).indices  
-                    errand_lookup[col] = {val: filtered_s.index.take(pos_arr).tolist()
-                        for val, pos_arr in groups.items()}
-        return errand_lookup
+    def _get_errand_view(self, errand: pd.DataFrame) -> Tuple[pd.DataFrame, CreationTimeline, Any, Optional[Any], Dict[str, Dict[Any, List[int]]]]:
+        """
+        (errands newest first, their CreationTimeline, labels, original positions or None when errand was already
+        in that order, column -> value -> positions), built once per frame.
+        Errands visible to a payment are the suffix from timeline.at_or_before(payment date).
+        """
+        if self._errand_view_source is not errand or self._errand_view is None:
+            ordered, original_pos = errand, None
+            if sort_newest_first(errand, 'createdAt') is not errand:
+                dates = pd.to_datetime(errand['createdAt'], utc=True).reset_index(drop=True)
+                original_pos = dates.sort_values(ascending=False, kind='stable', na_position='last').index.to_numpy()
+                ordered = errand.iloc[original_pos]
+            lookup: Dict[str, Dict[Any, List[int]]] = {}
+            for col in self.matching_cols_errand:
+                if col in ordered.columns:
+                    positions: Dict[Any, List[int]] = {}
+                    for pos, val in enumerate(ordered[col].tolist()):
+                        if pd.notna(val):
+                            positions.setdefault(val, []).append(pos)
+                    lookup[col] = positions
+            self._errand_view = (ordered, CreationTimeline(ordered['createdAt']), ordered.index.to_numpy(), original_pos, lookup)
+            self._errand_view_source = errand
+        return self._errand_view
                     
     def init_payment(self) -> PaymentService:
         """Process payment data - extract references and initialize columns. Returns self for method chaining."""
@@ -140,7 +149,7 @@ class PaymentService(BaseService):
                 if compiled_pattern is None:
                     continue
 
-                match = compiled_pattern.search(row_pay['info'])
+                match = regex_guard.search(compiled_pattern, row_pay['info'])
                 if match:
                     matched_value = match.group(1).strip()
                     if col not in row_pay or pd.isna(row_pay.get(col)):
@@ -174,12 +183,20 @@ class PaymentService(BaseService):
         pay = self.payment_df.copy()
         mask = (pay['info'].notna() | pay['extractReference'].notna())
 
+        matched_by_idx = {}
         for idx, row_pay in pay.loc[mask].iterrows():
             matched_ic_ids = self._find_matches(pay, errand, idx, row_pay)
+            if matched_ic_ids:
+                pay.at[idx, 'insuranceCaseId'].extend(matched_ic_ids)  # type: ignore
+            matched_by_idx[idx] = matched_ic_ids
+
+        # Resolve the links of every matched insurance case in one query
+        self.errand_lookup.prefetch_links(ic_ids=[ic_id for idx in matched_by_idx for ic_id in pay.at[idx, 'insuranceCaseId']])  # type: ignore
+
+        for idx, matched_ic_ids in matched_by_idx.items():
             qty = len(matched_ic_ids)
             if qty > 0:
-                pay.at[idx, 'insuranceCaseId'].extend(matched_ic_ids)  # type: ignore
-                links = self._generate_links(row_pay['insuranceCaseId'], row_pay['val_errand'], 'ic.id')
+                links = self._generate_links(pay.at[idx, 'insuranceCaseId'], pay.at[idx, 'val_errand'], 'ic.id')  # type: ignore
                 pay.at[idx, 'referenceLink'] = links  # type: ignore
                 if qty == 1:
                     pay.at[idx, 'status'] = f"One DR matched perfectly (reference: {', '.join(links)})."  # type: ignore
@@ -194,23 +211,25 @@ class PaymentService(BaseService):
     
     def _find_matches(self, pay: pd.DataFrame, errand: pd.DataFrame, idx: int, row_pay: pd.Series) -> List[int]:
         matched = {col_pay: [] for col_pay in self.matching_cols_pay}
-        date_mask = (errand['createdAt'] <= row_pay['createdAt'])
-        if not date_mask.any():
+        _, timeline, labels, _, errand_lookup = self._get_errand_view(errand)
+        first = timeline.at_or_before(CreationTimeline.to_ns(row_pay['createdAt']))
+        if first >= timeline.end:
             return []
 
         val_amount = row_pay['amount']
-        errand_lookup = self._build_errand_lookup(errand, row_pay)
         for col_pay in self.matching_cols_pay:
             val_pay = row_pay[col_pay]
             if pd.isna(val_pay):
                 continue
 
             for col_errand in self.matching_cols_errand:
-                indices = errand_lookup.get(col_errand, {}).get(val_pay, [])
-                if not indices:
+                positions = errand_lookup.get(col_errand, {}).get(val_pay, [])
+                # only errands created at or before the payment: positions [first, end) of the timeline
+                positions = positions[bisect_left(positions, first):bisect_left(positions, timeline.end)]
+                if not positions:
                     continue
                 
-                idxs_sorted = sorted(indices)
+                idxs_sorted = sorted(labels[positions])
                 matched_rows = errand.loc[idxs_sorted]
 
                 current_refs = set(pay.at[idx, 'isReference'])  # type: ignore
@@ -275,19 +294,23 @@ class PaymentService(BaseService):
         if not ic_ids:
             return links
         
+        if condition == 'ic.reference':
+            self.errand_lookup.prefetch_links(refs=ic_ids)
+        else:
+            self.errand_lookup.prefetch_links(ic_ids=ic_ids)
+
         for id, valErrand in zip(ic_ids, vals_errand):
             if condition == 'ic.reference':
-                cond = f"{condition} = '{id}'"
-            elif condition == 'ic.id':
-                cond = f"{condition} = {id}"
-            result = fetchFromDB(self.errand_link_query.format(CONDITION=cond))
-            if not result.empty: 
-                errandNumber = result.iloc[0]['errandNumber']
-                ref = result.iloc[0]['reference']
+                result = self.errand_lookup.link_by_reference(id)
+            else:
+                result = self.errand_lookup.link_by_ic_id(id)
+            if result is not None: 
+                errandNumber = result['errandNumber']
+                ref = result['reference']
                 link = f'<a href="{self.base_url}{errandNumber}" target="_blank" style="background-color: gray; color: white; padding: 2px 5px;" title="matched by {valErrand}">{ref}</a>'
                 links.append(link)
             else:
-                links.append(f'{ref} (No Corresponding Link)')
+                links.append(f'{id} (No Corresponding Link)')
         return links
 
     def reminder_unmatched_amount(self) -> PaymentService:
@@ -300,11 +323,9 @@ class PaymentService(BaseService):
             return self
         
         pay_df = self.payment_df.copy()
+        refs_by_idx = {}
         for idx, row_pay in pay_df.loc[mask].iterrows():
-            matched_ic_ids, isReference, links = [], [], []
-            ref_amount_dict = {}
-            msg = "No Found"
-
+            isReference = []
             if (isinstance(row_pay['isReference'], list) and len(row_pay['isReference']) > 0):
                 for ref in row_pay['isReference']:
                     if ref not in isReference:
@@ -318,16 +339,29 @@ class PaymentService(BaseService):
  
             if pd.notna(row_pay['extractDamageNumber']) and (len(row_pay['extractDamageNumber']) == 10) and (row_pay['extractDamageNumber'] not in isReference):
                 isReference.append(str(row_pay['extractDamageNumber']))
+            refs_by_idx[idx] = isReference
+
+        # One partialPay query and one errandLink query for the references of all rows
+        all_refs = list(dict.fromkeys(str(ref) for refs in refs_by_idx.values() for ref in refs))
+        partial_pay = pd.DataFrame()
+        if all_refs:
+            partial_pay = query_registry.fetch('partialPayByRefs', refs=all_refs)
+            if not partial_pay.empty:
+                partial_pay = tz_convert(partial_pay, 'paymentReceivedTime')
+                partial_pay.loc[partial_pay['settlementAmount'].isna(), 'settlementAmount'] = 0
+                partial_pay.loc[partial_pay['paymentFromFB'].isna(), 'paymentFromFB'] = 0
+            self.errand_lookup.prefetch_links(refs=all_refs)
 
-            if len(isReference) > 0:
-                condition_sql = f"""AND ic.reference IN ({', '.join([f"'{ref}'" for ref in set(isReference)])})"""
-                sub_errand = fetchFromDB(self.partial_pay_query.format(CONDITION=condition_sql))
+        for idx, row_pay in pay_df.loc[mask].iterrows():
+            matched_ic_ids, links = [], []
+            isReference = refs_by_idx[idx]
+            ref_amount_dict = {}
+            msg = "No Found"
+
+            if len(isReference) > 0 and not partial_pay.empty:
+                sub_errand = partial_pay.loc[partial_pay['isReference'].astype(str).isin({str(ref) for ref in isReference})]
                 
                 if not sub_errand.empty:
-                    sub_errand = tz_convert(sub_errand, 'paymentReceivedTime')
-                    sub_errand.loc[sub_errand['settlementAmount'].isna(), 'settlementAmount'] = 0
-                    sub_errand.loc[sub_errand['paymentFromFB'].isna(), 'paymentFromFB'] = 0
-
                     mask_full_pay = (sub_errand['createdAt'] <= row_pay['createdAt'])
                     mask_partial_pay = (sub_errand['paymentReceivedTime'] <= row_pay['createdAt'])
                     if mask_partial_pay.any():
@@ -422,6 +456,16 @@ class PaymentService(BaseService):
             
         return msg
 
+    @staticmethod
+    def _visible_errands(errand: pd.DataFrame, names: pd.Series, name_list: List[str], timeline: CreationTimeline,
+                         original_pos: Optional[Any], row_pay: pd.Series) -> pd.DataFrame:
+        """Errands created at or before the payment (a slice of the newest-first frame) whose entity is in name_list"""
+        first = timeline.at_or_before(CreationTimeline.to_ns(row_pay['createdAt']))
+        hits = np.flatnonzero(names.iloc[first:timeline.end].isin(name_list).to_numpy()) + first
+        if original_pos is not None:
+            hits = hits[np.argsort(original_pos[hits], kind='stable')]  # back to the caller's row order
+        return errand.iloc[hits]
+
     def match_entity_and_amount(self, errand: pd.DataFrame) -> PaymentService:
         """Match entity and amount using self.payment_df - returns self for chaining"""
         if self.payment_df.empty or errand.empty:
@@ -434,10 +478,10 @@ class PaymentService(BaseService):
         pay = self.payment_df.copy()
         payout_entity_source, fb_dict, clinic_dict = self._get_entity_dicts()
 
+        errand, timeline, _, original_pos, _ = self._get_errand_view(errand)
         errand = errand.copy()
         errand["fb_lower"] = errand["insuranceCompanyName"].str.lower()
 
-        errand_date = errand["createdAt"]
         fb_lower = errand["insuranceCompanyName"].str.lower()
         clinic_lower = errand["clinicName"].str.lower()
 
@@ -452,7 +496,7 @@ class PaymentService(BaseService):
                     continue
 
                 fb_lower_list = [x.lower() for x in fb_list if isinstance(x, str)]
-                entity_matched = errand.loc[(errand_date <= rowPay['createdAt']) & (fb_lower.isin(fb_lower_list))]
+                entity_matched = self._visible_errands(errand, fb_lower, fb_lower_list, timeline, original_pos, rowPay)
 
             elif source == 'Clinic':
                 clinic_list = clinic_dict.get(rowPay['bankName'], [])
@@ -460,7 +504,7 @@ class PaymentService(BaseService):
                     pay.at[idx, 'status'] = "No Found"  # type: ignore
                     continue
                 clinic_lower_list = [x.lower() for x in clinic_list if isinstance(x, str)]
-                entity_matched = errand.loc[(errand_date <= rowPay['createdAt']) & (clinic_lower.isin(clinic_lower_list))]
+                entity_matched = self._visible_errands(errand, clinic_lower, clinic_lower_list, timeline, original_pos, rowPay)
             else:
                 pay.at[idx, 'status'] = "No Found"  # type: ignore
                 continue 
@@ -470,7 +514,7 @@ class PaymentService(BaseService):
                 msg = self._msg_for_one(entity_matched, source, amount)
 
             elif qty > 1:
-                for _, group_df in entity_matched.groupby(['insuranceCompanyName', 'clinicName', 'animalId']):
+                for _, group_df in entity_matched.groupby(['insuranceCompanyName', 'clinicName', 'animalId'], observed=True):
                     if len(group_df) == 1:
                         temp = self._msg_for_one(group_df, source, amount)
                         msg = temp
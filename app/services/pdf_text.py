@@ -0,0 +1,133 @@
+import os
+import math
+import time
+import base64
+import hashlib
+import threading
+import multiprocessing
+import fitz
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, List, Set, Tuple
+
+def pdf_text(content: bytes, max_pages: int) -> str:
+    """Text of the first max_pages pages of a PDF (runs in the worker processes)"""
+    with fitz.open("pdf", content) as pdf_doc:
+        return "".join(pdf_doc[i].get_text() for i in range(min(pdf_doc.page_count, max_pages)))
+
+class PdfTextExtractor:
+    """
+    Text of base64 PDF attachments, parsed in a process pool of PDF_WORKERS processes (0 parses on the
+    calling thread) and cut at PDF_MAX_PAGES pages. Texts are cached by the SHA-256 of the PDF bytes
+    (PDF_CACHE_SIZE documents, least recently used dropped), so an attachment forwarded in several mails,
+    or uploaded again, is parsed once. Workers come from a forkserver, never forked from the threaded server.
+
+    A document that crashes a worker or runs past PDF_TIMEOUT_SECONDS is never re-parsed in the server
+    process: it (and whatever else was pending in the broken pool) gets None, is not cached, and the pool
+    is replaced.
+    """
+    def __init__(self):
+        self.workers = int(os.getenv('PDF_WORKERS', str(min(4, os.cpu_count() or 1))))
+        self.max_pages = int(os.getenv('PDF_MAX_PAGES', '20'))
+        self.cache_size = int(os.getenv('PDF_CACHE_SIZE', '256'))
+        self.timeout_seconds = float(os.getenv('PDF_TIMEOUT_SECONDS', '30'))
+        self._cache: 'OrderedDict[str, Optional[str]]' = OrderedDict()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('forkserver'))
+        return self._pool
+
+    def shutdown(self, terminate: bool = False):
+        """Stop the worker processes (a later parse starts a new pool); terminate kills hung or crashed workers"""
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        if terminate:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+    def _store(self, key: str, text: Optional[str]):
+        with self._lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _parse_inline(self, content: bytes) -> Optional[str]:
+        try:
+            return pdf_text(content, self.max_pages)
+        except Exception as e:
+            print(f"❌ Error parsing PDF attachment: {str(e)}")
+            return None
+
+    def _parse(self, contents: Dict[str, bytes]) -> Tuple[Dict[str, Optional[str]], Set[str]]:
+        """
+        Text per content hash (None when it fails to parse) and the hashes whose parse did not finish
+        (worker crashed or timed out), which must not be cached
+        """
+        if self.workers <= 0:
+            return {key: self._parse_inline(content) for key, content in contents.items()}, set()
+        texts: Dict[str, Optional[str]] = {}
+        failed: Set[str] = set()
+        try:
+            futures = {key: self.pool.submit(pdf_text, content, self.max_pages) for key, content in contents.items()}
+        except (BrokenProcessPool, RuntimeError) as e:
+            print(f"❌ Error starting PDF worker pool: {str(e)}")
+            self.shutdown(terminate=True)
+            return {key: None for key in contents}, set(contents)
+        # every document gets timeout_seconds of worker time; they queue behind each other on the workers
+        deadline = time.monotonic() + self.timeout_seconds * math.ceil(len(futures) / self.workers)
+        broken = False
+        for key, future in futures.items():
+            try:
+                texts[key] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except (BrokenProcessPool, FutureTimeout) as e:
+                print(f"❌ Error in PDF worker pool ({type(e).__name__}), skipping attachment: {str(e)}")
+                texts[key] = None
+                failed.add(key)
+                broken = True
+            except Exception as e:
+                print(f"❌ Error parsing PDF attachment: {str(e)}")
+                texts[key] = None
+        if broken:
+            self.shutdown(terminate=True)
+        return texts, failed
+
+    def texts(self, attachments: List[str]) -> List[Optional[str]]:
+        """Text of each base64 PDF (None when it cannot be decoded or parsed), in order"""
+        keys: List[Optional[str]] = []
+        found: Dict[str, Optional[str]] = {}
+        missing: Dict[str, bytes] = {}
+        for attachment in attachments:
+            try:
+                content = base64.b64decode(attachment)
+            except (ValueError, TypeError):
+                keys.append(None)
+                continue
+            key = hashlib.sha256(content).hexdigest()
+            keys.append(key)
+            if key in found or key in missing:
+                continue
+            with self._lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[key] = self._cache[key]
+                    continue
+            missing[key] = content
+        if missing:
+            texts, failed = self._parse(missing)
+            for key, text in texts.items():
+                if key not in failed:
+                    self._store(key, text)
+                found[key] = text
+        return [found[key] if key is not None else None for key in keys]
+
+pdf_text_extractor = PdfTextExtractor()
@@ -0,0 +1,269 @@
+import os
+import json
+import sqlite3
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Set
+from .connector import Connector
+from .errand_cache import errand_cache
+from .errand_index import ErrandIndex, CreationTimeline
+from .utils import as_id_list
+
+# Email columns the connector reads when matching and filling back a result
+PENDING_COLS = ['id', 'date', 'source', 'sendTo', 'sender', 'receiver', 'originSender', 'originReceiver',
+                'reference', 'insuranceNumber', 'damageNumber', 'settlementAmount', 'totalAmount',
+                'animalName', 'ownerName']
+KEY_COLS = ['reference', 'insuranceNumber', 'damageNumber']
+NAME_COLS = ['animalName', 'ownerName']
+RESULT_COLS = ['id', 'errandId', 'insuranceCaseRef', 'errandDate', 'connectedCol', 'note',
+               'paymentOption', 'strategyType', 'sender', 'receiver']
+
+def _plain(value: Any) -> Any:
+    """JSON-safe value for the SQLite store"""
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+class PendingEmails:
+    """
+    Processed emails do_connect could not link, kept with their extracted keys so they can be re-matched
+    when new errands arrive. Keys are inverted (reference / insuranceNumber / damageNumber value and
+    animal / owner name word -> email ids), so a new errand finds the emails it may belong to by lookup
+    and the cost of a re-match run follows the number of new errands, not the number of stored emails.
+
+    Emails arrive in batches of older mail, so a newly tracked email carries a probe start (probeFrom, its date)
+    and is probed once against every errand created since then, not only against those after the watermark.
+
+    An email can only link to an errand created at most date_slack after it, so entries expire after that.
+    The store is kept in SQLite at PENDING_EMAILS_PATH so it survives worker restarts (gunicorn --max-requests);
+    without a path re-matching is disabled rather than silently losing the pending emails.
+    Emails are tracked on a background thread (track_later), from the authenticated upload page and, only with
+    REMATCH_TRACK_API set, from the unauthenticated /category_api.
+    """
+    def __init__(self):
+        self.enabled = os.getenv('REMATCH_UNMATCHED', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
+        self.path = os.getenv('PENDING_EMAILS_PATH', 'data/pending_emails.sqlite').strip() or None
+        if self.enabled and self.path is None:
+            print("❌ Error: REMATCH_UNMATCHED needs PENDING_EMAILS_PATH, re-matching is disabled")
+            self.enabled = False
+        self.track_api = os.getenv('REMATCH_TRACK_API', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.date_slack = pd.Timedelta(os.getenv('REMATCH_DATE_SLACK', '14 days'))
+        self.overlap = pd.Timedelta(errand_cache.watermark_overlap)
+        self._emails: Dict[str, Dict[str, Any]] = {}
+        self._keys: Dict[str, Dict[str, Set[str]]] = {col: {} for col in KEY_COLS + ['name']}
+        self._watermark: Optional[int] = None   # newest errand creation time probed so far (UTC ns)
+        self._connector: Optional[Connector] = None
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    @property
+    def connector(self) -> Connector:
+        if self._connector is None:
+            self._connector = Connector()
+            self._connector.date_slack = self.date_slack
+        return self._connector
+
+    # --- Store -----------------------------------------------------------------
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with sqlite3.connect(self.path) as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS pending_emails (id TEXT PRIMARY KEY, stored_at TEXT, row TEXT)")
+                conn.execute("CREATE TABLE IF NOT EXISTS rematch_state (key TEXT PRIMARY KEY, value TEXT)")
+                rows = conn.execute("SELECT id, row FROM pending_emails").fetchall()
+                state = conn.execute("SELECT value FROM rematch_state WHERE key = 'watermark'").fetchone()
+            for email_id, row in rows:
+                self._index_email(email_id, json.loads(row))
+            if state is not None:
+                self._watermark = int(state[0])
+        except (sqlite3.Error, ValueError) as e:
+            print(f"❌ Error loading pending emails from {self.path}: {str(e)}")
+
+    def _persist(self, added: List[str], removed: List[str]):
+        if not self.path or not (added or removed or self._watermark is not None):
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        try:
+            with sqlite3.connect(self.path) as conn:
+                conn.executemany("DELETE FROM pending_emails WHERE id = ?", [(i,) for i in removed])
+                conn.executemany("INSERT OR REPLACE INTO pending_emails (id, stored_at, row) VALUES (?, ?, ?)",
+                                 [(i, now, json.dumps(self._emails[i], default=str)) for i in added])
+                if self._watermark is not None:
+                    conn.execute("INSERT OR REPLACE INTO rematch_state (key, value) VALUES ('watermark', ?)",
+                                 (str(self._watermark),))
+        except sqlite3.Error as e:
+            print(f"❌ Error saving pending emails to {self.path}: {str(e)}")
+
+    @staticmethod
+    def _words(name: Any) -> Set[str]:
+        """Lowercased words of a name; a blank name is kept as '' since it still fully matches a blank errand name"""
+        if not isinstance(name, str):
+            return set()
+        return set(name.lower().split()) or {''}
+
+    def _index_email(self, email_id: str, row: Dict[str, Any]):
+        self._emails[email_id] = row
+        for col in KEY_COLS:
+            if row.get(col) is not None:
+                self._keys[col].setdefault(str(row[col]), set()).add(email_id)
+        for col in NAME_COLS:
+            for word in self._words(row.get(col)):
+                self._keys['name'].setdefault(word, set()).add(email_id)
+
+    def _drop_email(self, email_id: str):
+        row = self._emails.pop(email_id, None)
+        if row is None:
+            return
+        keys = [(col, str(row[col])) for col in KEY_COLS if row.get(col) is not None]
+        keys += [('name', word) for col in NAME_COLS for word in self._words(row.get(col))]
+        for col, key in keys:
+            ids = self._keys[col].get(key)
+            if ids is not None:
+                ids.discard(email_id)
+                if not ids:
+                    del self._keys[col][key]
+
+    def track_later(self, emails: pd.DataFrame):
+        """track() on the background thread, with a copy of the columns it reads"""
+        if not self.enabled or emails.empty or 'id' not in emails.columns:
+            return
+        frame = emails[[col for col in PENDING_COLS + ['errandId'] if col in emails.columns]].copy()
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pending-emails')
+        self._executor.submit(self._track_logged, frame)
+
+    def _track_logged(self, emails: pd.DataFrame):
+        try:
+            self.track(emails)
+        except Exception as e:
+            print(f"❌ Error tracking pending emails: {str(e)}")
+
+    def track(self, emails: pd.DataFrame):
+        """After do_connect: keep the unmatched emails that have something to match on, forget the matched ones"""
+        if not self.enabled or emails.empty or 'id' not in emails.columns:
+            return
+        records = emails[[col for col in PENDING_COLS + ['errandId'] if col in emails.columns]].to_dict('records')
+        with self._lock:
+            self._ensure_loaded()
+            added, removed = [], []
+            for email in records:
+                if email['id'] is None or pd.isna(email['id']):
+                    continue
+                email_id = str(email['id'])
+                if as_id_list(email.get('errandId')):
+                    if email_id in self._emails:
+                        self._drop_email(email_id)
+                        removed.append(email_id)
+                    continue
+                row = {col: _plain(email.get(col)) for col in PENDING_COLS}
+                if row['date'] is None or all(row[col] is None for col in KEY_COLS + NAME_COLS):
+                    continue
+                row['probeFrom'] = row['date']
+                self._drop_email(email_id)
+                self._index_email(email_id, row)
+                added.append(email_id)
+            removed += self._expire()
+            self._persist(added, removed)
+
+    def _expire(self) -> List[str]:
+        """Forget emails too old for any new errand to be within date_slack of them"""
+        oldest = (pd.Timestamp.now(tz='UTC') - self.date_slack - self.overlap).value
+        expired = [email_id for email_id, row in self._emails.items() if CreationTimeline.to_ns(row['date']) < oldest]
+        for email_id in expired:
+            self._drop_email(email_id)
+        return expired
+
+    def __len__(self) -> int:
+        return len(self._emails)
+
+    # --- Re-matching -------------------------------------------------------------
+    def _link(self, candidates: List[str], index: ErrandIndex, end: int) -> List[Dict[str, Any]]:
+        """Connect the stored emails against the errands at positions [0, end) and drop the linked ones"""
+        emails = pd.DataFrame([{col: self._emails[i][col] for col in PENDING_COLS} for i in candidates])
+        emails['date'] = pd.to_datetime(emails['date'], utc=True, format='ISO8601').dt.tz_convert('Europe/Stockholm')
+        emails['errandId'] = [[] for _ in range(len(emails))]
+        linked = self.connector._single_connect(emails, index, (0, end))
+        linked = linked.loc[linked['errandId'].map(len) > 0]
+        results = []
+        for email_id, (_, row) in zip(linked['id'].map(str), linked.iterrows()):
+            results.append({col: _plain(row.get(col)) for col in RESULT_COLS if col in row.index})
+            self._drop_email(email_id)
+        return results
+
+    def _probe(self, index: ErrandIndex, end: int) -> List[str]:
+        """Stored emails sharing a number or a name word with the errands at positions [0, end)"""
+        hits: Set[str] = set()
+        errands = index.errands.iloc[:end]
+        for col in KEY_COLS:
+            if col not in errands.columns:
+                continue
+            keys = self._keys[col]
+            for value in errands[col].dropna().tolist():
+                values = [str(value)]
+                if col == 'damageNumber':
+                    values += str(value).split('-')  # email damageNumber may be one segment of the errand's
+                for key in values:
+                    hits |= keys.get(key, set())
+        keys = self._keys['name']
+        for col in NAME_COLS:
+            if col not in errands.columns:
+                continue
+            for name in errands[col].dropna().tolist():
+                for word in self._words(name):
+                    hits |= keys.get(word, set())
+        return sorted(hits)
+
+    def rematch(self) -> List[Dict[str, Any]]:
+        """
+        Link stored emails to the errands created since the last run (ErrandCache snapshot, newest first),
+        and newly tracked emails to every errand created since their probe start, with the usual connector
+        strategies. Returns the newly linked emails and removes them from the store.
+        """
+        if not self.enabled:
+            return []
+        with self._lock:
+            self._ensure_loaded()
+            index = errand_cache.get_index()
+            if index.size == 0 or index.timeline.end == 0:
+                return []
+            newest = int(index.timeline.ns[0])
+            if self._watermark is None:
+                # first run: every errand created since the oldest stored email may be new to it
+                dates = [CreationTimeline.to_ns(row['date']) for row in self._emails.values()]
+                self._watermark = min(dates) if dates else newest
+            end = index.timeline.at_or_before(self._watermark - self.overlap.value)
+            self._watermark = max(self._watermark, newest)
+            removed = self._expire()
+            fresh = [i for i, row in self._emails.items() if row.get('probeFrom') is not None]
+            candidates = [i for i in self._probe(index, end) if self._emails[i].get('probeFrom') is None] if end > 0 else []
+
+            results: List[Dict[str, Any]] = []
+            if candidates:
+                results += self._link(candidates, index, end)
+            if fresh:
+                # newly tracked emails: once against everything created since (probe start - overlap)
+                start = min(CreationTimeline.to_ns(self._emails[i]['probeFrom']) for i in fresh)
+                results += self._link(fresh, index, index.timeline.at_or_before(start - self.overlap.value))
+            linked_ids = {str(result['id']) for result in results}
+            removed += sorted(linked_ids)
+            probed = [i for i in fresh if i not in linked_ids]
+            for email_id in probed:
+                self._emails[email_id]['probeFrom'] = None
+            self._persist(probed, removed)
+            return results
+
+pending_emails = PendingEmails()
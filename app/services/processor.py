@@ -66,8 +66,8 @@ class Processor(BaseService):
                 body = text_plain
 
         full_text = self.clean_email_text(f"[SUBJECT]{subject}\n[BODY]{body}")
-        body = truncate_text(full_text, self.forward_words)
-        body = truncate_text(body, self.stop_words)
+        body = truncate_text(full_text, self.forward_words_patterns)
+        body = truncate_text(body, self.stop_words_patterns)
         
         return full_text or "", body or ""
     
@@ -0,0 +1,192 @@
+import threading
+import pandas as pd
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Any
+from sqlalchemy import Integer, String, DateTime, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql import text as sqlalchemy_text
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.types import TypeEngine
+from .base_service import BaseService
+from .utils import fetchFromDB, fetch_df_async, fetch_columnar
+
+@dataclass(frozen=True)
+class QuerySpec:
+    """A named query: a queries.csv template whose placeholder is filled with a fixed bind-parameter condition"""
+    template: Optional[str] = None          # column in queries.csv
+    placeholder: Optional[str] = None       # 'COND' / 'CONDITION' in the template
+    condition: str = ''
+    params: Dict[str, TypeEngine] = field(default_factory=dict)
+    sql: Optional[str] = None               # inline statement when there is no queries.csv template
+    columns: Optional[Dict[str, str]] = None  # typed columns -> bulk columnar fetch (utils.fetch_columnar)
+
+LOG_ERRAND_COND = 'er."reference" = :errand_number'
+LOG_ERRAND_PARAMS = {'errand_number': String()}
+
+# Summary lookups: by email id (its errand), insurance case reference or errand number
+EMAIL_ERRAND_COND = 'er.id = (SELECT "errandId" FROM email WHERE id = :email_id)'
+EMAIL_ID_PARAMS = {'email_id': Integer()}
+REFERENCE_PARAMS = {'reference': String()}
+
+# Column types of the large result sets read with the bulk columnar fetch
+ERRAND_CONNECT_COLUMNS = {
+    'errandId': 'int', 'errandNumber': 'str', 'date': 'datetime', 'insuranceCompany': 'category',
+    'clinicName': 'category', 'totalAmount': 'float', 'settlementAmount': 'float', 'reference': 'str',
+    'insuranceNumber': 'str', 'damageNumber': 'str', 'invoiceReference': 'str', 'animalName': 'str',
+    'ownerName': 'str', 'paymentOption': 'category', 'strategyType': 'category', 'settled': 'bool',
+}
+ERRAND_PAY_COLUMNS = {
+    'errandId': 'int', 'createdAt': 'datetime', 'errandNumber': 'str', 'insuranceCaseId': 'int',
+    'isReference': 'str', 'settlementAmount': 'float', 'damageNumber': 'str', 'invoiceReference': 'str',
+    'ocrNumber': 'str', 'clinicName': 'category', 'insuranceCompanyName': 'category', 'animalId': 'int',
+}
+PAYOUT_COLUMNS = {
+    'id': 'int', 'createdAt': 'datetime', 'reference': 'str', 'transactionId': 'int',
+    'amount': 'float', 'clinicName': 'category', 'type': 'category',
+}
+
+QUERY_SPECS: Dict[str, QuerySpec] = {
+    # Errand info
+    'errandInfoByIds': QuerySpec('errandInfo', 'COND', 'er.id = ANY(:ids)', {'ids': ARRAY(Integer)}),
+    'errandInfoByRefs': QuerySpec('errandInfo', 'COND', 'ic.reference = ANY(:refs)', {'refs': ARRAY(String)}),
+    'emailById': QuerySpec('emailSpec', 'COND', 'e.id = :email_id', {'email_id': Integer()}),
+    'forwardSummaryInfo': QuerySpec('forwardSummaryInfo', 'COND', 'e.id = :email_id', {'email_id': Integer()}),
+    'adminByIds': QuerySpec('admin', 'COND', 'id = ANY(:ids)', {'ids': ARRAY(Integer)}),
+
+    # Classifier: Information emails with one of the batch's subjects in [start - 5 minutes, end)
+    'infoWindow': QuerySpec(sql="""SELECT ecr."timestamp", e.subject
+                                 FROM email_category_request ecr
+                                 LEFT JOIN email e ON ecr."emailId" = e.id
+                                 WHERE ecr."timestamp" >= CAST(:start AS timestamptz) - INTERVAL '5 minutes'
+                                   AND ecr."timestamp" < CAST(:end AS timestamptz)
+                                   AND e.subject = ANY(:subjects)
+                                   AND (ecr.category = 'Information' OR ecr."correctedCategory" = 'Information')""",
+                            params={'start': DateTime(timezone=True), 'end': DateTime(timezone=True), 'subjects': ARRAY(String)}),
+
+    # Connector errand snapshot (ErrandCache): every connector window at once (back to :oldest) and the errands changed since a watermark
+    'errandConnectWindow': QuerySpec('errandConnect', 'CONDITION', 'er."createdAt" >= CAST(:oldest AS timestamptz)',
+                                     {'oldest': DateTime(timezone=True)}, columns=ERRAND_CONNECT_COLUMNS),
+    'errandConnectSince': QuerySpec('errandConnect', 'CONDITION',
+                                    """er."createdAt" >= CAST(:oldest AS timestamptz)
+                            AND (er."createdAt" >= CAST(:since AS timestamptz)
+                                 OR er."updatedAt" >= CAST(:since AS timestamptz)
+                                 OR er.id IN (SELECT ic2."errandId"
+                                              FROM insurance_settlement ist2
+                                              JOIN insurance_case ic2 ON ic2.id = ist2."insuranceCaseId"
+                                              WHERE ist2."updatedAt" >= CAST(:since AS timestamptz)))""",
+                                    {'since': DateTime(timezone=True), 'oldest': DateTime(timezone=True)},
+                                    columns=ERRAND_CONNECT_COLUMNS),
+
+    # Payment
+    'errandPay': QuerySpec('errandPay', columns=ERRAND_PAY_COLUMNS),
+    'payout': QuerySpec('payout', columns=PAYOUT_COLUMNS),
+    'errandLinkByRefs': QuerySpec('errandLink', 'CONDITION', 'ic.reference = ANY(:refs)', {'refs': ARRAY(String)}),
+    'errandLinkByIds': QuerySpec('errandLink', 'CONDITION', 'ic.id = ANY(:ids)', {'ids': ARRAY(Integer)}),
+    'partialPayByRefs': QuerySpec('partialPay', 'CONDITION', 'AND ic.reference = ANY(:refs)', {'refs': ARRAY(String)}),
+
+    # Summary of an errand's chats, emails and comments
+    'summaryChatByEmailId': QuerySpec('summaryChat', 'CONDITION', EMAIL_ERRAND_COND, EMAIL_ID_PARAMS),
+    'summaryChatByReference': QuerySpec('summaryChat', 'CONDITION', 'ic.reference = :reference', REFERENCE_PARAMS),
+    'summaryChatByErrandNumber': QuerySpec('summaryChat', 'CONDITION', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'summaryEmailByEmailId': QuerySpec('summaryEmail', 'CONDITION', EMAIL_ERRAND_COND, EMAIL_ID_PARAMS),
+    'summaryEmailByReference': QuerySpec('summaryEmail', 'CONDITION', 'ic.reference = :reference', REFERENCE_PARAMS),
+    'summaryEmailByErrandNumber': QuerySpec('summaryEmail', 'CONDITION', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'summaryCommentByEmailId': QuerySpec('summaryComment', 'CONDITION',
+                                         '(cr."emailId" = :email_id OR cr."errandId" = (SELECT "errandId" FROM email WHERE id = :email_id))',
+                                         EMAIL_ID_PARAMS),
+    'summaryCommentByReference': QuerySpec('summaryComment', 'CONDITION', 'ic.reference = :reference', REFERENCE_PARAMS),
+    'summaryCommentByErrandNumber': QuerySpec('summaryComment', 'CONDITION', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+
+    # Chronological log, all keyed on the errand number
+    'logBase': QuerySpec('logBase', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logEmail': QuerySpec('logEmail', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logChat': QuerySpec('logChat', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logComment': QuerySpec('logComment', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logOriginalInvoice': QuerySpec('logOriginalInvoice', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logVetFee': QuerySpec('logVetFee', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logPaymentOption': QuerySpec('logPaymentOption', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logInvoiceSP': QuerySpec('logInvoiceSP', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logInvoiceFortus': QuerySpec('logInvoiceFortus', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logInvoiceKA': QuerySpec('logInvoiceKA', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logInvoiceFortnox': QuerySpec('logInvoiceFortnox', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logInvoicePayex': QuerySpec('logInvoicePayex', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logCancel': QuerySpec('logCancel', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logRemoveCancel': QuerySpec('logRemoveCancel', 'COND', LOG_ERRAND_COND, LOG_ERRAND_PARAMS),
+    'logReceiveFromFB': QuerySpec('logReceive', 'COND', LOG_ERRAND_COND +
+        " AND a.\"ownerType\"='insurance_company' AND a.type_='receivable' AND tl.type_='settlement_payment_line' AND es.\"settlementPaid\" IS TRUE",
+        LOG_ERRAND_PARAMS),
+    'logReceiveFromOwner': QuerySpec('logReceive', 'COND', LOG_ERRAND_COND +
+        " AND a.\"ownerType\"='animal_owner' AND a.type_='receivable' AND tl.type_='customer_payment_line' AND es.\"customerPaid\" IS TRUE",
+        LOG_ERRAND_PARAMS),
+    'logPayOutToClinic': QuerySpec('logReceive', 'COND', LOG_ERRAND_COND +
+        " AND a.\"ownerType\"='clinic' AND a.type_='cash' AND tl.type_='veterinary_payout_line' AND es.\"disbursed\" IS TRUE",
+        LOG_ERRAND_PARAMS),
+    'logPayBackToCustomer': QuerySpec('logReceive', 'COND', LOG_ERRAND_COND +
+        " AND a.\"ownerType\"='animal_owner' AND a.type_='receivable' AND tl.type_='customer_reversal_line'",
+        LOG_ERRAND_PARAMS),
+    'clinicDrpFee': QuerySpec(sql='SELECT (c."apoexFeeAmount" / 100) AS "drp_fee"  FROM clinic c WHERE c.id = :clinic_id',
+                              params={'clinic_id': Integer()}),
+}
+
+class QueryRegistry:
+    """
+    Named, bind-parameter statements built once from queries.csv.
+    Every call of a named query sends the same SQL text, so the driver/server can reuse its prepared plan,
+    and values are never inlined into the statement.
+    """
+    def __init__(self, specs: Dict[str, QuerySpec] = QUERY_SPECS):
+        self.specs = specs
+        self._statements: Dict[str, TextClause] = {}
+        self._source: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+
+    def _build(self, queries: pd.DataFrame) -> Dict[str, TextClause]:
+        statements = {}
+        for name, spec in self.specs.items():
+            if spec.sql is not None:
+                sql = spec.sql
+            else:
+                sql = queries[spec.template].iloc[0]
+                if spec.placeholder:
+                    sql = sql.format(**{spec.placeholder: spec.condition})
+            statements[name] = sqlalchemy_text(sql).bindparams(
+                *[bindparam(key, type_=type_) for key, type_ in spec.params.items()])
+        return statements
+
+    def _refresh(self):
+        """Rebuild statements whenever BaseService reloads its tables (daily)"""
+        if not BaseService._cache_initialized or BaseService._cache_date != datetime.now().date():
+            BaseService()
+        queries = BaseService._data_cache['queries']
+        if queries is self._source:
+            return
+        with self._lock:
+            if queries is not self._source:
+                self._statements = self._build(queries)
+                self._source = queries
+
+    def metric_name(self, name: str) -> str:
+        """Label used in query_metrics: the queries.csv column the statement comes from"""
+        spec = self.specs.get(name)
+        return spec.template if spec is not None and spec.template else name
+
+    def get(self, name: str) -> TextClause:
+        self._refresh()
+        if name not in self._statements:
+            raise KeyError(f"Unknown query: {name}")
+        return self._statements[name]
+
+    def fetch(self, name: str, **params: Any) -> pd.DataFrame:
+        """Run a named query on the shared pool (columnar bulk mode when the spec declares its columns)"""
+        statement = self.get(name)
+        spec = self.specs[name]
+        if spec.columns is not None:
+            return fetch_columnar(statement, params, spec.columns, name=name, label=self.metric_name(name))
+        return fetchFromDB(statement, params, name=name, label=self.metric_name(name))
+
+    async def fetch_async(self, name: str, **params: Any) -> pd.DataFrame:
+        """Run a named query on the async pool"""
+        return await fetch_df_async(self.get(name), params, name=name, label=self.metric_name(name))
+
+query_registry = QueryRegistry()
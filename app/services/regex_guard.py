@@ -0,0 +1,55 @@
+import os
+import threading
+import regex as reg
+from typing import Optional, Dict, Any, List, Union
+
+PatternLike = Union[str, reg.Pattern]
+
+class RegexGuard:
+    """
+    Runtime guard for the hand-edited para-table patterns: every search runs with the regex module's
+    timeout (REGEX_TIMEOUT_SECONDS, 0 disables it). A pattern that times out counts as not matching,
+    so a runaway pattern costs one field of one email instead of stalling the request.
+    """
+    def __init__(self):
+        self.timeout: Optional[float] = float(os.getenv('REGEX_TIMEOUT_SECONDS', '0.5')) or None
+        self._timeouts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _timed_out(self, pattern: PatternLike):
+        source = pattern.pattern if isinstance(pattern, reg.Pattern) else pattern
+        with self._lock:
+            self._timeouts[source] = self._timeouts.get(source, 0) + 1
+        print(f"❌ Error regex timed out after {self.timeout}s, treated as no match: {source[:120]!r}")
+
+    def search(self, pattern: PatternLike, text: str, flags: int = 0) -> Optional[Any]:
+        """pattern.search(text), or None when it times out"""
+        try:
+            if isinstance(pattern, reg.Pattern):
+                return pattern.search(text, timeout=self.timeout)
+            return reg.search(pattern, text, flags, timeout=self.timeout)
+        except TimeoutError:
+            self._timed_out(pattern)
+            return None
+
+    def findall(self, pattern: PatternLike, text: str, flags: int = 0) -> List[Any]:
+        """pattern.findall(text), or [] when it times out"""
+        try:
+            if isinstance(pattern, reg.Pattern):
+                return pattern.findall(text, timeout=self.timeout)
+            return reg.findall(pattern, text, flags, timeout=self.timeout)
+        except TimeoutError:
+            self._timed_out(pattern)
+            return []
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            timeouts = sorted(self._timeouts.items(), key=lambda item: item[1], reverse=True)
+        return {'timeoutSeconds': self.timeout,
+                'timeouts': [{'pattern': pattern, 'count': count} for pattern, count in timeouts]}
+
+    def reset(self):
+        with self._lock:
+            self._timeouts.clear()
+
+regex_guard = RegexGuard()
@@ -0,0 +1,152 @@
+"""
+Cost profile of every para-table regex over a corpus of stored emails:
+
+    python -m app.services.regex_profiler emails.json [--limit 500] [--slow-ms 5] [--out report.json]
+
+The corpus is a JSON list (or CSV) of emails as uploaded to /category (subject + textPlain), or of
+records with an 'email' / 'origin' / 'info' / 'text' field, or plain strings.
+"""
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import regex as reg
+from typing import Optional, Dict, Any, List, Tuple
+from .base_service import BaseService
+from .pattern_registry import REGEX_ACTIONS
+# Repeated near-miss inputs for the growth check: a linear pattern takes ~STRESS_SIZES[1]/STRESS_SIZES[0] times longer
+STRESS_FILLERS = [' ', 'a', '1', '\n', 'a1 ', 'å, ', ':\n ']
+STRESS_SIZES = (1000, 4000)
+
+class RegexProfiler(BaseService):
+    """
+    Per pattern: runs, hits, hit rate, p50 / p99 / max search time over the corpus and timeouts, plus a
+    growth check on long repetitive input. Flags: 'invalid' (does not compile), 'timeout', 'slow'
+    (p99 above slow_ms) and 'superlinear' (time grows much faster than the input, i.e. backtracking).
+    """
+    def __init__(self, timeout: float = 2.0, slow_ms: float = 5.0):
+        super().__init__()
+        self.timeout = timeout
+        self.slow_ms = slow_ms
+
+    def patterns(self) -> List[Dict[str, Any]]:
+        """Every para-table regex with the flags the services compile it with"""
+        entries: List[Dict[str, Any]] = []
+
+        def add(table: str, key: str, source: Any, flags: int):
+            if isinstance(source, str) and source:
+                entries.append({'table': table, 'key': key, 'regex': source, 'flags': flags})
+
+        for _, row in self.category_reg_list.iterrows():
+            add('categoryReg', row['category'], row['regex'], reg.IGNORECASE)
+        for _, row in self.number_reg_list.iterrows():
+            add('numberReg', row['number'], row['regex'], reg.DOTALL | reg.MULTILINE)
+        for _, row in self.attach_reg_list.iterrows():
+            add('attachReg', row['number'], row['regex'], reg.DOTALL | reg.MULTILINE)
+        for _, row in self.info_reg.iterrows():
+            add('infoReg', row['item'], row['regex'], reg.DOTALL | reg.IGNORECASE)
+        suggestions = self.forward_suggestion[self.forward_suggestion['action'].isin(REGEX_ACTIONS)]
+        for _, row in suggestions.iterrows():
+            add('forwardSuggestion', row['action'], row['templates'],
+                0 if row['action'] == 'Forward_Address' else reg.DOTALL | reg.MULTILINE)
+        return entries
+
+    @staticmethod
+    def load_corpus(path: str, limit: Optional[int] = None) -> List[str]:
+        records = pd.read_csv(path).to_dict('records') if path.endswith('.csv') else json.load(open(path, encoding='utf-8'))
+        texts = []
+        for record in records[:limit] if limit else records:
+            if isinstance(record, str):
+                texts.append(record)
+                continue
+            text = next((record[col] for col in ('email', 'origin', 'info', 'text') if isinstance(record.get(col), str)), None)
+            if text is None and (record.get('subject') or record.get('textPlain')):
+                text = f"{record.get('subject') or ''}\n[BODY]{record.get('textPlain') or ''}"
+            if text:
+                texts.append(text)
+        return texts
+
+    def _time(self, pattern: reg.Pattern, text: str) -> Tuple[float, Optional[bool]]:
+        """(seconds, matched); matched is None on timeout"""
+        started = time.perf_counter()
+        try:
+            matched: Optional[bool] = pattern.search(text, timeout=self.timeout) is not None
+        except TimeoutError:
+            matched = None
+        return time.perf_counter() - started, matched
+
+    def _growth(self, pattern: reg.Pattern) -> Optional[float]:
+        """Worst ratio of search time on long vs short repetitive input; None when one of them times out"""
+        worst = 0.0
+        small, large = STRESS_SIZES
+        for filler in STRESS_FILLERS:
+            t_small, matched_small = self._time(pattern, (filler * small)[:small])
+            t_large, matched_large = self._time(pattern, (filler * large)[:large])
+            if matched_small is None or matched_large is None:
+                return None
+            if t_large * 1000 >= self.slow_ms:  # fast searches are all noise
+                worst = max(worst, t_large / max(t_small, 1e-6))
+        return worst
+
+    def profile_pattern(self, entry: Dict[str, Any], texts: List[str]) -> Dict[str, Any]:
+        result = {'table': entry['table'], 'key': entry['key'], 'regex': entry['regex']}
+        try:
+            pattern = reg.compile(entry['regex'], entry['flags'])
+        except reg.error as e:
+            return {**result, 'flags': ['invalid'], 'error': str(e)}
+
+        ms, hits, timeouts = [], 0, 0
+        for text in texts:
+            seconds, matched = self._time(pattern, text)
+            ms.append(seconds * 1000)
+            hits += bool(matched)
+            timeouts += matched is None
+        growth = self._growth(pattern)
+        linear = STRESS_SIZES[1] / STRESS_SIZES[0]
+
+        flags = []
+        p99 = float(np.percentile(ms, 99)) if ms else 0.0
+        if timeouts:
+            flags.append('timeout')
+        if p99 > self.slow_ms:
+            flags.append('slow')
+        if growth is None or growth > 2.5 * linear:
+            flags.append('superlinear')
+        return {**result, 'runs': len(ms), 'hits': hits, 'hitRate': round(hits / len(ms), 4) if ms else 0.0,
+                'p50Ms': round(float(np.percentile(ms, 50)), 4) if ms else 0.0, 'p99Ms': round(p99, 4),
+                'maxMs': round(max(ms), 4) if ms else 0.0, 'timeouts': timeouts,
+                'growth': round(growth, 1) if growth is not None else None, 'flags': flags}
+
+    def profile(self, texts: List[str]) -> Dict[str, Any]:
+        """Profile of every pattern, flagged ones first, then by p99"""
+        results = [self.profile_pattern(entry, texts) for entry in self.patterns()]
+        results.sort(key=lambda r: (not r['flags'], -r.get('p99Ms', 0.0)))
+        return {'emails': len(texts), 'patterns': len(results),
+                'flagged': sum(bool(r['flags']) for r in results), 'results': results}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Profile the para-table regexes over stored emails')
+    parser.add_argument('corpus', help='JSON or CSV file of emails')
+    parser.add_argument('--limit', type=int, default=None, help='use only the first N emails')
+    parser.add_argument('--slow-ms', type=float, default=5.0, help='p99 above this is flagged slow')
+    parser.add_argument('--timeout', type=float, default=2.0, help='per-search timeout in seconds')
+    parser.add_argument('--out', default=None, help='write the full JSON report here')
+    args = parser.parse_args(argv)
+
+    profiler = RegexProfiler(timeout=args.timeout, slow_ms=args.slow_ms)
+    report = profiler.profile(profiler.load_corpus(args.corpus, args.limit))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{report['patterns']} patterns over {report['emails']} emails, {report['flagged']} flagged")
+    print(f"{'table':<18}{'key':<32}{'hit%':>7}{'p50ms':>9}{'p99ms':>9}{'growth':>8}  flags")
+    for r in report['results']:
+        print(f"{r['table']:<18}{str(r['key'])[:31]:<32}{r.get('hitRate', 0) * 100:>7.1f}{r.get('p50Ms', 0):>9.3f}"
+              f"{r.get('p99Ms', 0):>9.3f}{r.get('growth') if r.get('growth') is not None else float('inf'):>8.1f}  {','.join(r['flags'])}")
+    return 1 if report['flagged'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
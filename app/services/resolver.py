@@ -3,14 +3,16 @@ import regex as reg
 from dataclasses import dataclass
 from typing import Dict, Optional, Any, List, Tuple
 from .base_service import BaseService
-from .utils import (fetchFromDB, 
-                    base_match, 
+from .utils import (base_match, 
                     lower_and_split, 
                     parse_email_address,
                     extract_first_address, 
                     expand_matching_clinic, 
                     get_staffAnimal
                     )
+from .query_registry import query_registry
+from .errand_lookup import ErrandLookup
+from .regex_guard import regex_guard
 
 
 fb_name_mapping = {
@@ -159,17 +161,17 @@ class ReceiverResolver(BaseService):
        
     def _check_forward_part(self, source: str, origin: str) -> Tuple[Optional[str], Optional[str]]:
         """Check forward part logic - placeholder for actual implementation"""
-        fw_patts = [reg.compile(r, reg.DOTALL) for r in self.forward_words]
-        fw_add_regs = self.forward_suggestion[self.forward_suggestion['action']=='Forward_Address'].templates.to_list()
+        fw_patts = self.forward_words_search_patterns
+        fw_add_regs = self.forward_suggestion_patterns.get('Forward_Address', [])
         flag_de_sa = captured_fb = None
 
         for patt in fw_patts:
             if patt.search(origin):
-                flag_de_sa = base_match(origin, self.clinic_complete_type)
+                flag_de_sa = base_match(origin, self.clinic_complete_type_patterns)
                 if source == 'Clinic':
                     matches = []
                     for tmpl in fw_add_regs:
-                        for m in reg.findall(tmpl, origin):
+                        for m in regex_guard.findall(tmpl, origin):
                             if '@' in m and any(ic in m for ic in self.fb_ref_list):
                                 matches.append(m)
                     if matches:
@@ -209,8 +211,7 @@ class ReceiverResolver(BaseService):
         """Handle special email addresses - placeholder for actual implementation"""
         df['reference'] = df['parsedTo'].str.extract(r'mail\+(\d+)@drp\.se')[0]
         ref_list = df['reference'].dropna().unique().tolist()
-        ref_list = ",".join(f"'{ref}'" for ref in ref_list)
-        ref_errand = fetchFromDB(self.errand_info_query.format(COND=f"ic.reference IN ({ref_list})"))
+        ref_errand = query_registry.fetch('errandInfoByRefs', refs=ref_list)
         df = pd.merge(df[['id','reference']], ref_errand, on='reference', how='left')
 
         return df[['clinicName','insuranceCompany', 'reference', 'errandId']]
@@ -453,8 +454,9 @@ class StaffResolver(BaseService):
 class AddressResolver(BaseService):
     """Address resolver service for email forwarding using chain pattern"""
     
-    def __init__(self):
+    def __init__(self, errand_lookup: Optional[ErrandLookup] = None):
         super().__init__()
+        self.errand_lookup = errand_lookup or ErrandLookup()
         self._setup_resolver_configs()
         self.result = {
             'forwardAddress': '',
@@ -518,8 +520,8 @@ class AddressResolver(BaseService):
             return self
         
         try:
-            admin_df = fetchFromDB(self.admin_query.format(COND=f"id = {user_id}"))
-            admin_name = admin_df['firstName'].values[0] if not admin_df.empty else ''
+            admin = self.errand_lookup.admin(user_id)
+            admin_name = admin['firstName'] if admin is not None else ''
             self.result['adminInfo'] = admin_name
         except Exception as e:
             print(f"❌ Error in detect_forward_address: {str(e)}")
@@ -0,0 +1,146 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+from typing import Optional, Dict, Any, List
+from .category_engine import CategoryEngine
+
+class RulePlan:
+    """
+    The ordered steps of Classifier.categorize_emails. A regex step only scans the rows that are still
+    unassigned and meet its source condition; a mask step assigns its category without a regex; a first
+    step scans each row once for the first of several categories (CategoryEngine.first_match).
+    Every step records eligible rows, rows scanned, rows the regex actually ran on (after the literal
+    prefilter; not counted for first steps), hits and elapsed time; explain() shows the plan with those numbers.
+    """
+    def __init__(self, engine: CategoryEngine):
+        self.engine = engine
+        self.steps: List[Dict[str, Any]] = []
+
+    def regex(self, category: str, mask: Any = True, condition: str = 'all'):
+        """Assign category to eligible rows whose text matches its categoryReg regexes"""
+        self.steps.append({'category': category, 'kind': 'regex', 'mask': mask, 'condition': condition})
+        return self
+
+    def assign(self, category: str, mask: Any, condition: str):
+        """Assign category to eligible rows without looking at the text"""
+        self.steps.append({'category': category, 'kind': 'mask', 'mask': mask, 'condition': condition})
+        return self
+
+    def first_of(self, categories: List[str], mask: Any = True, condition: str = 'all'):
+        """Assign each eligible row the first of categories (precedence order) its text matches"""
+        self.steps.append({'category': ' | '.join(categories), 'categories': list(categories), 'kind': 'first',
+                           'mask': mask, 'condition': condition})
+        return self
+
+    @staticmethod
+    def _eligible(mask: Any, index: pd.Index) -> np.ndarray:
+        return pd.Series(mask, index=index).fillna(False).to_numpy(dtype=bool)
+
+    def run(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Fill df['category'] for the rows that have none, step by step"""
+        for step in self.steps:
+            step['stats'] = None
+        unassigned = df['category'].isna().to_numpy(dtype=bool)
+        texts = df['email'].astype(str).tolist()
+        folded: List[Optional[str]] = [None] * len(texts)   # casefolded once per email, shared by every step
+        assigned = np.full(len(df), None, dtype=object)
+        done = np.zeros(len(df), dtype=bool)
+
+        for step in self.steps:
+            started = time.perf_counter()
+            category = step['category']
+            eligible = unassigned & self._eligible(step['mask'], df.index)
+            positions = np.flatnonzero(eligible)
+            scanned = searched = 0
+            if step['kind'] == 'mask':
+                hits = positions
+            elif step['kind'] == 'first':
+                categories = [c for c in step['categories'] if c in self.engine.patterns]
+                found = []
+                for pos in positions if categories else ():
+                    s = texts[pos]
+                    if not s or s == 'nan':
+                        continue
+                    scanned += 1
+                    if folded[pos] is None:
+                        folded[pos] = s.casefold()
+                    match = self.engine.first_match(s, categories, folded[pos])
+                    if match is not None:
+                        found.append(pos)
+                        assigned[pos] = match
+                hits = np.asarray(found, dtype=np.int64)
+            elif category not in self.engine.patterns:
+                hits = positions[:0]
+            else:
+                found = []
+                for pos in positions:
+                    s = texts[pos]
+                    if not s or s == 'nan':
+                        continue
+                    scanned += 1
+                    if folded[pos] is None:
+                        folded[pos] = s.casefold()
+                    if not self.engine.may_match(category, folded[pos]):
+                        continue
+                    searched += 1
+                    if self.engine.search(category, s):
+                        found.append(pos)
+                hits = np.asarray(found, dtype=np.int64)
+            if step['kind'] != 'first':
+                assigned[hits] = category
+            unassigned[hits] = False
+            done[hits] = True
+            step['stats'] = {'eligible': len(positions), 'scanned': scanned, 'searched': searched,
+                             'hits': len(hits), 'ms': round((time.perf_counter() - started) * 1000, 3)}
+
+        df.loc[done, 'category'] = assigned[done]
+        return df
+
+    def explain(self) -> List[Dict[str, Any]]:
+        """The steps in evaluation order with their condition, prefilter literals and last-run numbers"""
+        plan = []
+        for order, step in enumerate(self.steps):
+            literals = self.engine.literals.get(step['category']) if step['kind'] == 'regex' else None
+            plan.append({'order': order, 'category': step['category'], 'kind': step['kind'],
+                         'condition': step['condition'],
+                         'prefilter': None if literals is None else len(literals),
+                         **(step.get('stats') or {})})
+        return plan
+
+class RulePlanStats:
+    """Per-step totals over every categorize_emails run of the process, for GET /metrics/category_rules"""
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, Any]] = {}
+        self._runs = 0
+        self._lock = threading.Lock()
+
+    def record(self, plan: RulePlan):
+        with self._lock:
+            self._runs += 1
+            for step in plan.explain():
+                key = f"{step['kind']}:{step['category']}"
+                total = self._totals.get(key)
+                if total is None:
+                    total = self._totals[key] = {'category': step['category'], 'kind': step['kind'],
+                                                 'condition': step['condition'], 'eligible': 0, 'scanned': 0,
+                                                 'searched': 0, 'hits': 0, 'totalMs': 0.0, 'maxMs': 0.0}
+                for col in ('eligible', 'scanned', 'searched', 'hits'):
+                    total[col] += step.get(col, 0)
+                total['totalMs'] += step.get('ms', 0.0)
+                total['maxMs'] = max(total['maxMs'], step.get('ms', 0.0))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Steps by total time, most expensive first"""
+        with self._lock:
+            steps = [dict(total, totalMs=round(total['totalMs'], 2)) for total in self._totals.values()]
+            runs = self._runs
+        steps.sort(key=lambda total: total['totalMs'], reverse=True)
+        return {'runs': runs, 'steps': steps}
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self._runs = 0
+
+rule_plan_stats = RulePlanStats()
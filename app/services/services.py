@@ -17,6 +17,7 @@ from .connector import Connector
 from .classifier import Classifier
 from .forward import ForwardService
 from .summary import SummaryService
+from .errand_lookup import ErrandLookup
 
 
 @dataclass
@@ -32,6 +33,7 @@ class DefaultServices:
     _forwarder: Optional["ForwardService"] = field(default=None, init=False, repr=False)
     _addressResolver: Optional["AddressResolver"] = field(default=None, init=False, repr=False)
     _summary_service: Optional["SummaryService"] = field(default=None, init=False, repr=False)
+    _errand_lookup: Optional["ErrandLookup"] = field(default=None, init=False, repr=False)
         
     def get_processor(self):
         if self._processor is None:
@@ -40,7 +42,7 @@ class DefaultServices:
     
     def get_parser(self):
         if self._parser is None:
-            self._parser = Parser()
+            self._parser = Parser(self.get_errand_lookup())
         return self._parser
     
     def get_sender_detector(self):
@@ -70,7 +72,7 @@ class DefaultServices:
     
     def get_classifier(self):
         if self._classifier is None:
-            self._classifier = Classifier()
+            self._classifier = Classifier(self.get_errand_lookup())
         return self._classifier
     
     def get_forwarder(self):
@@ -80,9 +82,14 @@ class DefaultServices:
     
     def get_addressResolver(self):
         if self._addressResolver is None:
-            self._addressResolver = AddressResolver()
+            self._addressResolver = AddressResolver(self.get_errand_lookup())
         return self._addressResolver
     
+    def get_errand_lookup(self):
+        if self._errand_lookup is None:
+            self._errand_lookup = ErrandLookup()
+        return self._errand_lookup
+    
     def get_summary_service(self):
         if self._summary_service is None:
             self._summary_service = SummaryService()
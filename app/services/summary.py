@@ -1,8 +1,9 @@
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Any
 from groq import Groq, APIConnectionError, RateLimitError, APIStatusError
 from .base_service import BaseService
-from .utils import fetchFromDB, tz_convert, skip_thinking_part, get_groq_client, groq_chat_with_fallback
+from .query_registry import query_registry
+from .utils import tz_convert, skip_thinking_part, get_groq_client, groq_chat_with_fallback
 
 class SummaryService(BaseService):
     """Service for generating AI-powered summaries of communications"""
@@ -10,9 +11,6 @@ class SummaryService(BaseService):
     def __init__(self):
         super().__init__()
 
-        self.summary_chat_query = self.queries['summaryChat'].iloc[0]
-        self.summary_email_query = self.queries['summaryEmail'].iloc[0]
-        self.summary_comment_query = self.queries['summaryComment'].iloc[0]
         # Use cached model_df instead of reading CSV directly
         self.model = self.model_df['model'].iloc[0]
 
@@ -42,46 +40,29 @@ class SummaryService(BaseService):
         
 
     
-    def build_condition(self, email_id: Optional[int] = None, 
-                       errand_number: Optional[str] = None,
-                       reference: Optional[str] = None) -> Dict[str, str]:
-        """Build SQL conditions for different data types based on input parameters"""
-        conditions = {}
-        
-        if email_id:
-            conditions['chat'] = f'er.id = (SELECT "errandId" FROM email WHERE id = {email_id})'     
-            conditions['email'] = f'er.id = (SELECT "errandId" FROM email WHERE id = {email_id})'                           
-            conditions['comment'] = f'(cr."emailId" = {int(email_id)} OR cr."errandId" = (SELECT "errandId" FROM email WHERE id = {email_id}))'
-            
-        elif reference:
-            conditions['chat'] = f"ic.reference = '{reference}'"
-            conditions['email'] = f"ic.reference = '{reference}'"
-            conditions['comment'] = f"ic.reference = '{reference}'"
-            
-        elif errand_number:
-             conditions['chat'] = f"er.reference = '{errand_number}'"   
-             conditions['email'] = f"er.reference = '{errand_number}'"   
-             conditions['comment'] = f"er.reference = '{errand_number}'"   
-            
-        else:
-            raise ValueError("At least one identifier must be provided")
-            
-        return conditions
+    def build_lookup(self, email_id: Optional[int] = None,
+                     errand_number: Optional[str] = None,
+                     reference: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """Query registry suffix and bind parameters of the first identifier given (email id, reference, errand number)"""
+        def given(value) -> bool:
+            return value is not None and not (isinstance(value, float) and pd.isna(value)) and value != ''
+
+        if given(email_id):
+            return 'ByEmailId', {'email_id': int(email_id)}  # type: ignore[arg-type]
+        if given(reference):
+            return 'ByReference', {'reference': str(reference)}
+        if given(errand_number):
+            return 'ByErrandNumber', {'errand_number': str(errand_number)}
+        raise ValueError("At least one identifier must be provided")
     
-    def fetch_data(self, data_type: str, conditions: str) -> pd.DataFrame:
+    async def fetch_data(self, data_type: str, lookup: Tuple[str, Dict[str, Any]]) -> pd.DataFrame:
         """Efficiently fetch data with proper error handling"""
-        query_map = {
-            'chat': self.summary_chat_query,
-            'email': self.summary_email_query,
-            'comment': self.summary_comment_query
-        }
-        
-        if data_type not in query_map:
+        if data_type not in ('chat', 'email', 'comment'):
             return pd.DataFrame()
             
         try:
-            query = query_map[data_type].format(CONDITION=conditions)
-            df = fetchFromDB(query)
+            suffix, params = lookup
+            df = await query_registry.fetch_async(f'summary{data_type.capitalize()}{suffix}', **params)
             return df if not df.empty else pd.DataFrame()
         except Exception as e:
             return pd.DataFrame()
@@ -0,0 +1,74 @@
+import threading
+import regex as reg
+from typing import Dict, List, Optional, Sequence, Tuple
+from .category_engine import required_literals
+from .regex_guard import regex_guard
+
+_CACHE_LIMIT = 256
+
+class TruncationEngine:
+    """
+    Earliest start of any pattern of a truncation list (forwardWords, stopWords, Trim). Only the patterns
+    whose required literals (category_engine.required_literals) occur in the text are searched; most
+    emails contain none of a list's literals. Case-sensitive patterns are checked against the text as is,
+    the others against its casefolded form.
+    """
+    def __init__(self, patterns: Sequence[reg.Pattern]):
+        self.patterns = list(patterns)
+        self.exact = [not p.flags & reg.IGNORECASE for p in self.patterns]
+        self.literals = [required_literals(p.pattern, casefold=not exact) for p, exact in zip(self.patterns, self.exact)]
+
+    def candidates(self, text: str, folded: Optional[str] = None) -> List[reg.Pattern]:
+        """Patterns that may match text (folded: text.casefold(), computed when needed)"""
+        found = []
+        for pattern, literals, exact in zip(self.patterns, self.literals, self.exact):
+            if literals is not None:
+                if exact:
+                    haystack = text
+                else:
+                    folded = text.casefold() if folded is None else folded
+                    haystack = folded
+                if not any(literal in haystack for literal in literals):
+                    continue
+            found.append(pattern)
+        return found
+
+    def earliest(self, text: str) -> int:
+        """Start of the earliest match of any pattern (len(text) when none matches)"""
+        stop = len(text)
+        for pattern in self.candidates(text):
+            matched = regex_guard.search(pattern, text)
+            if matched and matched.start() < stop:
+                stop = matched.start()
+        return stop
+
+    def truncate(self, text: str) -> str:
+        """
+        Cut text at the earliest match after [BODY]. A match right at the start of the body is skipped by
+        searching again from the second character; a match inside the subject leaves the text whole.
+        """
+        subject = text.split('[BODY]', 1)[0]
+        subject_len = len(subject + '[BODY]')
+        pos1 = self.earliest(text)
+        if pos1 > subject_len:
+            return text[:pos1].strip()
+        elif pos1 == subject_len:
+            pos2 = self.earliest(text[1:]) + 1
+            return text[:pos2].strip() if pos2 > 1 else text
+        else:
+            return text
+
+_engines: Dict[Tuple[reg.Pattern, ...], TruncationEngine] = {}
+_engines_lock = threading.Lock()
+
+def truncation_engine(patterns: Sequence[reg.Pattern]) -> TruncationEngine:
+    """The engine of a compiled pattern list, built once per list (pattern_registry keeps the handles stable)"""
+    key = tuple(patterns)
+    engine = _engines.get(key)
+    if engine is None:
+        engine = TruncationEngine(key)
+        with _engines_lock:
+            if len(_engines) >= _CACHE_LIMIT:
+                _engines.clear()
+            _engines[key] = engine
+    return engine
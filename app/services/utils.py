@@ -1,16 +1,18 @@
 import os
 import math
-import base64
 import gspread
 import pandas as pd
 from typing import Optional, List, TypeVar, Type, Mapping, Any, Union
 import regex as reg
 from functools import lru_cache
-from sqlalchemy import create_engine, text
 from pydantic import BaseModel
 from groq import Groq
-from google.cloud.sql.connector import Connector, IPTypes
 from sqlalchemy.sql import text as sqlalchemy_text
+from ..core.data_source import get_data_source
+from ..core.query_metrics import query_metrics
+from .regex_guard import regex_guard
+from .pattern_registry import pattern_registry, PatternLike
+from .truncation import truncation_engine
 
 def get_service_account_path():
     """Get the service account file path based on environment"""
@@ -24,12 +26,7 @@ def get_service_account_path():
 @lru_cache(maxsize=3)
 def load_sheet_data(url, worksheet, useCols=None):
     try:
-        service_account_file = get_service_account_path()
-        gc = gspread.service_account(filename=service_account_file)
-        spreadsheet = gc.open_by_url(url)
-        worksheet = spreadsheet.worksheet(worksheet)
-        raw_data = worksheet.get_all_values()
-        df: pd.DataFrame = pd.DataFrame(raw_data[1:], columns=raw_data[0]) 
+        df: pd.DataFrame = get_data_source().load_sheet(url, worksheet)
         df = df.replace('', None)
         if useCols:
             df = df[list(useCols)]
@@ -54,60 +51,36 @@ def get_staffAnimal():
     useCols = ('Klinik', 'Personal', 'Djur')
     return load_sheet_data(url, worksheet, useCols) 
    
-def get_data_from_local_engine(db_user, db_password, db_host, db_port, db_name, query):
-    connection_string = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-    engine = create_engine(connection_string)
-    data = pd.read_sql(text(query), engine)
-    
-    return data
-
-def get_data_from_cloud_engine(db_user, db_password, db_name, query):
-    INSTANCE_CONNECTION_NAME = os.getenv('INSTANCE_CONNECTION_NAME', 'drp-system:europe-west4:drp')
-
-    connector = Connector()
+def fetchFromDB(query, params=None, name=None, label=None):
+    """Run a read query (SQL string or prepared text clause) on the configured data source.
+    name identifies the query for replica routing and recordings (registry name, e.g. 'errandConnectWindow'),
+    label groups it in query_metrics (queries.csv column, e.g. 'errandConnect'; defaults to name)."""
+    statement = sqlalchemy_text(query) if isinstance(query, str) else query
+    with query_metrics.track(label or name) as tracked:
+        data = get_data_source().fetch(statement, params, name)
+        tracked['df'] = data
 
-    def getconn():
-        conn = connector.connect(
-            INSTANCE_CONNECTION_NAME,  # '/cloudsql/<project_id>:<region>:<instance_name>'
-            "pg8000",
-            user=db_user,
-            password=db_password,
-            db=db_name,
-            ip_type=IPTypes.PUBLIC  # IPTypes.PRIVATE for private IP
-        )
-        return conn
-
-    pool = create_engine("postgresql+pg8000://",creator=getconn)
-
-    with pool.connect() as db_conn:
-        result = db_conn.execute(sqlalchemy_text(query))
-        data = result.fetchall()
-        data = pd.DataFrame(data, columns=result.keys()) # type: ignore
+    return data
 
-    connector.close()
+async def fetch_df_async(query, params=None, name=None, label=None):
+    """Run a read query on the async pool without blocking the event loop"""
+    statement = sqlalchemy_text(query) if isinstance(query, str) else query
+    with query_metrics.track(label or name) as tracked:
+        data = await get_data_source().fetch_async(statement, params, name)
+        tracked['df'] = data
 
     return data
-         
-def fetchFromDB(query):
-    db_name = os.getenv('DB_NAME')
-    db_user = os.getenv('DB_USER')
-    db_host = os.getenv('DB_HOST')
-    db_port = os.getenv('DB_PORT')
-    
-    if os.getenv("ENV_MODE") == "local":
-        db_password_encoded = os.getenv('DB_PASSWORD')
-        if db_password_encoded:
-            db_password = base64.b64decode(db_password_encoded).decode('utf-8')
-        else:
-            raise ValueError("DB_PASSWORD environment variable is not set")
-        data = get_data_from_local_engine(db_user, db_password, db_host, db_port, db_name, query)
-    elif os.getenv("ENV_MODE") in ['test','production']:
-        db_password = os.getenv('DB_PASSWORD')
-        if db_password:
-            pass
-        else:
-            raise ValueError("DB_PASSWORD environment variable is not set")
-        data = get_data_from_cloud_engine(db_user, db_password, db_name, query)
+
+def fetch_columnar(query, params=None, columns: Optional[Mapping[str, str]] = None, name=None, label=None) -> pd.DataFrame:
+    """
+    Bulk read for large result sets, built column by column with the dtypes given in columns
+    (kinds from data_source.COLUMN_DTYPES), e.g. via COPY ... TO STDOUT on Postgres.
+    """
+    statement = sqlalchemy_text(query) if isinstance(query, str) else query
+    with query_metrics.track(label or name) as tracked:
+        data = get_data_source().fetch_columnar(statement, params, columns, name)
+        tracked['df'] = data
+        tracked['bytes'] = data.attrs.pop('bytes', None)
 
     return data
 
@@ -172,9 +145,10 @@ def parse_to_column(df, col='to', new_col='parsedTo'):
     exploded = df.explode(new_col)
     return exploded
  
-def base_match(text: str, patterns: List[str]) -> Optional[str]:
-    for p in map(lambda r: reg.compile(r, reg.DOTALL|reg.MULTILINE), patterns):
-        matched = p.search(text)
+def base_match(text: str, patterns: List[PatternLike]) -> Optional[str]:
+    """Group 1 of the first pattern matching text (compiled handles, or strings compiled with DOTALL | MULTILINE)"""
+    for p in pattern_registry.compiled(patterns):
+        matched = regex_guard.search(p, text)
         if matched:
             return matched.group(1)
     return None   
@@ -229,8 +203,11 @@ def dataframe_to_model(df: pd.DataFrame, model_cls: Type[T], rename: Optional[Ma
 
     return out
 
+# Insurance companies check_eq treats as the same sender/receiver
+CHECK_EQ_GROUP = {'Trygg-Hansa', 'Moderna Försäkringar'}
+
 def check_eq(a, b):
-    grp = {'Trygg-Hansa', 'Moderna Försäkringar'}
+    grp = CHECK_EQ_GROUP
     if pd.isna(a) or pd.isna(b):
         return False
     return (a in grp and b in grp) or (a == b)
@@ -275,25 +252,12 @@ def as_id_list(v):
     except Exception:
         return [v]
     
-def find_trunc_pos(text, trunc_reg_list):
-    stop = len(text)
-    for patt in map(lambda r: reg.compile(r, reg.DOTALL | reg.MULTILINE), trunc_reg_list):
-        matched = reg.search(patt, text)
-        if matched and 0 <= matched.start() < stop:
-            stop = matched.start()
-    return stop
+def find_trunc_pos(text, trunc_reg_list: List[PatternLike]):
+    """Start of the earliest match of any pattern in text, len(text) when none (one scan, see TruncationEngine)"""
+    return truncation_engine(pattern_registry.compiled(trunc_reg_list)).earliest(text)
      
-def truncate_text(text, trunc_reg_list):
-    subject = text.split('[BODY]', 1)[0]
-    subject_len = len(subject + '[BODY]')
-    pos1 = find_trunc_pos(text, trunc_reg_list)
-    if pos1 > subject_len:
-        return text[:pos1].strip()
-    elif pos1 == subject_len:
-        pos2 = find_trunc_pos(text[1:], trunc_reg_list) + 1
-        return text[:pos2].strip() if pos2 > 1 else text
-    else:
-        return text
+def truncate_text(text, trunc_reg_list: List[PatternLike]):
+    return truncation_engine(pattern_registry.compiled(trunc_reg_list)).truncate(text)
     
 def tz_convert(df: pd.DataFrame, time_col: str) -> pd.DataFrame:
     if not df.empty:
@@ -0,0 +1,620 @@
+"""Frozen copy of app/services/payment.py before the index/searchsorted rewrites ([user-007] state): the reference
+implementation tests/test_replay_equivalence.py compares the current one against. Do not modify."""
+from __future__ import annotations
+import regex as reg
+import pandas as pd
+from typing import List, Dict, Any, Optional, Tuple, Union
+from itertools import combinations
+from app.services.base_service import BaseService
+from app.services.utils import get_payoutEntity, tz_convert
+from app.services.query_registry import query_registry
+from app.services.errand_lookup import ErrandLookup
+
+
+class PaymentService(BaseService):
+    """Service for payment matching functionality"""
+    
+    def __init__(self, payment_df: Optional[pd.DataFrame] = None, errand_lookup: Optional[ErrandLookup] = None):
+        super().__init__()
+        self.payment_df: pd.DataFrame = payment_df if payment_df is not None else pd.DataFrame()
+        self.errand_lookup = errand_lookup or ErrandLookup()
+        # Use cached data instead of reading CSV files directly
+        # self.info_reg and self.bank_map are already loaded by BaseService
+        self.info_item_list = self.info_reg.item.to_list()
+        self.bank_dict = self.bank_map.set_index('bankName')['insuranceCompanyReference'].to_dict()
+        self._payout_entity = None
+        self.matching_cols_pay = ['extractReference','extractOtherNumber','extractDamageNumber']
+        self.matching_cols_errand = ['isReference','damageNumber','invoiceReference','ocrNumber']
+        self.base_url = 'https://admin.direktregleringsportalen.se/errands/'         
+        
+        # Pre-compile regex patterns for better performance
+        self.ref_reg = reg.compile(r'\d+')
+        self._precompiled_patterns = {}
+        self._compile_info_patterns()
+        
+        # Cache expensive dictionary operations
+        self._entity_dicts_cached = False
+        self._payout_entity_source = {}
+        self._fb_dict = {}
+        self._clinic_dict = {}
+        
+    def _compile_info_patterns(self):
+        """Pre-compile all regex patterns from infoReg for better performance"""
+        for _, row in self.info_reg.iterrows():
+            pattern = row['regex']
+            item = row['item']
+            try:
+                compiled_pattern = reg.compile(pattern, reg.DOTALL | reg.IGNORECASE)
+                self._precompiled_patterns[item] = compiled_pattern
+            except Exception as e:
+                print(f"❌ Error compiling pattern '{item}': {str(e)}")
+                self._precompiled_patterns[item] = None
+                
+    @property
+    def payout_entity(self):
+        """Lazy loading of payout entity data"""
+        if self._payout_entity is None:
+            self._payout_entity = get_payoutEntity()
+        return self._payout_entity
+
+    def _get_entity_dicts(self):
+        """Cache entity dictionaries to avoid repeated computation"""
+        if not self._entity_dicts_cached:
+            self._payout_entity_source = self.payout_entity.set_index('payoutEntity')['source'].to_dict()
+            self._fb_dict = self.payout_entity.loc[self.payout_entity['source'] == 'Insurance_Company'].groupby('payoutEntity')['clinic'].apply(list).to_dict()
+            self._clinic_dict = self.payout_entity.loc[self.payout_entity['source'] == 'Clinic'].groupby('payoutEntity')['clinic'].apply(list).to_dict()
+            self._entity_dicts_cached = True
+        return self._payout_entity_source, self._fb_dict, self._clinic_dict
+
+    def load_preprocess_database(self, ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        errand = query_registry.fetch('errandPay')
+        errand = tz_convert(errand, 'createdAt')
+        errand['settlementAmount'] = errand['settlementAmount'].fillna(0).astype(float)
+   
+        payout = query_registry.fetch('payout')
+        if not payout.empty:
+            payout['reference'] = payout['reference'].astype(str)
+        
+        return errand, payout
+    
+    def _build_errand_lookup(self, errand: pd.DataFrame, row_pay: pd.Series) -> Dict[str, Dict[str, List[int]]]:
+        date_mask = (errand['createdAt'] <= row_pay['createdAt'])
+        if not date_mask.any():
+            return {}
+        
+        errand = errand.loc[date_mask].copy()
+        errand_lookup = {}
+        for col in self.matching_cols_errand:
+            if col in errand.columns:
+                s = errand[col]
+                notna_mask = s.notna()
+                if notna_mask.any():
+                    filtered_s = s[notna_mask]
+                    groups = filtered_s.groupby(filtered_s).indices  
+                    errand_lookup[col] = {val: filtered_s.index.take(pos_arr).tolist()
+                        for val, pos_arr in groups.items()}
+        return errand_lookup
+                    
+    def init_payment(self) -> PaymentService:
+        """Process payment data - extract references and initialize columns. Returns self for method chaining."""
+        if self.payment_df.empty:
+            return self
+
+        pay = self.payment_df.copy()
+        pay = tz_convert(pay, 'createdAt')
+
+        mask = pay['reference'].notna()
+        if mask.any():
+            pay.loc[mask,'extractReference'] = pay.loc[mask,'reference'].apply(lambda x: ''.join(self.ref_reg.findall(x)) if isinstance(x, str) else None)
+        pay.loc[pay['extractReference'].notna(),'extractReference'] = pay.loc[pay['extractReference'].notna(),'extractReference'].replace('', None)
+        pay['settlementAmount'] = 0
+        pay['status'] = ""
+
+        for col in self.info_item_list:
+            colName = col.split('_')[1]
+            if colName not in pay.columns:
+                pay[colName] = None
+
+        init_columns = ['val_pay', 'val_errand', 'isReference', 'insuranceCaseId', 'referenceLink']
+        for col in init_columns:
+            pay[col] = [[] for _ in range(len(pay))]
+
+        # Update internal DataFrame and return self for chaining
+        self.payment_df = pay[['id','val_pay','val_errand','amount','settlementAmount','isReference','insuranceCaseId','referenceLink',
+                    'status','extractReference','extractDamageNumber','extractOtherNumber','bankName','info','reference','createdAt']]
+        return self
+
+    def parse_info(self) -> PaymentService:
+        """Parse payment info field using regex patterns - optimized with pre-compiled patterns. Returns self for method chaining."""
+        if self.payment_df.empty:
+            return self
+
+        pay = self.payment_df.copy()
+        mask = pay['info'].notna()
+        for idx, row_pay in pay.loc[mask].iterrows():
+            fb = self.bank_dict.get(row_pay['bankName'], 'None')
+            mask_info = self.info_reg['item'].str.startswith(fb)
+            for _, rowInfoReg in self.info_reg[mask_info].iterrows():
+                col = rowInfoReg['item'].split('_')[1]
+                item = rowInfoReg['item']
+                compiled_pattern = self._precompiled_patterns.get(item)
+                if compiled_pattern is None:
+                    continue
+
+                match = compiled_pattern.search(row_pay['info'])
+                if match:
+                    matched_value = match.group(1).strip()
+                    if col not in row_pay or pd.isna(row_pay.get(col)):
+                        pay.at[idx, col] = matched_value  # type: ignore
+                    else:
+                        # Ensure isReference is a list
+                        current_val = pay.at[idx, 'isReference']  # type: ignore
+                        if not isinstance(current_val, list):
+                            current_val = [] if pd.isna(current_val) else [current_val]
+                        current_val.append(matched_value)
+                        pay.at[idx, 'isReference'] = current_val  # type: ignore
+
+        # Clean up duplicates
+        pay.loc[pay['extractDamageNumber'] == pay['extractOtherNumber'], 'extractDamageNumber'] = None
+        pay.loc[pay['extractReference'] == pay['extractOtherNumber'], 'extractOtherNumber'] = None
+        pay.loc[pay['extractReference'] == pay['extractDamageNumber'], 'extractDamageNumber'] = None
+
+        # Update internal DataFrame and return self for chaining
+        self.payment_df = pay
+        return self
+
+    def get_result(self) -> pd.DataFrame:
+        """Get the final processed DataFrame"""
+        return self.payment_df.copy()
+
+    def match_by_info(self, errand: pd.DataFrame) -> PaymentService:
+        """Match by info using self.payment_df - returns self for chaining"""
+        if self.payment_df.empty or errand.empty:
+            return self
+
+        pay = self.payment_df.copy()
+        mask = (pay['info'].notna() | pay['extractReference'].notna())
+
+        matched_by_idx = {}
+        for idx, row_pay in pay.loc[mask].iterrows():
+            matched_ic_ids = self._find_matches(pay, errand, idx, row_pay)
+            if matched_ic_ids:
+                pay.at[idx, 'insuranceCaseId'].extend(matched_ic_ids)  # type: ignore
+            matched_by_idx[idx] = matched_ic_ids
+
+        # Resolve the links of every matched insurance case in one query
+        self.errand_lookup.prefetch_links(ic_ids=[ic_id for idx in matched_by_idx for ic_id in pay.at[idx, 'insuranceCaseId']])  # type: ignore
+
+        for idx, matched_ic_ids in matched_by_idx.items():
+            qty = len(matched_ic_ids)
+            if qty > 0:
+                links = self._generate_links(pay.at[idx, 'insuranceCaseId'], pay.at[idx, 'val_errand'], 'ic.id')  # type: ignore
+                pay.at[idx, 'referenceLink'] = links  # type: ignore
+                if qty == 1:
+                    pay.at[idx, 'status'] = f"One DR matched perfectly (reference: {', '.join(links)})."  # type: ignore
+                else:
+                    pay.at[idx, 'status'] = (f"Found {qty} matching DRs (references: {', '.join(links)}) " # type: ignore
+                                             f"and the payment amount matches each one.")
+            else:
+                pay.at[idx, 'status'] = 'No Found'  # type: ignore
+
+        self.payment_df = pay
+        return self
+    
+    def _find_matches(self, pay: pd.DataFrame, errand: pd.DataFrame, idx: int, row_pay: pd.Series) -> List[int]:
+        matched = {col_pay: [] for col_pay in self.matching_cols_pay}
+        date_mask = (errand['createdAt'] <= row_pay['createdAt'])
+        if not date_mask.any():
+            return []
+
+        val_amount = row_pay['amount']
+        errand_lookup = self._build_errand_lookup(errand, row_pay)
+        for col_pay in self.matching_cols_pay:
+            val_pay = row_pay[col_pay]
+            if pd.isna(val_pay):
+                continue
+
+            for col_errand in self.matching_cols_errand:
+                indices = errand_lookup.get(col_errand, {}).get(val_pay, [])
+                if not indices:
+                    continue
+                
+                idxs_sorted = sorted(indices)
+                matched_rows = errand.loc[idxs_sorted]
+
+                current_refs = set(pay.at[idx, 'isReference'])  # type: ignore
+                for ref in matched_rows['isReference']:
+                    if ref not in current_refs:
+                        pay.at[idx, 'isReference'].append(ref)  # type: ignore
+                        pay.at[idx, 'val_pay'].append(val_pay)  # type: ignore
+                        current_refs.add(ref)
+
+                rows_amount_ok = matched_rows[matched_rows['settlementAmount'] == val_amount]
+                if not rows_amount_ok.empty:
+                    for _, r in rows_amount_ok.iterrows():
+                        icid = int(r['insuranceCaseId'])
+                        if icid not in matched[col_pay]:
+                            matched[col_pay].append(icid)  # type: ignore
+                        pay.at[idx, 'val_errand'].append(r[col_errand])  # type: ignore
+
+        matchedLists = [matched[c] for c in self.matching_cols_pay if matched[c]]
+        if not matchedLists:
+            return []
+
+        first = matchedLists[0]
+        inter = [x for x in first if all(x in s for s in matchedLists[1:])]
+        if inter:
+            return inter
+
+        union = []
+        seen = set()
+        for s in matchedLists:
+            for x in s:
+                if x not in seen:
+                    seen.add(x)
+                    union.append(x)
+        return union
+    
+    def _compute_match(self, matched: Dict[str, List[Any]]) -> List[Any]:
+        matched_lists: List[List[Any]] = []
+        for c in self.matching_cols_pay:
+            lst = matched.get(c)
+            if isinstance(lst, list) and len(lst) > 0:
+                matched_lists.append(lst)
+
+        if not matched_lists:
+            return []
+
+        first = matched_lists[0]
+        inter = [x for x in first if all(x in s for s in matched_lists[1:])]
+        if inter:
+            return inter
+
+        seen = set()
+        union: List[Any] = []
+        for s in matched_lists:
+            for x in s:
+                if x not in seen:
+                    seen.add(x)
+                    union.append(x)
+        return union
+
+    def _generate_links(self, ic_ids: List[Any], vals_errand: List[Any], condition: str) -> List[str]:
+        links = []
+        if not ic_ids:
+            return links
+        
+        if condition == 'ic.reference':
+            self.errand_lookup.prefetch_links(refs=ic_ids)
+        else:
+            self.errand_lookup.prefetch_links(ic_ids=ic_ids)
+
+        for id, valErrand in zip(ic_ids, vals_errand):
+            if condition == 'ic.reference':
+                result = self.errand_lookup.link_by_reference(id)
+            else:
+                result = self.errand_lookup.link_by_ic_id(id)
+            if result is not None: 
+                errandNumber = result['errandNumber']
+                ref = result['reference']
+                link = f'<a href="{self.base_url}{errandNumber}" target="_blank" style="background-color: gray; color: white; padding: 2px 5px;" title="matched by {valErrand}">{ref}</a>'
+                links.append(link)
+            else:
+                links.append(f'{id} (No Corresponding Link)')
+        return links
+
+    def reminder_unmatched_amount(self) -> PaymentService:
+        """Handle partial payments from FB using self.payment_df - returns self for chaining"""
+        if self.payment_df.empty:
+            return self
+
+        mask = self.payment_df['status'].isin(["No Found", ""])
+        if not mask.any():
+            return self
+        
+        pay_df = self.payment_df.copy()
+        refs_by_idx = {}
+        for idx, row_pay in pay_df.loc[mask].iterrows():
+            isReference = []
+            if (isinstance(row_pay['isReference'], list) and len(row_pay['isReference']) > 0):
+                for ref in row_pay['isReference']:
+                    if ref not in isReference:
+                        isReference.append(ref)
+                        
+            if pd.notna(row_pay['extractReference']) and (len(row_pay['extractReference']) == 10) and (row_pay['extractReference'] not in isReference):
+                isReference.append(str(row_pay['extractReference']))
+
+            if pd.notna(row_pay['extractOtherNumber']) and (len(row_pay['extractOtherNumber']) == 10) and (row_pay['extractOtherNumber'] not in isReference):
+                isReference.append(str(row_pay['extractOtherNumber']))
+ 
+            if pd.notna(row_pay['extractDamageNumber']) and (len(row_pay['extractDamageNumber']) == 10) and (row_pay['extractDamageNumber'] not in isReference):
+                isReference.append(str(row_pay['extractDamageNumber']))
+            refs_by_idx[idx] = isReference
+
+        # One partialPay query and one errandLink query for the references of all rows
+        all_refs = list(dict.fromkeys(str(ref) for refs in refs_by_idx.values() for ref in refs))
+        partial_pay = pd.DataFrame()
+        if all_refs:
+            partial_pay = query_registry.fetch('partialPayByRefs', refs=all_refs)
+            if not partial_pay.empty:
+                partial_pay = tz_convert(partial_pay, 'paymentReceivedTime')
+                partial_pay.loc[partial_pay['settlementAmount'].isna(), 'settlementAmount'] = 0
+                partial_pay.loc[partial_pay['paymentFromFB'].isna(), 'paymentFromFB'] = 0
+            self.errand_lookup.prefetch_links(refs=all_refs)
+
+        for idx, row_pay in pay_df.loc[mask].iterrows():
+            matched_ic_ids, links = [], []
+            isReference = refs_by_idx[idx]
+            ref_amount_dict = {}
+            msg = "No Found"
+
+            if len(isReference) > 0 and not partial_pay.empty:
+                sub_errand = partial_pay.loc[partial_pay['isReference'].astype(str).isin({str(ref) for ref in isReference})]
+                
+                if not sub_errand.empty:
+                    mask_full_pay = (sub_errand['createdAt'] <= row_pay['createdAt'])
+                    mask_partial_pay = (sub_errand['paymentReceivedTime'] <= row_pay['createdAt'])
+                    if mask_partial_pay.any():
+                        sub_errand = sub_errand.loc[mask_partial_pay]
+                    else:
+                        sub_errand = sub_errand.loc[mask_full_pay]
+
+                    ref_groups = sub_errand.groupby('isReference')
+                    for ref, group_df in ref_groups:
+                        if str(ref) not in [str(r) for r in pay_df.at[idx, 'isReference']]:  # type: ignore
+                            pay_df.at[idx, 'isReference'].append(str(ref))  # type: ignore
+                            pay_df.at[idx, 'val_pay'].append(str(ref))  # type: ignore
+
+                        total_fb_payment = group_df['paymentFromFB'].fillna(0).sum()
+                        total_settlement = group_df['settlementAmount'].fillna(0).iloc[0]  
+
+                        if total_fb_payment == total_settlement:
+                            remaining_amount = total_settlement
+                        else:
+                            remaining_amount = total_settlement - total_fb_payment
+                            
+                        ref_amount_dict[str(ref)] = max(0, remaining_amount)
+                        pay_df.at[idx, 'settlementAmount'] += remaining_amount  # type: ignore
+                        for ic_id in group_df['insuranceCaseId'].unique():
+                            if ic_id not in matched_ic_ids:
+                                matched_ic_ids.append(ic_id)
+
+            ref_list = pay_df.at[idx, 'isReference']  # type: ignore
+            val_errand_list = pay_df.at[idx, 'val_pay']  # type: ignore
+            links = self._generate_links(ref_list, val_errand_list, 'ic.reference')  # type: ignore
+            pay_df.at[idx, 'referenceLink'] = links  # type: ignore
+            
+            qty = len(matched_ic_ids)
+            if qty > 0:
+                total_settlement_amount = pay_df.at[idx, 'settlementAmount']  # type: ignore
+                row_payment_amount = row_pay['amount']
+                
+                if row_payment_amount == total_settlement_amount:
+                    if qty == 1:
+                        msg = f"One DR matched perfectly (reference: {', '.join(links)})."
+                    else:
+                        msg = (f"Found {qty} matching DRs (references: {', '.join(links)}), "
+                               f"and the total remaining amount matches the payment.")
+                else:
+                    matched_references = self._partly_amount_matching(ref_amount_dict, row_payment_amount)
+                    if matched_references:
+                        matched_links = [link for link in links if any(ref in link for ref in matched_references)]
+                        if len(matched_references) == 1:
+                            msg = f"One DR matched perfectly (reference: {', '.join(matched_links)})."
+                        else:
+                            msg = f"Found {len(matched_references)} matching DRs (references: {', '.join(matched_links)}), and the total remaining amount matches the payment."
+                    else:
+                        if qty == 1:
+                            msg = f"Found 1 relevant DR (reference: {', '.join(links)}), but the remaining amount does not match."
+                        else:
+                            msg = f"Found {qty} relevant DRs (references: {', '.join(links)}), but the remaining amounts do not match."
+
+            pay_df.at[idx, 'status'] = msg  # type: ignore
+
+        self.payment_df = pay_df
+        return self
+
+    def _partly_amount_matching(self, ref_amount_dict: Dict[str, float], target_amount: float) -> Optional[List[str]]:
+        """Find combinations of references that match the target amount"""
+        references = list(ref_amount_dict.keys())
+        amounts = list(ref_amount_dict.values())
+        
+        for r in range(1, len(amounts) + 1):
+            for combo in combinations(zip(references, amounts), r):
+                combo_references, combo_amounts = zip(*combo)
+                if float(sum(combo_amounts)) == float(target_amount):
+                    return list(combo_references)
+                
+        return None
+ 
+    def _msg_for_one(self, one_line_df: pd.DataFrame, source: str, amount: float) -> str:
+        errand_number = one_line_df.iloc[0]['errandNumber']
+        ref = one_line_df.iloc[0]['isReference']
+        settlement_amount = one_line_df.iloc[0]['settlementAmount'] if pd.notna(one_line_df.iloc[0]['settlementAmount']) else 0
+        
+        if source == 'Insurance_Company':
+            entity = one_line_df.iloc[0]['insuranceCompanyName'] 
+        elif source == 'Clinic':
+            entity = one_line_df.iloc[0]['clinicName']
+            
+        link = f'<a href="{self.base_url}{errand_number}" target="_blank" style="background-color: gray; color: white; padding: 2px 5px;" title="matched by Entity: {entity} and Amount: {amount}">{ref}</a>'
+        
+        if float(amount) == float(settlement_amount):
+            msg = f"One DR matched perfectly (reference: {link}) by both entity and amount."
+        else:
+            msg = "No Found"
+            
+        return msg
+
+    def match_entity_and_amount(self, errand: pd.DataFrame) -> PaymentService:
+        """Match entity and amount using self.payment_df - returns self for chaining"""
+        if self.payment_df.empty or errand.empty:
+            return self
+        
+        mask = self.payment_df['status'].isin(["No Found", ""])
+        if not mask.any():
+            return self
+        
+        pay = self.payment_df.copy()
+        payout_entity_source, fb_dict, clinic_dict = self._get_entity_dicts()
+
+        errand = errand.copy()
+        errand["fb_lower"] = errand["insuranceCompanyName"].str.lower()
+
+        errand_date = errand["createdAt"]
+        fb_lower = errand["insuranceCompanyName"].str.lower()
+        clinic_lower = errand["clinicName"].str.lower()
+
+        for idx, rowPay in pay.loc[mask].iterrows():
+            amount = rowPay['amount']
+            source = payout_entity_source.get(rowPay['bankName'], "Unknown")
+            msg = "No Found"
+            if source == 'Insurance_Company':
+                fb_list = fb_dict.get(rowPay['bankName'], [])
+                if not fb_list:
+                    pay.at[idx, 'status'] = "No Found"  # type: ignore
+                    continue
+
+                fb_lower_list = [x.lower() for x in fb_list if isinstance(x, str)]
+                entity_matched = errand.loc[(errand_date <= rowPay['createdAt']) & (fb_lower.isin(fb_lower_list))]
+
+            elif source == 'Clinic':
+                clinic_list = clinic_dict.get(rowPay['bankName'], [])
+                if not clinic_list:
+                    pay.at[idx, 'status'] = "No Found"  # type: ignore
+                    continue
+                clinic_lower_list = [x.lower() for x in clinic_list if isinstance(x, str)]
+                entity_matched = errand.loc[(errand_date <= rowPay['createdAt']) & (clinic_lower.isin(clinic_lower_list))]
+            else:
+                pay.at[idx, 'status'] = "No Found"  # type: ignore
+                continue 
+                
+            qty = len(entity_matched)
+            if qty == 1:
+                msg = self._msg_for_one(entity_matched, source, amount)
+
+            elif qty > 1:
+                for _, group_df in entity_matched.groupby(['insuranceCompanyName', 'clinicName', 'animalId'], observed=True):
+                    if len(group_df) == 1:
+                        temp = self._msg_for_one(group_df, source, amount)
+                        msg = temp
+                    else:
+                        ref_amount_dict, links = {}, []
+                        for _, row in group_df.iterrows():
+                            sa = row['settlementAmount']
+                            if pd.notna(sa):
+                                ref_amount_dict[row['isReference']] = sa  # 不把 NaN 当 0
+                            errand_number = row['errandNumber']
+                            ref = row['isReference']
+                            entity = row['insuranceCompanyName'] if source == 'Insurance_Company' else row['clinicName']
+                            link = (f'<a href="{self.base_url}{errand_number}" target="_blank" '
+                                    f'style="background-color: gray; color: white; padding: 2px 5px;" '
+                                    f'title="matched by Entity: {entity} and Amount: {amount}">{ref}</a>')
+                            links.append((ref, link))
+
+                        matched_refs = self._partly_amount_matching(ref_amount_dict, amount)
+                        if matched_refs:
+                            matched_links = [link for ref, link in links if ref in matched_refs]
+                            if len(matched_refs) == 1:
+                                msg = (f"One DR matched perfectly (reference: {', '.join(matched_links)}) "
+                                       f"by both entity and amount.")
+                            else:
+                                msg = (f"Found {len(matched_refs)} matching DRs "
+                                       f"(references: {', '.join(matched_links)}) by entity, "
+                                       f"and the total amount matches the payment.")
+                        else:
+                            msg = "No Found"
+                    
+            else:
+                msg = "No Found"
+
+            pay.at[idx, 'status'] = msg  # type: ignore
+
+        self.payment_df = pay
+        return self
+ 
+    def match_payout(self, payout: pd.DataFrame) -> PaymentService:
+        """Match against payout records using self.payment_df - returns self for chaining"""
+        if self.payment_df.empty:
+            return self
+        
+        mask = self.payment_df['status'].isin(["No Found", ""])
+        if not mask.any():
+            return self
+        
+        pay = self.payment_df.copy()
+        if payout.empty:
+            pay.loc[mask, 'status'] = 'No matching DRs found.'
+            self.payment_df = pay
+            return self
+            
+        ref_series = payout['reference']
+        amt_series = payout['amount']
+        
+        for idx, row_pay in pay.loc[mask].iterrows():
+            matched_trans_ids, matched_clinic_name, matched_type = [], [], []
+            amount_eq = (amt_series == row_pay['amount'])
+
+            for col in self.matching_cols_pay:
+                val_pay = row_pay[col]
+                if pd.isna(val_pay):
+                    continue
+                hits = payout[(ref_series == val_pay) & amount_eq]
+
+                for _, hit in hits.iterrows():
+                    tid = hit['transactionId']
+                    if pd.notna(tid):
+                        tid = int(tid)
+                        if tid not in matched_trans_ids:
+                            matched_trans_ids.append(tid)
+
+                    cname = hit['clinicName']
+                    if pd.notna(cname) and cname not in matched_clinic_name:
+                        matched_clinic_name.append(cname)
+
+                    typ = hit['type']
+                    if pd.notna(typ) and typ not in matched_type:  
+                        matched_type.append(typ)
+
+            qty = len(matched_trans_ids)
+            if qty == 1:
+                pay.at[idx, 'status'] = (f"Payment has been paid out<br>"  # type: ignore
+                                         f"             TransactionId: {list(matched_trans_ids)[0]}<br>"
+                                         f"             Amount: {row_pay['amount'] / 100:.2f} kr<br>"
+                                         f"             Clinic Name: {list(matched_clinic_name)[0]}<br>"
+                                         f"             Type: {list(matched_type)[0] if matched_type else ''}")
+            elif qty > 0:
+                pay.at[idx, 'status'] = (f"Payment has been paid out {qty} times<br>"  # type: ignore
+                                         f"    TransactionId:{' '.join(map(str, sorted(matched_trans_ids)))}<br>"
+                                         f"           Amount: {row_pay['amount'] / 100:.2f} kr<br>"
+                                         f"      Clinic Name: {' '.join(sorted(matched_clinic_name))}<br>"
+                                         f"             Type: {' '.join(sorted(matched_type))}")
+            else:
+                pay.at[idx, 'status'] = 'No matching DRs found.'  # type: ignore
+
+        self.payment_df = pay
+        return self
+
+    def statistics(self, pay: pd.DataFrame) -> Dict[str, Any]:
+        """Calculate matching statistics"""
+        all_count = pay.id.count()
+        matched = pay[(~pay['status'].str.contains('No Found', na=False)) & (~pay['status'].str.contains('No matching DRs found', na=False))]
+        perfect = pay[pay['status'].str.contains('One DR matched perfectly', na=False)]
+        relevant = pay[pay['status'].str.contains('relevant', na=False)]
+        payout = pay[pay['status'].str.contains('paid out', na=False)]
+        noFound = pay[pay['status'].str.contains('No Found', na=False)]
+        noMatch = pay[pay['status'].str.contains('No matching DRs found', na=False)]
+        
+        return {
+            'total': all_count,
+            'matched': matched.id.count(),
+            'matched_rate': matched.id.count() / all_count * 100 if all_count > 0 else 0,
+            'perfect_matched': perfect.id.count(),
+            'perfect_rate': perfect.id.count() / all_count * 100 if all_count > 0 else 0,
+            'relevant_matched': relevant.id.count(),
+            'relevant_rate': relevant.id.count() / all_count * 100 if all_count > 0 else 0,
+            'paid_out': payout.id.count(),
+            'paid_out_rate': payout.id.count() / all_count * 100 if all_count > 0 else 0,
+            'unmatched': noFound.id.count() + noMatch.id.count(),
+            'unmatched_rate': (noFound.id.count() + noMatch.id.count()) / all_count * 100 if all_count > 0 else 0
+        }
\ No newline at end of file
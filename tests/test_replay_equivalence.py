@@ -0,0 +1,236 @@
+"""
+Replay test: the baseline Connector / PaymentService (tests/baseline, before the index and searchsorted
+rewrites) and the current ones run on the same recorded fixture and must produce the same errandId,
+connectedCol and status values.
+
+The fixture is a RecordedDataSource file. Set REPLAY_FIXTURE to a file recorded from the live database
+(DATA_SOURCE=record) that also holds the 'input:emails' and 'input:payments' frames; otherwise one is
+recorded here from a seeded synthetic source, running the baseline in record mode.
+"""
+import os
+import random
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.data_source import DataSource, RecordedDataSource, set_data_source
+from app.dataset.payment_dataset import PaymentDataset
+from app.services import connector as connector_module
+from app.services.connector import Connector
+from app.services.errand_cache import ErrandCache
+from app.services.payment import PaymentService
+from tests.baseline import connector as baseline_connector_module
+from tests.baseline import payment as baseline_payment_module
+
+SEED = 20250101
+FBS = ['Agria', 'Trygg-Hansa', 'Moderna Försäkringar', 'Sveland', None]
+CLINICS = ['Vet A', 'Vet B', 'Vet C', None]
+NAMES = ['bella', 'max', 'bella max', 'sixten', 'anna svensson', 'svensson', None, '']
+PAY_BANKS = {  # bankName -> (payoutEntity source, names in errandPay)
+    'Agria Djurförsäkring': ('Insurance_Company', ['Agria']),
+    'SVELAND DJURFÖRSÄKRINGAR ÖMSESIDIGT': ('Insurance_Company', ['Sveland']),
+    'Vet A AB': ('Clinic', ['Vet A']),
+    'Vet B Djurklinik': ('Clinic', ['Vet B', 'Vet C']),
+    'Okänd Bank': ('Other', []),
+}
+
+
+class SyntheticDataSource(DataSource):
+    """Seeded errands, payments and payouts answering the queries Connector and PaymentService issue"""
+    def __init__(self, seed: int):
+        rnd = random.Random(seed)
+        self.now = pd.Timestamp.now(tz='UTC')
+        self.errand_connect = self._errand_connect(rnd)
+        self.errand_pay = self._errand_pay(rnd)
+        self.payout = self._payout(rnd)
+        self.partial_pay = self._partial_pay(rnd)
+
+    def _errand_connect(self, rnd: random.Random) -> pd.DataFrame:
+        rows = []
+        for i in range(400):
+            rows.append(dict(
+                errandId=1000 + i // 2, errandNumber=f'E{i}', date=self.now - pd.Timedelta(hours=rnd.randint(0, 24 * 88)),
+                insuranceCompany=rnd.choice(FBS), clinicName=rnd.choice(CLINICS),
+                totalAmount=rnd.choice([100.0, 200.0, 300.0, np.nan]), settlementAmount=rnd.choice([50.0, 75.0, np.nan]),
+                reference=rnd.choice([f'R{rnd.randint(0, 40)}', None]), insuranceNumber=rnd.choice([f'I{rnd.randint(0, 40)}', None]),
+                damageNumber=rnd.choice([f'D{rnd.randint(0, 20)}-{rnd.randint(1, 3)}', f'D{rnd.randint(0, 20)}', None]),
+                invoiceReference=None, animalName=rnd.choice(NAMES), ownerName=rnd.choice(NAMES),
+                paymentOption=rnd.choice(['x', None]), strategyType=rnd.choice(['settlement', None]), settled=True))
+        return pd.DataFrame(rows)
+
+    def _errand_pay(self, rnd: random.Random) -> pd.DataFrame:
+        numbers = [f'{rnd.randint(0, 10 ** 10 - 1):010d}' for _ in range(120)]
+        rows = []
+        for i in range(300):
+            rows.append(dict(
+                errandId=5000 + i, createdAt=self.now - pd.Timedelta(hours=rnd.randint(0, 24 * 60)), errandNumber=f'P{i}',
+                insuranceCaseId=7000 + i, isReference=rnd.choice(numbers),
+                settlementAmount=rnd.choice([10000.0, 25000.0, 40000.0, np.nan]),
+                damageNumber=rnd.choice(numbers + [None] * 40), invoiceReference=rnd.choice(numbers + [None] * 40),
+                ocrNumber=rnd.choice(numbers + [None] * 40), clinicName=rnd.choice(CLINICS[:-1]),
+                insuranceCompanyName=rnd.choice(['Agria', 'Sveland', 'Trygg-Hansa']), animalId=rnd.randint(0, 30)))
+        self.numbers = numbers
+        return pd.DataFrame(rows)
+
+    def _payout(self, rnd: random.Random) -> pd.DataFrame:
+        return pd.DataFrame([dict(
+            id=i, createdAt=self.now - pd.Timedelta(hours=rnd.randint(0, 24 * 60)), reference=rnd.choice(self.numbers),
+            transactionId=rnd.choice([9000 + i, None]), amount=rnd.choice([10000.0, 25000.0, 40000.0]),
+            clinicName=rnd.choice(CLINICS[:-1]), type=rnd.choice(['settlement', 'refund', None])) for i in range(80)])
+
+    def _partial_pay(self, rnd: random.Random) -> pd.DataFrame:
+        rows = []
+        for record in self.errand_pay.sample(frac=0.5, random_state=rnd.randint(0, 1000)).to_dict('records'):
+            for _ in range(rnd.randint(1, 2)):
+                rows.append(dict(
+                    isReference=record['isReference'], insuranceCaseId=record['insuranceCaseId'], createdAt=record['createdAt'],
+                    paymentReceivedTime=record['createdAt'] + pd.Timedelta(hours=rnd.randint(0, 24 * 10)),
+                    settlementAmount=record['settlementAmount'], paymentFromFB=rnd.choice([5000.0, 10000.0, np.nan])))
+        return pd.DataFrame(rows)
+
+    def payments(self, seed: int) -> pd.DataFrame:
+        rnd = random.Random(seed)
+        rows = []
+        for i in range(120):
+            ref, damage, other = (rnd.choice(self.numbers + [None] * 30) for _ in range(3))
+            bank = rnd.choice(list(PAY_BANKS))
+            if bank.startswith('Agria'):
+                info = f"SKADENUMMER: {damage or ''} FAKTURANUMMER: {other or ''}"
+            elif bank.startswith('SVELAND'):
+                info = f"Skadenummer: {damage or 0};{other or 0} ref {ref or 0}"
+            else:
+                info = rnd.choice([None, f'Betalning {other or ""}'])
+            rows.append(dict(id=i, amount=rnd.choice([5000.0, 10000.0, 25000.0, 35000.0, 40000.0, 65000.0]), bankName=bank,
+                             info=info, reference=rnd.choice([f'OCR {ref}' if ref else None, None]),
+                             createdAt=self.now - pd.Timedelta(hours=rnd.randint(0, 24 * 62))))
+        return pd.DataFrame(rows)
+
+    def emails(self, seed: int) -> pd.DataFrame:
+        rnd = random.Random(seed)
+        now = self.now.tz_convert('Europe/Stockholm')
+        rows = []
+        for i in range(250):
+            rows.append(dict(
+                id=i, errandId=rnd.choice([[], [], [], [5]]), date=now - pd.Timedelta(hours=rnd.randint(-5, 24 * 95)),
+                source=rnd.choice(['Clinic', 'Insurance_Company', 'Other']), sendTo=rnd.choice(['Clinic', 'Insurance_Company']),
+                sender=rnd.choice(FBS + CLINICS + ['DRP', 'Provet_Cloud', 'Wisentic']), receiver=rnd.choice(FBS + CLINICS + ['DRP']),
+                originSender=rnd.choice(['DRP', 'Wisentic', 'x']), originReceiver=rnd.choice([None, 'DRP', 'x']),
+                reference=rnd.choice([f'R{rnd.randint(0, 60)}', None, None]), insuranceNumber=rnd.choice([f'I{rnd.randint(0, 60)}', None]),
+                damageNumber=rnd.choice([f'D{rnd.randint(0, 25)}', f'D{rnd.randint(0, 20)}-1', None]),
+                settlementAmount=rnd.choice([50.0, 75.0, np.nan, np.nan]), totalAmount=rnd.choice([100.0, 300.0, np.nan]),
+                animalName=rnd.choice(NAMES), ownerName=rnd.choice(NAMES)))
+        return pd.DataFrame(rows)
+
+    def _links(self, key_col: str, keys) -> pd.DataFrame:
+        links = self.errand_pay.rename(columns={'insuranceCaseId': 'id', 'isReference': 'reference'})
+        links = links[links[key_col].isin(list(keys))]
+        return links[['id', 'reference', 'errandNumber']].reset_index(drop=True)
+
+    def fetch(self, query, params=None, name=None) -> pd.DataFrame:
+        params = params or {}
+        if name == 'errandLinkByRefs':
+            return self._links('reference', params['refs'])
+        if name == 'errandLinkByIds':
+            return self._links('id', params['ids'])
+        if name == 'partialPayByRefs':
+            return self.partial_pay[self.partial_pay['isReference'].isin(params['refs'])].reset_index(drop=True)
+        raise LookupError(f"SyntheticDataSource has no data for {name}")
+
+    async def fetch_async(self, query, params=None, name=None) -> pd.DataFrame:
+        return self.fetch(query, params, name)
+
+    def fetch_columnar(self, query, params=None, columns=None, name=None) -> pd.DataFrame:
+        if name == 'errandConnectWindow':
+            data = self.errand_connect[self.errand_connect['date'] >= pd.Timestamp(params['oldest'])]
+        elif name == 'errandPay':
+            data = self.errand_pay
+        elif name == 'payout':
+            data = self.payout
+        else:
+            raise LookupError(f"SyntheticDataSource has no data for {name}")
+        return data.reset_index(drop=True).copy()
+
+    def load_sheet(self, url, worksheet) -> pd.DataFrame:
+        if worksheet != 'payoutEntity':
+            raise LookupError(f"SyntheticDataSource has no sheet {worksheet}")
+        return pd.DataFrame([dict(payoutEntity=bank, source=source, clinic=name)
+                             for bank, (source, names) in PAY_BANKS.items() for name in names or [None]])
+
+
+def _use_errand_cache(monkeypatch, windows: str) -> ErrandCache:
+    """A fresh snapshot for both connectors, with the given CONNECTOR_WINDOWS tiers"""
+    monkeypatch.setenv('CONNECTOR_WINDOWS', windows)
+    monkeypatch.setenv('ERRAND_CACHE_REFRESH_SECONDS', '3600')
+    cache = ErrandCache()
+    monkeypatch.setattr(connector_module, 'errand_cache', cache)
+    monkeypatch.setattr(baseline_connector_module, 'errand_cache', cache)
+    return cache
+
+def _baseline_connector(cache: ErrandCache) -> baseline_connector_module.Connector:
+    baseline = baseline_connector_module.Connector()
+    boundaries = list(cache.window_boundaries)
+    baseline.errand_windows = list(zip([None] + boundaries[:-1], boundaries))
+    return baseline
+
+def _match_payments(service_cls, payments: pd.DataFrame) -> pd.DataFrame:
+    return PaymentDataset(payments.copy(), services=service_cls(payments.copy())).do_match()
+
+
+@pytest.fixture(scope='module')
+def replay_fixture(tmp_path_factory):
+    path = os.getenv('REPLAY_FIXTURE')
+    if not path:
+        path = str(tmp_path_factory.mktemp('replay') / 'fixture.sqlite')
+        source = SyntheticDataSource(SEED)
+        recorder = RecordedDataSource(path, inner=source)
+        recorder.record(None, {}, 'input:emails', source.emails(SEED))
+        recorder.record(None, {}, 'input:payments', source.payments(SEED))
+        set_data_source(recorder)
+        try:
+            mp = pytest.MonkeyPatch()
+            try:
+                _baseline_connector(_use_errand_cache(mp, '15d,3m')).connect_with_time_windows(
+                    recorder.replay(None, {}, 'input:emails'))
+            finally:
+                mp.undo()
+            _match_payments(baseline_payment_module.PaymentService, recorder.replay(None, {}, 'input:payments'))
+        finally:
+            set_data_source(None)
+
+    replay = RecordedDataSource(path)
+    set_data_source(replay)
+    yield replay
+    set_data_source(None)
+
+
+@pytest.mark.parametrize('windows', ['15d,3m', '7d,15d,1m,3m'])
+@pytest.mark.parametrize('batch_mode', [True, False])
+def test_connector_matches_baseline(replay_fixture, monkeypatch, windows, batch_mode):
+    emails = replay_fixture.replay(None, {}, 'input:emails')
+    cache = _use_errand_cache(monkeypatch, windows)
+    connector = Connector()
+    connector.batch_mode = batch_mode
+
+    expected = _baseline_connector(cache).connect_with_time_windows(emails.copy())
+    result = connector.connect_with_time_windows(emails.copy())
+
+    assert result['errandId'].tolist() == expected['errandId'].tolist()
+    assert result['connectedCol'].astype(str).tolist() == expected['connectedCol'].astype(str).tolist()
+
+    # The fixture has to exercise more than the newest tier for the comparison to mean anything
+    matched = expected.loc[expected['errandId'].map(len) > 0, 'errandId'].explode().astype(int)
+    errand_dates = cache.get_snapshot().drop_duplicates('errandId').set_index('errandId')['date']
+    ages = pd.Timestamp.now(tz='Europe/Stockholm') - errand_dates.reindex(matched).dropna()
+    assert (ages < cache.window_boundaries[0]).any()
+    assert (ages >= cache.window_boundaries[0]).any()
+
+
+def test_payment_matches_baseline(replay_fixture):
+    payments = replay_fixture.replay(None, {}, 'input:payments')
+
+    expected = _match_payments(baseline_payment_module.PaymentService, payments)
+    result = _match_payments(PaymentService, payments)
+
+    assert result['id'].tolist() == expected['id'].tolist()
+    assert result['status'].tolist() == expected['status'].tolist()
+    assert expected['status'].map(lambda s: s.split(' ')[0]).nunique() > 2